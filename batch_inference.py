@@ -0,0 +1,140 @@
+"""Пакетная транскрипция коротких файлов: окна нескольких файлов проходят через модель за один вызов"""
+import logging
+import time
+
+from pcm_cache import prefetch_audio
+from transcription_cache import TRANSCRIBE_OPTIONS
+from vad import remap_result, speech_only, transcribe_audio
+
+# --- Конфигурация ---
+BATCH_SIZE = 16  # Файлов в одном проходе кодировщика и декодера
+# Пороги whisper.transcribe: при их нарушении файл повторно распознается обычным способом
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+PREPEND_PUNCTUATIONS = "\"'“¿([{-"
+APPEND_PUNCTUATIONS = "\"'.。,，!！?？:：”)]}、"
+
+
+def _get_tokenizer(model):
+    """Токенизатор модели для русского языка"""
+    from whisper.tokenizer import get_tokenizer
+    kwargs = {"num_languages": model.num_languages} if hasattr(model, "num_languages") else {}
+    return get_tokenizer(model.is_multilingual, language=TRANSCRIBE_OPTIONS["language"], task="transcribe", **kwargs)
+
+
+def _needs_fallback(decoded):
+    """Повторять ли распознавание с температурным перебором, как это сделал бы whisper.transcribe"""
+    if decoded.no_speech_prob > NO_SPEECH_THRESHOLD and decoded.avg_logprob < LOGPROB_THRESHOLD:
+        return False
+    return decoded.compression_ratio > COMPRESSION_RATIO_THRESHOLD or decoded.avg_logprob < LOGPROB_THRESHOLD
+
+
+def _build_result(model, tokenizer, decoded, mel, num_samples):
+    """Результат в формате whisper.transcribe (один сегмент) со временем слов"""
+    from whisper.audio import HOP_LENGTH, SAMPLE_RATE
+    from whisper.timing import add_word_timestamps
+    language = TRANSCRIBE_OPTIONS["language"]
+    if decoded.no_speech_prob > NO_SPEECH_THRESHOLD and decoded.avg_logprob < LOGPROB_THRESHOLD:
+        return {"text": "", "segments": [], "language": language}
+    segment = {
+        "id": 0, "seek": 0, "start": 0.0, "end": num_samples / SAMPLE_RATE,
+        "text": decoded.text, "tokens": decoded.tokens, "temperature": 0.0,
+        "avg_logprob": decoded.avg_logprob, "compression_ratio": decoded.compression_ratio,
+        "no_speech_prob": decoded.no_speech_prob,
+    }
+    add_word_timestamps(segments=[segment], model=model, tokenizer=tokenizer, mel=mel,
+                        num_frames=num_samples // HOP_LENGTH, prepend_punctuations=PREPEND_PUNCTUATIONS,
+                        append_punctuations=APPEND_PUNCTUATIONS, last_speech_timestamp=0.0)
+    return {"text": decoded.text, "segments": [segment], "language": language}
+
+
+def transcribe_batch(model, items, tokenizer=None):
+    """Распознает звуки не длиннее 30 сек одним проходом модели.
+
+    items - список массивов float32 16 кГц. Возвращает для каждого результат
+    или None, если файл нужно распознать обычным способом.
+    """
+    import torch
+    import whisper
+    tokenizer = tokenizer or _get_tokenizer(model)
+    fp16 = model.device.type == "cuda"
+    n_mels = getattr(model.dims, "n_mels", 80)
+    # Все окна дополняются тишиной до 30 сек и образуют один тензор (batch, n_mels, 3000).
+    # Тишина добавляется к звуку до вычисления log-mel, как в whisper.transcribe: нули
+    # в самой спектрограмме соответствуют не тишине, а уровню -4 после нормализации
+    mel = torch.stack([whisper.pad_or_trim(whisper.log_mel_spectrogram(audio, n_mels, padding=whisper.audio.N_SAMPLES),
+                                           whisper.audio.N_FRAMES)
+                       for audio in items])
+    mel = mel.to(model.device).to(torch.float16 if fp16 else torch.float32)
+    options = whisper.DecodingOptions(language=TRANSCRIBE_OPTIONS["language"], task="transcribe",
+                                      temperature=0.0, without_timestamps=True, fp16=fp16)
+    decoded = whisper.decode(model, mel, options)
+    results = []
+    for i, result in enumerate(decoded):
+        if _needs_fallback(result):
+            results.append(None)
+            continue
+        results.append(_build_result(model, tokenizer, result, mel[i], len(items[i])))
+    return results
+
+
+def transcribe_batched(model, files, use_vad=False, batch_size=BATCH_SIZE):
+    """Транскрибирует файлы, собирая короткие (до 30 сек звука) в пакеты.
+
+    Генератор возвращает кортежи (путь, результат, ошибка, время) как
+    transcribe_sequential; время пакета делится поровну между его файлами.
+    Более длинные файлы и файлы, не прошедшие проверку качества, распознаются
+    по одному через model.transcribe.
+    """
+    from whisper.audio import N_SAMPLES
+    tokenizer = _get_tokenizer(model)
+    pending = []
+
+    def run_single(input_filepath, audio):
+        started = time.time()
+        try:
+            result = transcribe_audio(model, audio, use_vad, verbose=False, **TRANSCRIBE_OPTIONS)
+            return input_filepath, result, None, time.time() - started
+        except Exception as e:
+            return input_filepath, None, e, time.time() - started
+
+    def flush():
+        batch = pending[:]
+        pending.clear()
+        started = time.time()
+        try:
+            results = transcribe_batch(model, [speech for _, _, speech, _, _ in batch], tokenizer)
+        except Exception as e:
+            logging.error(f"Batched inference failed, falling back to single files: {e}")
+            results = [None] * len(batch)
+        share = (time.time() - started) / len(batch)
+        logging.info(f"Batched inference: {len(batch)} files in {share * len(batch):.1f} s")
+        for (input_filepath, audio, _, speech_map, stats), result in zip(batch, results):
+            if result is None:
+                yield run_single(input_filepath, audio)
+                continue
+            if speech_map is not None:
+                result = remap_result(result, speech_map)
+                result["vad"] = stats
+            yield input_filepath, result, None, share
+
+    for input_filepath, audio, error in prefetch_audio(files):
+        if error is not None:
+            yield input_filepath, None, error, 0.0
+            continue
+        speech, speech_map, stats = audio, None, None
+        if use_vad:
+            speech, speech_map, stats = speech_only(audio)
+            if not stats["regions"]:
+                yield input_filepath, {"text": "", "segments": [], "language": TRANSCRIBE_OPTIONS["language"],
+                                       "vad": stats}, None, 0.0
+                continue
+        if len(speech) > N_SAMPLES:
+            yield run_single(input_filepath, audio)
+            continue
+        pending.append((input_filepath, audio, speech, speech_map, stats))
+        if len(pending) >= batch_size:
+            yield from flush()
+    if pending:
+        yield from flush()
@@ -0,0 +1,127 @@
+"""Манифест пакетной транскрипции: состояние каждого файла для продолжения прерванного запуска"""
+import hashlib
+import json
+from datetime import datetime
+
+from media_utils import atomic_write_json
+
+# --- Конфигурация ---
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BatchManifest:
+    """Манифест в папке результатов; после каждого файла перезаписывается атомарно.
+
+    Файл считается обработанным, если он не изменился (размер и время изменения),
+    распознан той же моделью и все записанные результаты на месте с прежними хэшами.
+    """
+
+    def __init__(self, path, model_name):
+        self.path = path
+        self.model_name = model_name
+        self.files = {}
+        self.started_at = _now()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.files = data.get("files", {})
+
+    def _entry(self, filepath):
+        stat = filepath.stat()
+        entry = self.files.setdefault(filepath.name, {"attempts": 0})
+        entry["size"] = stat.st_size
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["model"] = self.model_name
+        return entry
+
+    def is_complete(self, filepath):
+        """Проверяет, что файл уже успешно обработан и результаты не тронуты"""
+        entry = self.files.get(filepath.name)
+        if not entry or entry.get("status") != "done" or entry.get("model") != self.model_name:
+            return False
+        try:
+            stat = filepath.stat()
+            if entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+                return False
+            return all(_sha256(self.path.parent / name) == sha256
+                       for name, sha256 in entry.get("outputs", {}).items())
+        except (OSError, KeyError):
+            return False
+
+    def mark_pending(self, files):
+        """Регистрирует файлы текущего запуска; состояние обработанных ранее сохраняется"""
+        for filepath in files:
+            if self.is_complete(filepath):
+                continue
+            entry = self._entry(filepath)
+            if entry.get("status") != "failed":
+                entry["status"] = "pending"
+        self.save()
+
+    def mark_done(self, filepath, elapsed, outputs):
+        """Отмечает успешную обработку; outputs - пути записанных файлов результатов"""
+        entry = self._entry(filepath)
+        entry.update({
+            "status": "done",
+            "attempts": entry.get("attempts", 0) + 1,
+            "elapsed_sec": round(elapsed, 3),
+            "finished_at": _now(),
+            "error": None,
+            "outputs": {p.name: _sha256(p) for p in outputs},
+        })
+        self.save()
+
+    def mark_failed(self, filepath, elapsed, error):
+        """Отмечает ошибку; при следующем запуске файл будет обработан повторно"""
+        entry = self._entry(filepath)
+        entry.update({
+            "status": "failed",
+            "attempts": entry.get("attempts", 0) + 1,
+            "elapsed_sec": round(elapsed, 3),
+            "finished_at": _now(),
+            "error": str(error),
+            "outputs": {},
+        })
+        self.save()
+
+    def summary(self):
+        """Сводка по всем файлам манифеста"""
+        counts = {"done": 0, "failed": 0, "pending": 0}
+        for entry in self.files.values():
+            counts[entry.get("status", "pending")] += 1
+        return {
+            "total": len(self.files),
+            **counts,
+            "elapsed_sec": round(sum(e.get("elapsed_sec", 0.0) for e in self.files.values()
+                                     if e.get("status") == "done"), 3),
+            "model": self.model_name,
+            "started_at": self.started_at,
+            "updated_at": _now(),
+            "complete": counts["done"] == len(self.files),
+        }
+
+    def save(self):
+        atomic_write_json(self.path, {
+            "version": MANIFEST_VERSION,
+            "summary": self.summary(),
+            "files": self.files,
+        })
@@ -0,0 +1,55 @@
+"""Пропускная способность пакетной транскрипции коротких файлов (batch_inference.py) на одной модели.
+
+Запуск: python benchmarks/bench_batch_inference.py файл [модель] [размеры пакета ...]
+Файл (до 30 сек звука) распознается 32 раза: по одному через model.transcribe
+и пакетами заданных размеров; печатается число файлов в секунду.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import torch  # noqa: E402
+import whisper  # noqa: E402
+
+from batch_inference import transcribe_batch  # noqa: E402
+from transcription_cache import TRANSCRIBE_OPTIONS  # noqa: E402
+
+FILE_COUNT = 32
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    audio = whisper.load_audio(sys.argv[1])[:whisper.audio.N_SAMPLES]
+    model_name = sys.argv[2] if len(sys.argv) > 2 else "base"
+    batch_sizes = [int(size) for size in sys.argv[3:]] or [4, 8, 16, 32]
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = whisper.load_model(model_name, device=device)
+    print(f"Модель {model_name} на {device}, {FILE_COUNT} файлов по {len(audio) / 16000:.0f} сек")
+
+    started = time.time()
+    for _ in range(FILE_COUNT):
+        single = model.transcribe(audio, verbose=False, **TRANSCRIBE_OPTIONS)
+    elapsed = time.time() - started
+    print(f"{'по одному':>12}: {FILE_COUNT / elapsed:6.2f} файл/сек")
+
+    for batch_size in batch_sizes:
+        started = time.time()
+        for first in range(0, FILE_COUNT, batch_size):
+            results = transcribe_batch(model, [audio] * min(batch_size, FILE_COUNT - first))
+        elapsed = time.time() - started
+        print(f"{f'пакет {batch_size}':>12}: {FILE_COUNT / elapsed:6.2f} файл/сек")
+
+    batched = results[0]
+    if batched is None:
+        print("Пакетный результат не прошел проверку качества (был бы распознан повторно)")
+    else:
+        print(f"Слов: по одному {sum(len(s.get('words', [])) for s in single['segments'])}, "
+              f"в пакете {sum(len(s.get('words', [])) for s in batched['segments'])}")
+
+
+if __name__ == "__main__":
+    main()
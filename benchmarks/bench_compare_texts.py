@@ -0,0 +1,81 @@
+"""Сравнение старого жадного compare_texts и нового diff (text_diff.py): точность и время.
+
+Запуск: python benchmarks/bench_compare_texts.py [число_слов ...]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from text_diff import kept_word_indices  # noqa: E402
+
+SHORT_WORDS = ["и", "в", "не", "на", "что", "с", "я", "а", "но", "он", "как", "это"]
+LONG_WORDS = ["видео", "монтаж", "субтитры", "модель", "запись", "фрагмент", "звук", "кадр",
+              "текст", "слово", "время", "файл", "редактор", "пауза", "голос", "сцена"]
+
+
+def greedy_compare_texts(original_text, edited_text):
+    """Прежняя реализация compare_texts (жадное сопоставление одним указателем)"""
+    original_words = original_text.split()
+    edited_words = edited_text.split()
+    kept_indices = []
+    j = 0
+    for i, orig_word in enumerate(original_words):
+        if j < len(edited_words) and orig_word.lower() == edited_words[j].lower():
+            kept_indices.append(i)
+            j += 1
+    return kept_indices
+
+
+def make_case(word_count, seed):
+    """Транскрипт с частыми короткими словами и правка: удаления, вставки, пунктуация"""
+    rng = random.Random(seed)
+    original = [rng.choice(SHORT_WORDS) if rng.random() < 0.4 else rng.choice(LONG_WORDS) + str(rng.randint(0, 50))
+                for _ in range(word_count)]
+    kept = []
+    edited = []
+    # Удаляем фразы целиком, как это делает пользователь в редакторе
+    i = 0
+    while i < word_count:
+        if rng.random() < 0.02:
+            i += rng.randint(1, 8)
+            continue
+        word = original[i]
+        if rng.random() < 0.01:
+            word = word.capitalize() + rng.choice([",", ".", "!", "?"])
+        edited.append(word)
+        kept.append(i)
+        if rng.random() < 0.002:
+            edited.append("вставка")
+        i += 1
+    return " ".join(original), " ".join(edited), kept
+
+
+def accuracy(result, expected):
+    """Доля слов, чьё решение (оставить/вырезать) совпало с правильным"""
+    expected = set(expected)
+    result = set(result)
+    return 1.0 - len(expected.symmetric_difference(result)) / max(len(expected), 1)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    print(f"{'слов':>8} | {'жадный, с':>10} {'точность':>9} | {'diff, с':>8} {'точность':>9}")
+    for size in sizes:
+        original_text, edited_text, expected = make_case(size, seed=size)
+        greedy, greedy_time = timed(greedy_compare_texts, original_text, edited_text)
+        diff, diff_time = timed(kept_word_indices, original_text, edited_text)
+        print(f"{size:>8} | {greedy_time:>10.3f} {accuracy(greedy, expected):>9.2%} | "
+              f"{diff_time:>8.3f} {accuracy(diff, expected):>9.2%}")
+
+
+if __name__ == "__main__":
+    main()
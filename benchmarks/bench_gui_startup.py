@@ -0,0 +1,59 @@
+"""Время импорта transcribe_gui.py (по python -X importtime) и проверка, что тяжелые библиотеки не загружаются при запуске.
+
+Запуск: python benchmarks/bench_gui_startup.py [бюджет_мс]
+Код возврата 1, если при импорте загружаются whisper, torch или moviepy
+либо импорт дольше бюджета (по умолчанию STARTUP_BUDGET_MS).
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+STARTUP_BUDGET_MS = 1500
+FORBIDDEN_MODULES = ["torch", "whisper", "moviepy"]
+TOP_COUNT = 15
+
+
+def measure_imports():
+    """Импортирует transcribe_gui в отдельном процессе; возвращает {модуль: (собственное, общее время в мкс)}"""
+    env = dict(os.environ, PYTHONPATH=str(REPO_DIR) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    # Модуль настраивает лог-файл в текущей папке, поэтому запускаем его во временной
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import transcribe_gui"],
+                              cwd=tmp_dir, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr.strip().splitlines()[-1])
+        sys.exit(2)
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else STARTUP_BUDGET_MS
+    timings = measure_imports()
+    total_ms = timings["transcribe_gui"][1] / 1000
+    print(f"Импорт transcribe_gui: {total_ms:.0f} мс (бюджет {budget_ms:.0f} мс), модулей: {len(timings)}")
+    print("Самые долгие модули (общее время):")
+    for name, (_, cumulative) in sorted(timings.items(), key=lambda item: -item[1][1])[:TOP_COUNT]:
+        print(f"  {cumulative / 1000:8.1f} мс  {name}")
+
+    failed = False
+    loaded = sorted({name.split(".")[0] for name in timings} & set(FORBIDDEN_MODULES))
+    if loaded:
+        print(f"[!] При запуске загружаются тяжелые библиотеки: {', '.join(loaded)}")
+        failed = True
+    if total_ms > budget_ms:
+        print(f"[!] Импорт дольше бюджета: {total_ms:.0f} > {budget_ms:.0f} мс")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Скорость и точность int8-квантованной модели (quantize.py) на CPU по сравнению с fp32.
+
+Запуск: python benchmarks/bench_int8_cpu.py папка_с_образцами [модель ...]
+В папке - аудио/видео файлы; если рядом лежит эталонный текст с тем же именем
+(.txt), WER считается по нему, иначе int8 сравнивается с результатом fp32.
+Печатается RTF (время распознавания / длительность звука) и WER для каждой модели.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import torch  # noqa: E402
+import whisper  # noqa: E402
+
+from quantize import load_quantized_model  # noqa: E402
+from text_diff import normalize_token  # noqa: E402
+from transcription_cache import TRANSCRIBE_OPTIONS  # noqa: E402
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".flac", ".ogg", ".aac", ".mp4", ".mov", ".mkv", ".webm"}
+
+
+def word_error_rate(reference, hypothesis):
+    """WER: (замены + вставки + удаления) / число слов эталона, по нормализованным словам"""
+    ref = [normalize_token(w) for w in reference.split()]
+    hyp = [normalize_token(w) for w in hypothesis.split()]
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def transcribe_all(model, samples):
+    """Распознает образцы; возвращает (тексты, общее время)"""
+    texts = []
+    started = time.time()
+    for audio in samples:
+        texts.append(model.transcribe(audio, verbose=False, fp16=False, **TRANSCRIBE_OPTIONS)["text"])
+    return texts, time.time() - started
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    folder = Path(sys.argv[1])
+    model_names = sys.argv[2:] or ["base", "small", "medium"]
+    files = sorted(f for f in folder.iterdir() if f.suffix.lower() in AUDIO_EXTENSIONS)
+    samples = [whisper.load_audio(str(f)) for f in files]
+    references = [f.with_suffix(".txt").read_text(encoding="utf-8") if f.with_suffix(".txt").exists() else None
+                  for f in files]
+    duration = sum(len(audio) for audio in samples) / whisper.audio.SAMPLE_RATE
+    print(f"Образцов: {len(files)}, {duration:.0f} сек звука, эталонов: {sum(r is not None for r in references)}, "
+          f"потоков torch: {torch.get_num_threads()}")
+    print(f"{'модель':>10} {'RTF fp32':>9} {'RTF int8':>9} {'ускорение':>10} {'WER fp32':>9} {'WER int8':>9} "
+          f"{'int8/fp32':>10}")
+
+    for model_name in model_names:
+        fp32_texts, fp32_time = transcribe_all(whisper.load_model(model_name, device="cpu"), samples)
+        int8_texts, int8_time = transcribe_all(load_quantized_model(model_name), samples)
+
+        def mean_wer(texts):
+            pairs = [(r, t) for r, t in zip(references, texts) if r is not None]
+            return sum(word_error_rate(r, t) for r, t in pairs) / len(pairs) if pairs else float("nan")
+
+        drift = sum(word_error_rate(a, b) for a, b in zip(fp32_texts, int8_texts)) / len(files)
+        print(f"{model_name:>10} {fp32_time / duration:9.3f} {int8_time / duration:9.3f} "
+              f"{fp32_time / int8_time:9.2f}x {mean_wer(fp32_texts):9.1%} {mean_wer(int8_texts):9.1%} {drift:10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Проверка и замер srt_codec.py: круговое преобразование и скорость против прежних parse_srt/create_srt.
+
+Запуск: python benchmarks/bench_srt_codec.py [число_субтитров]
+"""
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from srt_codec import read_srt, write_srt  # noqa: E402
+from word_timeline import WordTimeline  # noqa: E402
+
+
+def legacy_parse_time(time_str):
+    time_str = time_str.strip()
+    time_str = time_str.replace(",", ".")
+    match = re.match(r"(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,3}))?", time_str)
+    if not match:
+        raise ValueError(f"Некорректный формат времени: {time_str}")
+    hours, minutes, seconds, milliseconds = match.groups()
+    seconds = float(seconds) + (float(f"0.{milliseconds}") if milliseconds else 0)
+    return int(hours) * 3600 + int(minutes) * 60 + seconds
+
+
+def legacy_parse_srt(srt_filepath):
+    """Прежний parse_srt (readlines + re.match на каждую метку)"""
+    words = []
+    text = []
+    with open(srt_filepath, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+        i = 0
+        while i < len(lines):
+            if lines[i].strip().isdigit():
+                i += 1
+                if i >= len(lines):
+                    break
+                time_line = lines[i].strip()
+                try:
+                    start_str, end_str = time_line.split(" --> ")
+                    start_time = legacy_parse_time(start_str)
+                    end_time = legacy_parse_time(end_str)
+                    i += 1
+                    if i >= len(lines):
+                        break
+                    word = lines[i].strip()
+                    if word:
+                        words.append({"start": start_time, "end": end_time, "word": word})
+                        text.append(word)
+                    i += 1
+                except Exception:
+                    i += 1
+                    continue
+            else:
+                i += 1
+    return words, " ".join(text)
+
+
+def legacy_create_srt(words, output_filepath):
+    """Прежний create_srt (f-строка с восемью divmod на каждое слово)"""
+    with open(output_filepath, "w", encoding="utf-8") as f:
+        for i, word in enumerate(words, 1):
+            start_time = word["start"]
+            end_time = word["end"]
+            text = word["word"].strip()
+            start_srt = f"{int(start_time//3600):02d}:{int((start_time%3600)//60):02d}:{int(start_time%60):02d},{int((start_time%1)*1000):03d}"
+            end_srt = f"{int(end_time//3600):02d}:{int((end_time%3600)//60):02d}:{int(end_time%60):02d},{int((end_time%1)*1000):03d}"
+            f.write(f"{i}\n{start_srt} --> {end_srt}\n{text}\n\n")
+
+
+def make_words(count, seed=0):
+    """Слова по одному на субтитр с миллисекундными метками, как у Whisper после округления"""
+    rng = random.Random(seed)
+    words = []
+    t = 0
+    for i in range(count):
+        start = t + rng.randint(0, 300)
+        end = start + rng.randint(50, 900)
+        t = end
+        words.append({"start": start / 1000, "end": end / 1000, "word": f" слово{i % 5000}"})
+    return words
+
+
+def check_round_trip(directory, words):
+    """Запись и чтение новым кодеком сохраняют слова; файлы прежнего формата читаются так же"""
+    path = directory / "roundtrip.srt"
+    write_srt(words, path)
+    timeline = read_srt(path)
+    expected = WordTimeline.from_words(words)
+    assert len(timeline) == len(expected)
+    assert timeline.texts() == expected.texts()
+    # Миллисекунды отбрасываются, как в прежнем create_srt: ошибка не больше 1 мс
+    assert np.abs(timeline.starts - expected.starts).max() < 1.0001e-3
+    assert np.abs(timeline.ends - expected.ends).max() < 1.0001e-3
+
+    legacy_path = directory / "legacy.srt"
+    legacy_create_srt(words, legacy_path)
+    legacy_words, legacy_text = legacy_parse_srt(legacy_path)
+    timeline = read_srt(legacy_path)
+    assert timeline.joined_text() == legacy_text
+    assert np.allclose(timeline.starts, [w["start"] for w in legacy_words])
+    assert np.allclose(timeline.ends, [w["end"] for w in legacy_words])
+
+
+def check_edge_cases(directory):
+    """BOM, CRLF, метки без миллисекунд и с точкой, пустые и некорректные субтитры"""
+    path = directory / "edge.srt"
+    path.write_bytes("\ufeff1\r\n00:00:01,500 --> 00:00:02,000\r\nраз\r\n\r\n"
+                     "2\n00:00:02 --> 00:00:03.25\nдва\n\n"
+                     "3\n00:00:03,000 --> 00:00:04,000\n\n\n"
+                     "4\nмусор\nтри\n\n"
+                     "5\n00:00:05,000 --> xx:00:06,000\nчетыре\n\n"
+                     "6\n10:59:59,999 --> 11:00:00,000\nпять\n".encode("utf-8"))
+    timeline = read_srt(path)
+    assert timeline.texts() == ["раз", "два", "пять"], timeline.texts()
+    assert np.allclose(timeline.starts, [1.5, 2.0, 39599.999])
+    assert np.allclose(timeline.ends, [2.0, 3.25, 39600.0])
+
+    write_srt([{"start": 1.9996, "end": 3599.9999, "word": " x "}], path)
+    assert path.read_text(encoding="utf-8") == "1\n00:00:01,999 --> 00:59:59,999\nx\n\n"
+
+
+def check_legacy_bytes(directory):
+    """Метки с произвольной дробной частью записываются побайтно так же, как прежним create_srt"""
+    rng = random.Random(1)
+    words = []
+    for i in range(20000):
+        start = rng.uniform(0, 360000)
+        words.append({"start": start, "end": start + rng.uniform(0, 2), "word": f" слово{i}"})
+    words.append({"start": 1.001, "end": 4.35, "word": " край"})
+    legacy_path = directory / "legacy_bytes.srt"
+    new_path = directory / "new_bytes.srt"
+    legacy_create_srt(words, legacy_path)
+    write_srt(words, new_path)
+    assert new_path.read_bytes() == legacy_path.read_bytes()
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    words = make_words(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        check_edge_cases(directory)
+        check_round_trip(directory, words[:20000])
+        check_legacy_bytes(directory)
+        print("[*] Проверки кругового преобразования пройдены")
+
+        legacy_path = directory / "legacy.srt"
+        new_path = directory / "new.srt"
+        timeline = WordTimeline.from_words(words)
+        _, legacy_write = timed(legacy_create_srt, words, legacy_path)
+        _, new_write = timed(write_srt, timeline, new_path)
+        _, legacy_read = timed(legacy_parse_srt, legacy_path)
+        _, new_read = timed(read_srt, new_path)
+
+    print(f"{count} субтитров")
+    print(f"  запись: прежний {legacy_write:.2f} с ({count / legacy_write:,.0f}/с), "
+          f"новый {new_write:.2f} с ({count / new_write:,.0f}/с), x{legacy_write / new_write:.1f}")
+    print(f"  чтение: прежний {legacy_read:.2f} с ({count / legacy_read:,.0f}/с), "
+          f"новый {new_read:.2f} с ({count / new_read:,.0f}/с), x{legacy_read / new_read:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Транскрипция длинных записей по частям: звук читается окнами с перекрытием из кэша PCM или из ffmpeg"""
+import logging
+import subprocess
+
+import numpy as np
+
+from media_utils import StderrTail
+from pcm_cache import get_pcm_cache
+from srt_codec import SrtWriter
+from transcription_cache import TRANSCRIBE_OPTIONS
+from vad import transcribe_speech_only
+from word_timeline import WordTimeline
+
+# --- Конфигурация ---
+SAMPLE_RATE = 16000  # Частота дискретизации, ожидаемая Whisper
+WINDOW_SEC = 600  # Длина окна транскрипции
+OVERLAP_SEC = 10  # Перекрытие соседних окон; слова склеиваются по середине перекрытия
+PROMPT_CHARS = 200  # Сколько символов конца предыдущего окна передается как initial_prompt
+
+
+def _iter_array_windows(audio, window, step):
+    """Окна по уже декодированному звуку (memmap из кэша)"""
+    offset = 0
+    while True:
+        current = audio[offset:offset + window]
+        is_last = offset + window >= len(audio)
+        yield offset / SAMPLE_RATE, current, is_last
+        if is_last:
+            break
+        offset += step
+
+
+def iter_audio_windows(filepath, window_sec=WINDOW_SEC, overlap_sec=OVERLAP_SEC):
+    """Выдает окна звука 16 кГц моно (начало в сек, сэмплы float32, последнее ли окно).
+
+    Если звук файла уже есть в кэше PCM, окна читаются из него; иначе звук
+    декодируется ffmpeg-ом потоком и по пути записывается в кэш. В памяти
+    находятся только текущее окно и следующий шаг, независимо от длины файла.
+    """
+    window = int(window_sec * SAMPLE_RATE)
+    overlap = int(overlap_sec * SAMPLE_RATE)
+    step = window - overlap
+    cache = get_pcm_cache()
+    key = cache.make_key(filepath, SAMPLE_RATE) if cache.enabled else None
+    cached = cache.get(key) if key else None
+    if cached is not None:
+        logging.info(f"PCM cache hit for {filepath}")
+        yield from _iter_array_windows(cached, window, step)
+        return
+
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-i", str(filepath),
+           "-map", "0:a:0", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = StderrTail(proc)
+    writer = cache.writer(key) if key else None
+
+    def read_samples(count):
+        data = proc.stdout.read(count * 2)
+        samples = np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+        if writer:
+            writer.write(samples)
+        return samples
+
+    try:
+        current = read_samples(window)
+        if not len(current):
+            proc.wait()
+            error = stderr.text()
+            raise RuntimeError(f"Не удалось получить звук из {filepath.name}: {error or 'нет звуковой дорожки'}")
+        offset = 0
+        while True:
+            following = read_samples(step) if len(current) == window else np.empty(0, dtype=np.float32)
+            is_last = not len(following)
+            if is_last:
+                if proc.wait() != 0:
+                    raise RuntimeError(f"Не удалось декодировать звук {filepath.name}: {stderr.text()}")
+                if writer:
+                    # Файл декодирован полностью: следующая транскрипция возьмет звук из кэша
+                    writer.commit()
+            yield offset / SAMPLE_RATE, current, is_last
+            if is_last:
+                break
+            current = np.concatenate((current[step:], following))
+            offset += step
+    finally:
+        if writer:
+            writer.discard()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def _window_words(result, offset, keep_from, keep_until):
+    """Слова окна на общей шкале; остаются только начавшиеся в [keep_from, keep_until)"""
+    words = []
+    for segment in result["segments"]:
+        for word in segment.get("words", []):
+            start = word.get("start", 0)
+            end = word.get("end", start + 0.5)
+            if keep_from <= start + offset < keep_until:
+                words.append({"word": word["word"], "start": start + offset, "end": end + offset})
+    return words
+
+
+def transcribe_chunked(model, input_filepath, txt_filepath, srt_filepath, on_window=None, use_vad=False,
+                       window_sec=WINDOW_SEC, overlap_sec=OVERLAP_SEC):
+    """Транскрибирует файл окнами и дописывает .txt и .srt после каждого окна.
+
+    Слово из зоны перекрытия берется из того окна, в чьей половине перекрытия
+    оно начинается, поэтому на стыках нет ни повторов, ни пропусков.
+    on_window(номер окна, начало окна в сек) вызывается перед каждым окном.
+    При use_vad в Whisper передаются только участки речи каждого окна.
+    Возвращает WordTimeline всех слов.
+    """
+    chunks = []
+    keep_from = float("-inf")
+    prompt = None
+    skipped = 0.0
+    with open(txt_filepath, "w", encoding="utf-8") as txt_file, SrtWriter(srt_filepath) as srt_writer:
+        for index, (offset, audio, is_last) in enumerate(iter_audio_windows(input_filepath, window_sec, overlap_sec)):
+            if on_window:
+                on_window(index, offset)
+            if use_vad:
+                result = transcribe_speech_only(model, audio, verbose=False, initial_prompt=prompt, **TRANSCRIBE_OPTIONS)
+                skipped += result["vad"]["skipped"]
+            else:
+                result = model.transcribe(audio, verbose=False, initial_prompt=prompt, **TRANSCRIBE_OPTIONS)
+            keep_until = float("inf") if is_last else offset + len(audio) / SAMPLE_RATE - overlap_sec / 2
+            words = _window_words(result, offset, keep_from, keep_until)
+            keep_from = keep_until
+
+            text = "".join(w["word"] for w in words)
+            txt_file.write(text.lstrip() if txt_file.tell() == 0 else text)
+            txt_file.flush()
+            timeline = WordTimeline.from_words(words)
+            srt_writer.write_words(timeline)
+            srt_writer.flush()
+            chunks.append(timeline)
+            prompt = text[-PROMPT_CHARS:] or None
+            logging.info(f"Chunked transcription of {input_filepath.name}: window {index + 1} at {offset:.0f} s, "
+                         f"{len(words)} words")
+    if use_vad:
+        logging.info(f"Chunked transcription of {input_filepath.name}: VAD skipped {skipped:.1f} s")
+    return WordTimeline.concatenate(chunks)
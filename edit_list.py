@@ -0,0 +1,72 @@
+"""Неинтерактивное редактирование: решение о монтаже читается из файла рядом с .srt, а не из окна редактора.
+
+Поддерживаются два вида файлов (в папке .srt, с тем же именем):
+    <имя>.edit.txt  - отредактированный текст транскрипта (как после правки в редакторе)
+    <имя>.edl       - список интервалов, по одному на строку: "keep начало конец" или
+                      "cut начало конец"; время в секундах или чч:мм:сс[,мс]; "#" - комментарий.
+                      Если есть строки keep, остаются только они, затем вырезаются строки cut.
+Интервалы применяются к словам: слово остается, если его середина попадает в оставленное время.
+"""
+import numpy as np
+
+from srt_codec import parse_time
+from text_diff import kept_word_indices
+
+# --- Конфигурация ---
+EDITED_TEXT_SUFFIX = ".edit.txt"
+EDL_SUFFIX = ".edl"
+
+
+def find_edit_file(srt_filepath):
+    """Возвращает путь к файлу решения о монтаже для .srt или None"""
+    for suffix in (EDL_SUFFIX, EDITED_TEXT_SUFFIX):
+        path = srt_filepath.with_name(srt_filepath.stem + suffix)
+        if path.exists():
+            return path
+    return None
+
+
+def _parse_seconds(value):
+    return parse_time(value) if ":" in value else float(value)
+
+
+def parse_edl(edl_filepath):
+    """Читает список интервалов; возвращает [(действие, начало, конец)]"""
+    entries = []
+    with open(edl_filepath, "r", encoding="utf-8-sig") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            if len(parts) != 3 or parts[0].lower() not in ("keep", "cut"):
+                raise ValueError(f"{edl_filepath.name}:{line_number}: ожидается 'keep|cut начало конец': {line}")
+            start, end = _parse_seconds(parts[1]), _parse_seconds(parts[2])
+            if end <= start:
+                raise ValueError(f"{edl_filepath.name}:{line_number}: конец интервала раньше начала: {line}")
+            entries.append((parts[0].lower(), start, end))
+    return entries
+
+
+def kept_indices_from_ranges(words, entries):
+    """Индексы слов, чья середина попадает в оставленное время"""
+    middles = (words.starts + words.ends) / 2
+    keeps = [(start, end) for action, start, end in entries if action == "keep"]
+    cuts = [(start, end) for action, start, end in entries if action == "cut"]
+    kept = np.zeros(len(words), dtype=bool) if keeps else np.ones(len(words), dtype=bool)
+    for start, end in keeps:
+        kept |= (middles >= start) & (middles < end)
+    for start, end in cuts:
+        kept &= ~((middles >= start) & (middles < end))
+    return np.flatnonzero(kept).tolist()
+
+
+def load_kept_indices(srt_filepath, words, original_text):
+    """Индексы оставшихся слов по файлу решения о монтаже; None, если файла нет"""
+    path = find_edit_file(srt_filepath)
+    if path is None:
+        return None
+    if path.name.endswith(EDL_SUFFIX):
+        return kept_indices_from_ranges(words, parse_edl(path))
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return kept_word_indices(original_text, f.read())
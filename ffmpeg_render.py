@@ -0,0 +1,662 @@
+"""Рендер монтажа напрямую через ffmpeg: кадры не проходят через Python"""
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from job_queue import JobCancelled
+from keep_ranges import total_duration
+from media_utils import run_ffprobe, probe_source, probe_keyframes, first_video_stream, file_hash, StderrTail
+from segment_cache import get_segment_cache, get_proxy_cache
+
+# --- Конфигурация ---
+VIDEO_CODEC = "libx264"
+AUDIO_CODEC = "aac"
+X264_PRESET = "medium"
+X264_CRF = 20
+# Предпросмотр: прокси исходника низкого разрешения (создается один раз) и быстрое кодирование монтажа
+PREVIEW_HEIGHT = 360
+PREVIEW_PRESET = "ultrafast"
+PREVIEW_CRF = 30
+PREVIEW_AUDIO_BITRATE = "96k"
+# Параллельный экспорт: число одновременно кодируемых кусков и минимальная длина куска
+PARALLEL_CHUNKS = max(2, min(8, (os.cpu_count() or 1) // 4))
+MIN_CHUNK_SEC = 10.0
+# Повторный экспорт: длинные интервалы режутся по сетке исходника с этим шагом, чтобы правка
+# внутри длинного интервала перекодировала только затронутые ячейки сетки
+SEGMENT_GRID_SEC = 10.0
+# Монтаж звуковых файлов: длительность сглаживания стыков (0 - без сглаживания) и кодировщик по расширению результата
+AUDIO_CROSSFADE_SEC = 0.015
+AUDIO_BLOCK_SAMPLES = 1 << 16  # Сколько отсчётов звука читается за раз
+# Длительность в контейнере (особенно MP3) - оценка: нехватку в конце файла не длиннее этого значения
+# заполняем тишиной, чтобы не сдвигать .srt; большая нехватка означает поврежденный файл
+AUDIO_MAX_PADDING_SEC = 0.05
+AUDIO_ENCODERS = {
+    ".mp3": ["-c:a", "libmp3lame", "-q:a", "2"],
+    ".wav": ["-c:a", "pcm_s16le"],
+    ".flac": ["-c:a", "flac"],
+    ".ogg": ["-c:a", "libvorbis", "-q:a", "5"],
+    ".m4a": ["-c:a", AUDIO_CODEC, "-b:a", "192k"],
+    ".aac": ["-c:a", AUDIO_CODEC, "-b:a", "192k"],
+}
+# Кодеки, для которых доступна умная нарезка: (кодировщик, опция его параметров, bsf для копируемых кусков)
+SMART_CUT_CODECS = {
+    "h264": ("libx264", "-x264-params", "h264_mp4toannexb"),
+    "hevc": ("libx265", "-x265-params", "hevc_mp4toannexb"),
+}
+
+
+def run_ffmpeg(args, duration=None, progress=None, cancel_event=None):
+    """Запускает ffmpeg, сообщает прогресс (0..1) и прерывает процесс при отмене"""
+    cmd = ["ffmpeg", "-hide_banner", "-nostdin", "-y", "-loglevel", "error", "-progress", "pipe:1", "-nostats"] + list(args)
+    logging.info(f"Running: {' '.join(cmd)}")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace")
+
+    # stderr читается в отдельном потоке, чтобы ffmpeg не заблокировался на заполненном канале
+    stderr_tail = deque(maxlen=20)
+    reader = threading.Thread(target=lambda: stderr_tail.extend(proc.stderr), daemon=True)
+    reader.start()
+
+    for line in proc.stdout:
+        if cancel_event is not None and cancel_event.is_set():
+            proc.kill()
+            proc.wait()
+            raise JobCancelled()
+        key, _, value = line.strip().partition("=")
+        if key == "out_time_us" and progress and duration:
+            try:
+                out_time = int(value) / 1e6
+            except ValueError:
+                continue
+            if out_time >= 0:
+                progress(min(out_time / duration, 1.0))
+    proc.wait()
+    reader.join()
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg завершился с кодом {proc.returncode}: {''.join(stderr_tail).strip()}")
+
+
+def build_filtergraph(ranges, has_video, has_audio):
+    """Строит граф фильтров trim/atrim + concat для списка интервалов"""
+    parts = []
+    concat_inputs = []
+    for i, r in enumerate(ranges):
+        start, end = f"{r['start']:.6f}", f"{r['end']:.6f}"
+        if has_video:
+            parts.append(f"[0:v]trim=start={start}:end={end},setpts=PTS-STARTPTS[v{i}]")
+            concat_inputs.append(f"[v{i}]")
+        if has_audio:
+            parts.append(f"[0:a]atrim=start={start}:end={end},asetpts=PTS-STARTPTS[a{i}]")
+            concat_inputs.append(f"[a{i}]")
+    outputs = ("[outv]" if has_video else "") + ("[outa]" if has_audio else "")
+    parts.append(f"{''.join(concat_inputs)}concat=n={len(ranges)}:v={int(has_video)}:a={int(has_audio)}{outputs}")
+    return ";\n".join(parts)
+
+
+def render_ranges(input_path, ranges, output_path, source=None, progress=None, cancel_event=None,
+                  video_args=None):
+    """Вырезает интервалы из input_path и склеивает их в output_path одним вызовом ffmpeg.
+
+    Границы интервалов должны быть заранее выровнены по кадрам (snap_ranges_to_frames).
+    video_args заменяют параметры видеокодировщика по умолчанию.
+    """
+    source = source or probe_source(input_path)
+    has_video, has_audio = source["has_video"], source["has_audio"]
+    if not has_video and not has_audio:
+        raise RuntimeError(f"В файле {input_path} нет видео- и аудиопотоков")
+
+    # Граф фильтров для тысяч интервалов слишком длинный для командной строки - пишем его в файл
+    fd, script_path = tempfile.mkstemp(suffix=".ffgraph", text=True)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(build_filtergraph(ranges, has_video, has_audio))
+        args = ["-i", str(input_path), "-filter_complex_script", script_path]
+        if has_video:
+            args += ["-map", "[outv]"] + (video_args or ["-c:v", VIDEO_CODEC, "-preset", X264_PRESET,
+                                                         "-crf", str(X264_CRF), "-pix_fmt", "yuv420p"])
+        if has_audio:
+            args += ["-map", "[outa]", "-c:a", AUDIO_CODEC]
+        args.append(str(output_path))
+        run_ffmpeg(args, duration=total_duration(ranges), progress=progress, cancel_event=cancel_event)
+    finally:
+        os.remove(script_path)
+
+
+def plan_smart_cut(ranges, keyframes, fps):
+    """Разбивает интервалы на куски в кадрах: ("copy", первый кадр, число кадров) для целых GOP
+    и ("encode", первый кадр, число кадров) для неполных GOP на границах разрезов"""
+    key_frames = sorted({round(k * fps) for k in keyframes})
+    pieces = []
+    for r in ranges:
+        first = round(r["start"] * fps)
+        last = round(r["end"] * fps)
+        i = bisect_left(key_frames, first)
+        j = bisect_right(key_frames, last) - 1
+        if i < len(key_frames) and j >= 0 and key_frames[i] < key_frames[j]:
+            copy_start, copy_end = key_frames[i], key_frames[j]
+            if copy_start > first:
+                pieces.append(("encode", first, copy_start - first))
+            pieces.append(("copy", copy_start, copy_end - copy_start))
+            if last > copy_end:
+                pieces.append(("encode", copy_end, last - copy_end))
+        elif last > first:
+            pieces.append(("encode", first, last - first))
+    return pieces
+
+
+def render_smart_cut(input_path, ranges, output_path, source=None, progress=None, cancel_event=None):
+    """Умная нарезка: целые GOP внутри интервалов копируются без перекодирования,
+    перекодируются только неполные GOP на границах разрезов. Звук собирается отдельно.
+
+    Возвращает статистику {"copied": сек, "encoded": сек, "pieces": число кусков}
+    или None, если кодек не поддерживается и выполнен обычный рендер.
+    """
+    source = source or probe_source(input_path)
+    video = first_video_stream(source["streams"])
+    codec = SMART_CUT_CODECS.get(video.get("codec_name")) if video else None
+    fps = source["fps"]
+    if codec is None or not fps:
+        logging.warning(f"Smart cut is not supported for {input_path}, falling back to full render")
+        render_ranges(input_path, ranges, output_path, source, progress, cancel_event)
+        return None
+    encoder, params_option, bsf = codec
+
+    keyframes = [k - source["start_time"] for k in probe_keyframes(input_path)]
+    pieces = plan_smart_cut(ranges, keyframes, fps)
+    total_frames = sum(count for _, _, count in pieces) or 1
+    done_frames = 0
+
+    with tempfile.TemporaryDirectory(prefix="smartcut_") as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        piece_paths = []
+        for index, (kind, first, count) in enumerate(pieces):
+            piece_path = tmp_dir / f"piece_{index:05d}.mkv"
+            if kind == "copy":
+                # Поиск назад от середины ключевого кадра попадает ровно на него
+                args = ["-ss", f"{(first + 0.5) / fps:.6f}", "-i", str(input_path), "-map", "0:v:0",
+                        "-c:v", "copy", "-bsf:v", bsf, "-avoid_negative_ts", "make_zero"]
+            else:
+                # Точный поиск при декодировании: первый сохранённый кадр - first
+                args = ["-ss", f"{max(first - 0.5, 0) / fps:.6f}", "-i", str(input_path), "-map", "0:v:0",
+                        "-c:v", encoder, params_option, "repeat-headers=1", "-preset", X264_PRESET,
+                        "-crf", str(X264_CRF), "-pix_fmt", video.get("pix_fmt") or "yuv420p"]
+            # Параметры потока записываются в каждый ключевой кадр, чтобы куски склеивались без перекодирования
+            args += ["-an", "-sn", "-dn", "-frames:v", str(count), str(piece_path)]
+            run_ffmpeg(args, cancel_event=cancel_event)
+            # У скопированных кусков с B-кадрами первый кадр может начинаться не с нуля
+            piece_start = float(run_ffprobe(["-show_entries", "format=start_time", str(piece_path)])
+                                .get("format", {}).get("start_time") or 0.0)
+            piece_paths.append((piece_path, piece_start, count / fps))
+            done_frames += count
+            if progress:
+                progress(done_frames / total_frames)
+
+        list_path = tmp_dir / "pieces.txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for piece_path, piece_start, piece_duration in piece_paths:
+                # inpoint/outpoint задают точные границы куска на общей временной шкале
+                f.write(f"file '{piece_path.as_posix()}'\n"
+                        f"inpoint {piece_start:.6f}\noutpoint {piece_start + piece_duration:.6f}\n")
+
+        args = ["-f", "concat", "-safe", "0", "-i", str(list_path)]
+        if source["has_audio"]:
+            audio_path = tmp_dir / "audio.m4a"
+            render_ranges(input_path, ranges, audio_path, dict(source, has_video=False), cancel_event=cancel_event)
+            args += ["-i", str(audio_path), "-map", "0:v", "-map", "1:a"]
+        args += ["-c", "copy", str(output_path)]
+        run_ffmpeg(args, cancel_event=cancel_event)
+
+    copied = sum(count for kind, _, count in pieces if kind == "copy") / fps
+    encoded = sum(count for kind, _, count in pieces if kind == "encode") / fps
+    return {"copied": copied, "encoded": encoded, "pieces": len(pieces)}
+
+
+def split_ranges(ranges, chunk_count, fps=None):
+    """Делит интервалы на chunk_count кусков примерно равной длительности.
+
+    Интервал, попавший на границу куска, разрезается; при известной частоте кадров
+    точка разреза выравнивается по кадру, чтобы куски склеивались без пропусков.
+    """
+    target = total_duration(ranges) / chunk_count
+    chunks = [[]]
+    filled = 0.0
+    for r in ranges:
+        start, end = r["start"], r["end"]
+        while len(chunks) < chunk_count and filled + (end - start) > target:
+            cut = start + (target - filled)
+            if fps:
+                cut = round(cut * fps) / fps
+            if start < cut < end:
+                chunks[-1].append(dict(r, start=start, end=cut))
+                start = cut
+            chunks.append([])
+            filled = 0.0
+        if end > start:
+            chunks[-1].append(dict(r, start=start, end=end))
+            filled += end - start
+    return [chunk for chunk in chunks if chunk]
+
+
+class _AnyEvent:
+    """Событие отмены, установленное, если установлено любое из исходных"""
+
+    def __init__(self, *events):
+        self._events = [e for e in events if e is not None]
+
+    def is_set(self):
+        return any(e.is_set() for e in self._events)
+
+
+def _encode_chunk(input_path, chunk, chunk_path, fps, threads, progress, cancel_event):
+    """Кодирует видео одного куска; вход открывается с поиска к началу куска, а не декодируется с начала файла"""
+    # Поиск на полкадра раньше начала: точный поиск ffmpeg оставляет кадры с этого момента, trim отсекает лишнее
+    seek = max(chunk[0]["start"] - (0.5 / fps if fps else 0.0), 0.0)
+    shifted = [dict(r, start=r["start"] - seek, end=r["end"] - seek) for r in chunk]
+    fd, script_path = tempfile.mkstemp(suffix=".ffgraph", text=True)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(build_filtergraph(shifted, True, False))
+        args = ["-ss", f"{seek:.6f}", "-i", str(input_path), "-filter_complex_script", script_path,
+                "-map", "[outv]", "-c:v", VIDEO_CODEC, "-x264-params", "repeat-headers=1", "-preset", X264_PRESET,
+                "-crf", str(X264_CRF), "-pix_fmt", "yuv420p", "-threads", str(threads), str(chunk_path)]
+        run_ffmpeg(args, duration=total_duration(chunk), progress=progress, cancel_event=cancel_event)
+    finally:
+        os.remove(script_path)
+
+
+def render_parallel(input_path, ranges, output_path, source=None, progress=None, cancel_event=None,
+                    chunk_count=PARALLEL_CHUNKS):
+    """Параллельный экспорт: видео делится на куски равной длительности, которые кодируются
+    одновременно в отдельных процессах ffmpeg и склеиваются демультиплексором concat без перекодирования.
+
+    Звук кодируется одним проходом по всем интервалам: отдельные AAC-куски дали бы
+    паузы на стыках. Возвращает статистику {"chunks": число кусков, "workers": процессов}.
+    """
+    source = source or probe_source(input_path)
+    if not source["has_video"]:
+        render_ranges(input_path, ranges, output_path, source, progress, cancel_event)
+        return None
+    fps = source["fps"]
+    chunk_count = max(1, min(chunk_count, int(total_duration(ranges) // MIN_CHUNK_SEC)))
+    chunks = split_ranges(ranges, chunk_count, fps)
+    threads = max(1, (os.cpu_count() or 1) // len(chunks))
+
+    # При ошибке одного куска остальные процессы ffmpeg останавливаются
+    failed = threading.Event()
+    stop = _AnyEvent(cancel_event, failed)
+    done = [0.0] * len(chunks)
+    durations = [total_duration(chunk) for chunk in chunks]
+    total = sum(durations) or 1.0
+    lock = threading.Lock()
+
+    def chunk_progress(index):
+        def report(fraction):
+            with lock:
+                done[index] = fraction * durations[index]
+                if progress:
+                    progress(sum(done) / total)
+        return report
+
+    with tempfile.TemporaryDirectory(prefix="parallel_") as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        chunk_paths = [tmp_dir / f"chunk_{index:03d}.mkv" for index in range(len(chunks))]
+        audio_path = tmp_dir / "audio.m4a"
+
+        def run(task):
+            try:
+                task()
+            except Exception:
+                failed.set()
+                raise
+
+        with ThreadPoolExecutor(max_workers=len(chunks) + 1) as executor:
+            futures = [executor.submit(run, lambda i=i: _encode_chunk(input_path, chunks[i], chunk_paths[i], fps,
+                                                                      threads, chunk_progress(i), stop))
+                       for i in range(len(chunks))]
+            if source["has_audio"]:
+                futures.append(executor.submit(run, lambda: render_ranges(
+                    input_path, ranges, audio_path, dict(source, has_video=False), cancel_event=stop)))
+            errors = [future.exception() for future in futures]
+        if cancel_event is not None and cancel_event.is_set():
+            raise JobCancelled()
+        # Первой сообщается настоящая ошибка, а не отмена остальных кусков из-за неё
+        error = next((e for e in errors if e is not None and not isinstance(e, JobCancelled)), None)
+        if error is not None:
+            raise error
+
+        list_path = tmp_dir / "chunks.txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for chunk_path, duration in zip(chunk_paths, durations):
+                # Длительность куска задается явно: метки следующего куска начинаются ровно после его последнего кадра
+                f.write(f"file '{chunk_path.as_posix()}'\nduration {duration:.6f}\n")
+        args = ["-f", "concat", "-safe", "0", "-i", str(list_path)]
+        if source["has_audio"]:
+            args += ["-i", str(audio_path), "-map", "0:v", "-map", "1:a"]
+        args += ["-c", "copy", str(output_path)]
+        run_ffmpeg(args, cancel_event=cancel_event)
+    return {"chunks": len(chunks), "workers": len(chunks)}
+
+
+def split_on_grid(ranges, fps, step=SEGMENT_GRID_SEC):
+    """Делит интервалы на фрагменты [первый кадр, последний кадр) по сетке исходника с шагом step.
+
+    Сетка привязана к времени исходника, а не к результату, поэтому неизменённые
+    части монтажа при повторной правке дают те же фрагменты.
+    """
+    step_frames = max(1, round(step * fps))
+    segments = []
+    for r in ranges:
+        first, last = round(r["start"] * fps), round(r["end"] * fps)
+        while first < last:
+            cut = min(last, (first // step_frames + 1) * step_frames)
+            segments.append((first, cut))
+            first = cut
+    return segments
+
+
+def render_incremental(input_path, ranges, output_path, source=None, progress=None, cancel_event=None,
+                       workers=PARALLEL_CHUNKS):
+    """Повторный экспорт: видео собирается из закодированных фрагментов, сохранённых в кэше
+    прошлыми рендерами; кодируются только новые или изменённые фрагменты.
+
+    Фрагменты склеиваются демультиплексором concat без перекодирования, звук кодируется
+    одним проходом по всем интервалам (как в render_parallel). Возвращает статистику
+    {"segments": число фрагментов, "reused": сек из кэша, "encoded": сек закодировано}.
+    """
+    source = source or probe_source(input_path)
+    cache = get_segment_cache()
+    fps = source["fps"]
+    if not source["has_video"] or not fps or not cache.enabled:
+        render_ranges(input_path, ranges, output_path, source, progress, cancel_event)
+        return None
+
+    settings = {"codec": VIDEO_CODEC, "preset": X264_PRESET, "crf": X264_CRF, "pix_fmt": "yuv420p", "fps": fps}
+    source_hash = file_hash(input_path)
+    segments = []
+    missing = []
+    for first, last in split_on_grid(ranges, fps):
+        key = cache.make_key(source_hash, first, last, settings)
+        path = cache.get(key)
+        segments.append([key, path, (last - first) / fps])
+        if path is None:
+            missing.append((len(segments) - 1, first, last))
+    logging.info(f"Segment cache: {len(segments) - len(missing)} of {len(segments)} segments reused for {input_path}")
+
+    failed = threading.Event()
+    stop = _AnyEvent(cancel_event, failed)
+    durations = [(last - first) / fps for _, first, last in missing]
+    done = [0.0] * len(missing)
+    total = sum(durations) or 1.0
+    lock = threading.Lock()
+    workers = max(1, min(workers, len(missing)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    def encode(index):
+        segment, first, last = missing[index]
+        key = segments[segment][0]
+        temp_path = cache.temp_path(key)
+
+        def report(fraction):
+            with lock:
+                done[index] = fraction * durations[index]
+                if progress:
+                    progress(sum(done) / total)
+        try:
+            _encode_chunk(input_path, [{"start": first / fps, "end": last / fps}], temp_path, fps, threads, report, stop)
+            segments[segment][1] = cache.put(key, temp_path)
+        except Exception:
+            failed.set()
+            raise
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix="incremental_") as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        audio_path = tmp_dir / "audio.m4a"
+
+        def encode_audio():
+            try:
+                render_ranges(input_path, ranges, audio_path, dict(source, has_video=False), cancel_event=stop)
+            except Exception:
+                failed.set()
+                raise
+
+        with ThreadPoolExecutor(max_workers=workers + 1) as executor:
+            futures = [executor.submit(encode, index) for index in range(len(missing))]
+            if source["has_audio"]:
+                futures.append(executor.submit(encode_audio))
+            errors = [future.exception() for future in futures]
+        if cancel_event is not None and cancel_event.is_set():
+            raise JobCancelled()
+        error = next((e for e in errors if e is not None and not isinstance(e, JobCancelled)), None)
+        if error is not None:
+            raise error
+
+        list_path = tmp_dir / "segments.txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for _, path, duration in segments:
+                f.write(f"file '{path.as_posix()}'\nduration {duration:.6f}\n")
+        args = ["-f", "concat", "-safe", "0", "-i", str(list_path)]
+        if source["has_audio"]:
+            args += ["-i", str(audio_path), "-map", "0:v", "-map", "1:a"]
+        args += ["-c", "copy", str(output_path)]
+        run_ffmpeg(args, cancel_event=cancel_event)
+    # Вытеснение после склейки: фрагменты этого рендера остаются в кэше
+    cache.evict(keep=[path for _, path, _ in segments])
+
+    encoded = sum(durations)
+    return {"segments": len(segments), "reused": sum(d for _, _, d in segments) - encoded, "encoded": encoded}
+
+
+def _proxy_key(input_path):
+    return f"{file_hash(input_path)}_{PREVIEW_HEIGHT}p"
+
+
+def make_proxy(input_path, source=None, progress=None, cancel_event=None):
+    """Возвращает путь к прокси исходника: высота PREVIEW_HEIGHT, та же частота кадров и временная шкала.
+
+    Прокси кодируется один раз и хранится в кэше по хэшу содержимого исходника;
+    при отключенном кэше возвращается None.
+    """
+    cache = get_proxy_cache()
+    if not cache.enabled:
+        return None
+    source = source or probe_source(input_path)
+    key = _proxy_key(input_path)
+    path = cache.get(key)
+    if path is not None:
+        logging.info(f"Proxy cache hit for {input_path}")
+        return path
+
+    temp_path = cache.temp_path(key)
+    try:
+        args = ["-i", str(input_path), "-map", "0:v:0", "-vf", f"scale=-2:'min({PREVIEW_HEIGHT},ih)'",
+                "-c:v", VIDEO_CODEC, "-preset", PREVIEW_PRESET, "-crf", str(PREVIEW_CRF), "-pix_fmt", "yuv420p"]
+        if source["has_audio"]:
+            args += ["-map", "0:a:0", "-c:a", AUDIO_CODEC, "-b:a", PREVIEW_AUDIO_BITRATE]
+        args.append(str(temp_path))
+        run_ffmpeg(args, duration=source["duration"], progress=progress, cancel_event=cancel_event)
+        path = cache.put(key, temp_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+    cache.evict(keep=[path])
+    return path
+
+
+def render_preview(input_path, ranges, output_path, source=None, progress=None, cancel_event=None):
+    """Быстрый предпросмотр монтажа: интервалы вырезаются из прокси низкого разрешения
+    и кодируются с предустановкой ultrafast. Возвращает статистику {"proxy": создан ли прокси заново}.
+    """
+    source = source or probe_source(input_path)
+    if not source["has_video"]:
+        render_ranges(input_path, ranges, output_path, source, progress, cancel_event)
+        return None
+    created = get_proxy_cache().enabled and get_proxy_cache().get(_proxy_key(input_path)) is None
+    # Создание прокси - основная часть работы первого предпросмотра
+    share = 0.8 if created else 0.0
+
+    def scaled(start, weight):
+        return (lambda fraction: progress(start + weight * fraction)) if progress else None
+
+    # Без кэша прокси монтаж кодируется из исходника в полном разрешении, но так же быстро
+    proxy = make_proxy(input_path, source, scaled(0.0, share), cancel_event) or input_path
+    render_ranges(proxy, ranges, output_path, source, scaled(share, 1.0 - share), cancel_event,
+                  video_args=["-c:v", VIDEO_CODEC, "-preset", PREVIEW_PRESET, "-crf", str(PREVIEW_CRF),
+                              "-pix_fmt", "yuv420p"])
+    return {"proxy": created}
+
+
+def plan_audio_cuts(ranges, sample_rate, crossfade=AUDIO_CROSSFADE_SEC):
+    """Переводит интервалы в отсчёты: [(первый отсчёт, последний отсчёт, длина сглаживания со следующим)].
+
+    Сглаживание берется из вырезаемой паузы после интервала: перекрытие не удлиняет
+    и не укорачивает результат, поэтому метки слов в новом .srt не сдвигаются.
+    Звук читается одним проходом, поэтому интервалы сортируются, пересекающиеся
+    и смежные сливаются, а пустые отбрасываются.
+    """
+    bounds = []
+    for first, last in sorted((round(r["start"] * sample_rate), round(r["end"] * sample_rate)) for r in ranges):
+        if last <= first:
+            continue
+        if bounds and first <= bounds[-1][1]:
+            bounds[-1] = (bounds[-1][0], max(bounds[-1][1], last))
+        else:
+            bounds.append((first, last))
+    fade = round(crossfade * sample_rate)
+    cuts = []
+    for i, (first, last) in enumerate(bounds):
+        if i + 1 < len(bounds):
+            next_first, next_last = bounds[i + 1]
+            # Перекрытие не длиннее паузы и самих соседних интервалов
+            fades = max(0, min(fade, next_first - last, last - first, next_last - next_first))
+        else:
+            fades = 0
+        cuts.append((first, last, fades))
+    return cuts
+
+
+class _PcmReader:
+    """Последовательное чтение отсчётов float32 из канала ffmpeg"""
+
+    def __init__(self, stream, channels):
+        self._stream = stream
+        self._channels = channels
+        self.position = 0
+
+    def read(self, count):
+        """Читает до count отсчётов (меньше - только в конце потока); возвращает массив (отсчёты, каналы)"""
+        frame_bytes = 4 * self._channels
+        data = bytearray()
+        while len(data) < count * frame_bytes:
+            block = self._stream.read(count * frame_bytes - len(data))
+            if not block:
+                break
+            data += block
+        samples = np.frombuffer(bytes(data[:len(data) // frame_bytes * frame_bytes]), dtype="<f4")
+        samples = samples.reshape(-1, self._channels)
+        self.position += len(samples)
+        return samples
+
+    def skip_to(self, sample):
+        while self.position < sample:
+            if not len(self.read(min(sample - self.position, AUDIO_BLOCK_SAMPLES))):
+                break
+
+
+def render_audio(input_path, ranges, output_path, source=None, progress=None, cancel_event=None,
+                 crossfade=AUDIO_CROSSFADE_SEC):
+    """Монтаж только звука: интервалы режутся по отсчётам без выравнивания по кадрам,
+    стыки сглаживаются коротким линейным перекрытием, видео не декодируется и не кодируется.
+
+    Звук читается одним проходом: ffmpeg декодирует его в float32, оставленные отсчёты
+    передаются второму ffmpeg, который кодирует результат по расширению output_path.
+    Возвращает статистику {"crossfades": число сглаженных стыков, "sample_rate": частота}.
+    """
+    source = source or probe_source(input_path)
+    if not source["has_audio"]:
+        raise RuntimeError(f"В файле {input_path} нет аудиопотока")
+    audio = next(s for s in source["streams"] if s.get("codec_type") == "audio")
+    sample_rate = int(audio.get("sample_rate") or 48000)
+    channels = int(audio.get("channels") or 2)
+    cuts = plan_audio_cuts(ranges, sample_rate, crossfade)
+    total = sum(last - first for first, last, _ in cuts) or 1
+    # Декодирование останавливается вскоре после последнего интервала: остаток файла дочитывается
+    # до конца потока, чтобы ffmpeg завершился сам и его код возврата можно было проверить
+    decode_until = (cuts[-1][1] + sample_rate) / sample_rate if cuts else 0
+
+    decode_cmd = ["ffmpeg", "-nostdin", "-v", "error", "-i", str(input_path),
+                  "-map", "0:a:0", "-ac", str(channels), "-ar", str(sample_rate), "-t", f"{decode_until:.6f}",
+                  "-f", "f32le", "-"]
+    encode_cmd = (["ffmpeg", "-hide_banner", "-nostdin", "-y", "-v", "error",
+                   "-f", "f32le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "-"]
+                  + AUDIO_ENCODERS.get(Path(output_path).suffix.lower(), ["-c:a", AUDIO_CODEC]) + [str(output_path)])
+    logging.info(f"Running: {' '.join(decode_cmd)} | {' '.join(encode_cmd)}")
+    decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    # stderr обоих процессов читается в фоне, иначе поток ошибок поврежденного файла блокирует ffmpeg
+    decoder_stderr = StderrTail(decoder)
+    encoder_stderr = StderrTail(encoder)
+    reader = _PcmReader(decoder.stdout, channels)
+    written = 0
+
+    def write(samples):
+        nonlocal written
+        if cancel_event is not None and cancel_event.is_set():
+            raise JobCancelled()
+        try:
+            encoder.stdin.write(samples.astype("<f4", copy=False).tobytes())
+        except BrokenPipeError:
+            encoder.wait()
+            raise RuntimeError(f"ffmpeg завершился с кодом {encoder.returncode}: {encoder_stderr.text()}")
+        written += len(samples)
+        if progress:
+            progress(min(written / total, 1.0))
+
+    try:
+        tail = None
+        for first, last, fade in cuts:
+            reader.skip_to(first)
+            length = last - first
+            if tail is not None:
+                # Начало интервала смешивается с хвостом предыдущего
+                head = reader.read(len(tail))
+                weight = (np.arange(len(head), dtype=np.float32) / len(tail))[:, None]
+                write(tail[:len(head)] * (1 - weight) + head * weight)
+                length -= len(head)
+            while length > 0:
+                block = reader.read(min(length, AUDIO_BLOCK_SAMPLES))
+                if not len(block):
+                    break
+                write(block)
+                length -= len(block)
+            tail = reader.read(fade) if fade else None
+            if tail is not None and not len(tail):
+                tail = None
+        while len(reader.read(AUDIO_BLOCK_SAMPLES)):
+            pass
+        if decoder.wait() != 0:
+            raise RuntimeError(f"Не удалось декодировать звук {input_path}: {decoder_stderr.text()}")
+        missing = total - written
+        if missing > AUDIO_MAX_PADDING_SEC * sample_rate:
+            raise RuntimeError(f"Звук {input_path} короче ожидаемого на {missing / sample_rate:.2f} сек "
+                               f"(файл поврежден или обрезан): {decoder_stderr.text()}")
+        if missing > 0:
+            write(np.zeros((missing, channels), dtype=np.float32))
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise RuntimeError(f"ffmpeg завершился с кодом {encoder.returncode}: {encoder_stderr.text()}")
+    finally:
+        for proc in (decoder, encoder):
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+    return {"crossfades": sum(1 for _, _, fade in cuts if fade), "sample_rate": sample_rate}
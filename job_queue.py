@@ -0,0 +1,164 @@
+"""Очередь фоновых заданий: выполняет длительные операции вне главного потока Tk"""
+import itertools
+import logging
+import queue
+import threading
+
+_job_ids = itertools.count(1)
+
+
+class JobCancelled(BaseException):
+    """Задание отменено пользователем.
+
+    Наследуется от BaseException, чтобы не перехватываться обработчиками
+    except Exception внутри транскрипции и рендера.
+    """
+
+
+class Job:
+    """Задание очереди: функция, выполняемая в рабочем потоке и сообщающая об этапах"""
+
+    def __init__(self, name, func, stages):
+        self.id = next(_job_ids)
+        self.name = name
+        self.func = func  # func(job) -> bool
+        self.stages = list(stages)
+        self.stage_index = -1
+        self.stage_progress = 0.0
+        self.status = "queued"  # queued / running / done / failed / cancelled
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._notify = None
+
+    @property
+    def stage_name(self):
+        if 0 <= self.stage_index < len(self.stages):
+            return self.stages[self.stage_index]
+        return ""
+
+    @property
+    def progress(self):
+        """Общий прогресс задания от 0 до 1"""
+        if self.status == "done":
+            return 1.0
+        if not self.stages or self.stage_index < 0:
+            return 0.0
+        return (self.stage_index + self.stage_progress) / len(self.stages)
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Прерывает задание, если пользователь его отменил"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def begin_stage(self, stage_name):
+        """Отмечает начало этапа; неизвестные этапы добавляются в конец списка"""
+        self.check_cancelled()
+        if stage_name not in self.stages:
+            self.stages.append(stage_name)
+        self.stage_index = self.stages.index(stage_name)
+        self.stage_progress = 0.0
+        self._changed()
+
+    def set_progress(self, fraction):
+        """Обновляет прогресс текущего этапа (0..1)"""
+        self.stage_progress = min(max(fraction, 0.0), 1.0)
+        self._changed()
+
+    def _changed(self):
+        if self._notify:
+            self._notify(self)
+
+    def describe(self):
+        """Краткое описание задания для списка очереди"""
+        status = {
+            "queued": "в очереди",
+            "running": "выполняется",
+            "done": "готово",
+            "failed": "ошибка",
+            "cancelled": "отменено",
+        }[self.status]
+        text = f"#{self.id} {self.name} — {status}"
+        if self.status == "running" and self.stage_name:
+            text += f" ({self.stage_index + 1}/{len(self.stages)}: {self.stage_name})"
+        return text
+
+
+class JobQueue:
+    """Очередь заданий с рабочими потоками.
+
+    on_update(job) вызывается из рабочего потока при каждом изменении
+    состояния задания; GUI должен сам передать событие в главный поток.
+    """
+
+    def __init__(self, on_update=None, workers=1):
+        self.on_update = on_update
+        self.jobs = []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job):
+        """Ставит задание в очередь"""
+        job._notify = self._notify
+        with self._lock:
+            self.jobs.append(job)
+        self._queue.put(job)
+        self._notify(job)
+        return job
+
+    def cancel(self, job_id):
+        """Отменяет задание: ожидающее снимается сразу, выполняемое - на ближайшем этапе"""
+        # Проверка и смена статуса - под той же блокировкой, под которой рабочий поток
+        # переводит задание в "running", иначе выполняемое задание могло бы стать "cancelled"
+        with self._lock:
+            job = next((j for j in self.jobs if j.id == job_id), None)
+            if job is None or job.status not in ("queued", "running"):
+                return False
+            job.cancel_event.set()
+            dequeued = job.status == "queued"
+            if dequeued:
+                job.status = "cancelled"
+        if dequeued:
+            self._notify(job)
+        return True
+
+    def pending_count(self):
+        """Количество ожидающих и выполняемых заданий"""
+        with self._lock:
+            return sum(1 for j in self.jobs if j.status in ("queued", "running"))
+
+    def _notify(self, job):
+        if self.on_update:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                logging.error(f"Ошибка обработчика обновления задания #{job.id}: {e}")
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                # Задание, отмененное в очереди, уже помечено и объявлено в cancel()
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+            self._notify(job)
+            try:
+                success = job.func(job)
+                status = "done" if success else "failed"
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as e:
+                job.error = e
+                status = "failed"
+                logging.error(f"Задание #{job.id} {job.name} завершилось с ошибкой: {e}")
+            with self._lock:
+                job.status = status
+            self._notify(job)
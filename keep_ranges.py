@@ -0,0 +1,113 @@
+"""Объединение оставшихся после редактирования слов в непрерывные интервалы (keep-ranges)"""
+import numpy as np
+
+from word_timeline import WordTimeline
+
+# --- Конфигурация по умолчанию ---
+GAP_TOLERANCE_SEC = 0.3  # Паузы между соседними словами короче этого значения не вырезаются
+PADDING_SEC = 0.0  # Запас по краям интервала (только за счет тишины, соседние слова не захватываются)
+
+
+def build_keep_ranges(words, kept_indices, duration=None, gap_tolerance=GAP_TOLERANCE_SEC, padding=PADDING_SEC):
+    """Строит минимальный список интервалов, покрывающих оставшиеся слова.
+
+    Слова объединяются в один интервал, только если они соседние в исходном
+    тексте (между ними не было удалённого слова) и пауза между ними не больше
+    gap_tolerance. Возвращает список словарей {"start", "end", "words"}, где
+    "words" - индексы исходных слов внутри интервала.
+    """
+    starts, ends = _word_times(words)
+    ranges = []
+    prev_index = None
+    for i in kept_indices:
+        start = starts[i]
+        end = ends[i]
+        if duration is not None:
+            if start >= duration:
+                continue
+            end = min(end, duration)
+        end = max(end, start)
+        if ranges and prev_index == i - 1 and start - ranges[-1]["end"] <= gap_tolerance:
+            ranges[-1]["end"] = max(ranges[-1]["end"], end)
+            ranges[-1]["words"].append(i)
+        else:
+            ranges.append({"start": start, "end": end, "words": [i]})
+        prev_index = i
+
+    if padding > 0:
+        ranges = _pad_ranges(ranges, words, duration, padding)
+    return ranges
+
+
+def _word_times(words):
+    """Списки начала и конца слов для WordTimeline или списка словарей"""
+    if isinstance(words, WordTimeline):
+        return words.starts.tolist(), words.ends.tolist()
+    return [w["start"] for w in words], [w["end"] for w in words]
+
+
+def _pad_ranges(ranges, words, duration, padding):
+    """Расширяет интервалы на padding, не заходя на соседние слова, и сливает пересёкшиеся"""
+    starts, ends = _word_times(words)
+    padded = []
+    for r in ranges:
+        first, last = r["words"][0], r["words"][-1]
+        start = r["start"] - padding
+        end = r["end"] + padding
+        if first > 0:
+            start = max(start, min(ends[first - 1], r["start"]))
+        if last + 1 < len(starts):
+            end = min(end, max(starts[last + 1], r["end"]))
+        start = max(start, 0.0)
+        if duration is not None:
+            end = min(end, duration)
+        if padded and start <= padded[-1]["end"]:
+            padded[-1]["end"] = max(padded[-1]["end"], end)
+            padded[-1]["words"].extend(r["words"])
+        else:
+            padded.append({"start": start, "end": end, "words": list(r["words"])})
+    return padded
+
+
+def remap_words(words, ranges):
+    """Переносит временные метки слов на новую временную шкалу, склеенную из интервалов.
+
+    Возвращает WordTimeline только из слов, попавших в интервалы.
+    """
+    words = WordTimeline.from_words(words)
+    counts = [len(r["words"]) for r in ranges]
+    indices = np.fromiter((i for r in ranges for i in r["words"]), dtype=np.int64, count=sum(counts))
+    range_starts = np.repeat(np.array([r["start"] for r in ranges], dtype=np.float64), counts)
+    range_ends = np.repeat(np.array([r["end"] for r in ranges], dtype=np.float64), counts)
+    # Начало каждого интервала на новой шкале - суммарная длительность предыдущих
+    lengths = np.array([r["end"] - r["start"] for r in ranges], dtype=np.float64)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, counts)
+
+    starts = np.minimum(np.maximum(words.starts[indices], range_starts), range_ends)
+    ends = np.minimum(np.maximum(words.ends[indices], starts), range_ends)
+    return words.take(indices, offsets + (starts - range_starts), offsets + (ends - range_starts))
+
+
+def total_duration(ranges):
+    """Суммарная длительность интервалов"""
+    return sum(r["end"] - r["start"] for r in ranges)
+
+
+def snap_ranges_to_frames(ranges, fps):
+    """Выравнивает границы интервалов по сетке кадров.
+
+    Видео режется только по целым кадрам, а звук - по отсчётам; без выравнивания
+    на каждом стыке накапливается рассинхрон до одного кадра.
+    """
+    if not fps:
+        return ranges
+    snapped = []
+    for r in ranges:
+        start = round(r["start"] * fps) / fps
+        end = max(round(r["end"] * fps), round(r["start"] * fps) + 1) / fps
+        if snapped and start <= snapped[-1]["end"]:
+            snapped[-1]["end"] = max(snapped[-1]["end"], end)
+            snapped[-1]["words"].extend(r["words"])
+        else:
+            snapped.append({"start": start, "end": end, "words": list(r["words"])})
+    return snapped
@@ -0,0 +1,175 @@
+"""Вспомогательные функции для работы с медиафайлами: ffprobe и хэш содержимого"""
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+
+def run_ffprobe(args):
+    """Запускает ffprobe и возвращает его вывод в JSON"""
+    cmd = ["ffprobe", "-v", "error", "-print_format", "json"] + list(args)
+    proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout or "{}")
+
+
+def probe_duration(filepath):
+    """Возвращает длительность медиафайла в секундах или None, если её не удалось определить"""
+    try:
+        info = run_ffprobe(["-show_entries", "format=duration", str(filepath)])
+        return float(info["format"]["duration"])
+    except Exception as e:
+        logging.warning(f"Failed to probe duration of {filepath}: {e}")
+        return None
+
+
+def probe_streams(filepath):
+    """Возвращает список потоков медиафайла (словари ffprobe с codec_type, codec_name и т.д.)"""
+    info = run_ffprobe(["-show_streams", str(filepath)])
+    return info.get("streams", [])
+
+
+def has_stream(streams, codec_type):
+    """Проверяет наличие потока заданного типа ('video' или 'audio')"""
+    return any(s.get("codec_type") == codec_type and s.get("disposition", {}).get("attached_pic", 0) == 0
+               for s in streams)
+
+
+def probe_frame_rate(streams):
+    """Возвращает частоту кадров первого видеопотока или None"""
+    for s in streams:
+        if s.get("codec_type") != "video" or s.get("disposition", {}).get("attached_pic", 0):
+            continue
+        for key in ("avg_frame_rate", "r_frame_rate"):
+            num, _, den = s.get(key, "0/0").partition("/")
+            try:
+                if float(den or 1) and float(num):
+                    return float(num) / float(den or 1)
+            except ValueError:
+                continue
+    return None
+
+
+def probe_source(filepath):
+    """Собирает сведения об исходном файле для рендера: длительность, частота кадров, наличие потоков"""
+    info = run_ffprobe(["-show_streams", "-show_entries", "format=duration,start_time", str(filepath)])
+    streams = info.get("streams", [])
+    duration = info.get("format", {}).get("duration")
+    start_time = info.get("format", {}).get("start_time")
+    return {
+        "streams": streams,
+        "duration": float(duration) if duration else None,
+        "start_time": float(start_time) if start_time else 0.0,
+        "fps": probe_frame_rate(streams),
+        "has_video": has_stream(streams, "video"),
+        "has_audio": has_stream(streams, "audio"),
+    }
+
+
+def probe_keyframes(filepath):
+    """Возвращает время ключевых кадров первого видеопотока (по пакетам, без декодирования)"""
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0",
+           "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", str(filepath)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    keyframes = []
+    for line in proc.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+    return sorted(keyframes)
+
+
+def first_video_stream(streams):
+    """Возвращает описание первого видеопотока (без обложек) или None"""
+    return next((s for s in streams if s.get("codec_type") == "video"
+                 and not s.get("disposition", {}).get("attached_pic", 0)), None)
+
+
+def decode_audio(filepath, sample_rate=16000):
+    """Декодирует первую звуковую дорожку в моно float32 с заданной частотой (как whisper.load_audio)"""
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-i", str(filepath),
+           "-map", "0:a:0", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"]
+    proc = subprocess.run(cmd, capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Не удалось декодировать звук {filepath}: {proc.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(proc.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+class StderrTail:
+    """Читает stderr процесса в фоновом потоке и хранит последние строки.
+
+    Пока основной поток читает stdout, ffmpeg не блокируется на заполненном канале
+    stderr (поврежденный файл дает тысячи сообщений об ошибках декодирования).
+    """
+
+    def __init__(self, proc, lines=20):
+        self._lines = deque(maxlen=lines)
+        self._thread = threading.Thread(target=lambda: self._lines.extend(proc.stderr), daemon=True)
+        self._thread.start()
+
+    def text(self):
+        """Последние строки stderr; вызывать после завершения процесса"""
+        self._thread.join()
+        return b"".join(self._lines).decode(errors="replace").strip()
+
+
+# --- Хэш содержимого файлов ---
+CACHE_ROOT = Path(os.environ.get("TRANSCRIBE_CACHE_DIR", Path.home() / ".cache" / "transcribe_editor"))
+# Запомненные хэши: по небольшому файлу на исходник, чтобы не перечитывать и не переписывать
+# общий индекс при каждом обращении и не терять записи параллельных процессов (--workers)
+_HASH_DIR = CACHE_ROOT / "file_hashes"
+
+
+def _hash_entry_path(key):
+    return _HASH_DIR / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+
+def _load_hash_entry(key):
+    try:
+        with open(_hash_entry_path(key), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if isinstance(entry, dict) and entry.get("path") == key else None
+
+
+def atomic_write_json(path, data):
+    """Записывает JSON через временный файл и os.replace, чтобы файл не оставался недописанным"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def file_hash(filepath):
+    """Возвращает SHA-256 содержимого файла.
+
+    Хэш запоминается по (пути, размеру, времени изменения), поэтому неизменённые
+    файлы повторно не читаются.
+    """
+    filepath = Path(filepath).resolve()
+    stat = filepath.stat()
+    key = str(filepath)
+    entry = _load_hash_entry(key)
+    if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+
+    try:
+        atomic_write_json(_hash_entry_path(key), {"path": key, "size": stat.st_size,
+                                                  "mtime_ns": stat.st_mtime_ns, "sha256": sha256})
+    except OSError as e:
+        logging.warning(f"Failed to save file hash: {e}")
+    return sha256
@@ -0,0 +1,239 @@
+"""Общий пул загруженных моделей Whisper для GUI и консольных скриптов"""
+import gc
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from quantize import load_quantized_model, split_variant
+
+# --- Конфигурация ---
+# Бюджет памяти пула в МБ отдельно для оперативной памяти (cpu) и видеопамяти (cuda)
+RAM_BUDGET_MB = int(os.environ.get("WHISPER_POOL_RAM_MB", "8192"))
+VRAM_BUDGET_MB = int(os.environ.get("WHISPER_POOL_VRAM_MB", "6144"))
+
+
+def _load_whisper_model(model_name, device):
+    """Загружает модель Whisper (импорт откладывается до первого использования).
+
+    Имя с суффиксом "-int8" означает динамически квантованный вариант (только CPU).
+    """
+    base_name, int8 = split_variant(model_name)
+    if int8:
+        if _device_kind(device) != "cpu":
+            raise ValueError(f"Квантованная модель {model_name} работает только на CPU")
+        return load_quantized_model(base_name)
+    import whisper
+    return whisper.load_model(model_name, device=device)
+
+
+def default_device():
+    """Возвращает 'cuda', если доступен GPU, иначе 'cpu' (torch импортируется при вызове)"""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def device_for(model_name):
+    """Устройство для модели: квантованные варианты всегда выполняются на CPU"""
+    return "cpu" if split_variant(model_name)[1] else default_device()
+
+
+def _model_size_mb(model):
+    """Оценивает объём памяти, занимаемый параметрами и буферами модели"""
+    try:
+        size = sum(p.numel() * p.element_size() for p in model.parameters())
+        size += sum(b.numel() * b.element_size() for b in model.buffers())
+        # Веса динамически квантованных слоев упакованы и не входят в parameters(): 1 байт на вес
+        size += sum(m.weight().numel() for m in model.modules() if hasattr(m, "_packed_params"))
+        return size / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+
+def _device_kind(device):
+    """Возвращает тип устройства ('cpu' или 'cuda') для учёта бюджета"""
+    return "cuda" if str(device).startswith("cuda") else "cpu"
+
+
+class ModelPool:
+    """LRU-пул моделей Whisper с ключом (имя модели, устройство)"""
+
+    def __init__(self, ram_budget_mb=RAM_BUDGET_MB, vram_budget_mb=VRAM_BUDGET_MB, loader=_load_whisper_model):
+        self.budgets = {"cpu": ram_budget_mb, "cuda": vram_budget_mb}
+        self._loader = loader
+        self._models = OrderedDict()  # (имя, устройство) -> (модель, размер в МБ)
+        self._loading = {}  # (имя, устройство) -> threading.Event для загрузок в процессе
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.reuses = 0
+        self.evictions = 0
+
+    def is_loaded(self, model_name, device):
+        """Проверяет, находится ли модель уже в пуле"""
+        with self._lock:
+            return (model_name, device) in self._models
+
+    def get(self, model_name, device):
+        """Возвращает модель из пула, загружая её при необходимости"""
+        key = (model_name, device)
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self.reuses += 1
+                    logging.info(f"Model pool: reusing {model_name} on {device}")
+                    return self._models[key][0]
+                event = self._loading.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self._loading[key] = event
+                    break
+            # Модель уже загружается в другом потоке - ждём и проверяем снова
+            event.wait()
+
+        try:
+            model = self._loader(model_name, device)
+        finally:
+            with self._lock:
+                del self._loading[key]
+            event.set()
+
+        size_mb = _model_size_mb(model)
+        with self._lock:
+            self._models[key] = (model, size_mb)
+            self.loads += 1
+            evicted = self._evict(_device_kind(device), keep=key)
+        logging.info(f"Model pool: loaded {model_name} on {device} ({size_mb:.0f} MB)")
+        if evicted:
+            self._release_memory(evicted)
+        return model
+
+    def _evict(self, kind, keep):
+        """Вытесняет давно не использованные модели, пока не уложимся в бюджет устройства"""
+        evicted = []
+        budget = self.budgets[kind]
+        while True:
+            used = sum(size for (_, dev), (_, size) in self._models.items() if _device_kind(dev) == kind)
+            if used <= budget:
+                break
+            victim = next((k for k in self._models if k != keep and _device_kind(k[1]) == kind), None)
+            if victim is None:
+                break
+            del self._models[victim]
+            self.evictions += 1
+            evicted.append(victim)
+            logging.info(f"Model pool: evicted {victim[0]} on {victim[1]}")
+        return evicted
+
+    def _release_memory(self, evicted):
+        """Освобождает память после вытеснения моделей"""
+        gc.collect()
+        if any(_device_kind(dev) == "cuda" for _, dev in evicted):
+            try:
+                import torch
+                torch.cuda.empty_cache()
+            except Exception as e:
+                logging.warning(f"Model pool: failed to release CUDA cache: {e}")
+
+    def discard(self, model_name, device):
+        """Убирает модель из пула (задания, уже получившие модель, продолжают с ней работать)"""
+        with self._lock:
+            removed = self._models.pop((model_name, device), None) is not None
+        if removed:
+            logging.info(f"Model pool: discarded {model_name} on {device}")
+            self._release_memory([(model_name, device)])
+
+    def clear(self):
+        """Выгружает все модели из пула"""
+        with self._lock:
+            evicted = list(self._models)
+            self._models.clear()
+        if evicted:
+            self._release_memory(evicted)
+
+    def report(self):
+        """Возвращает строку со статистикой пула"""
+        with self._lock:
+            resident = ", ".join(f"{name}@{dev} ({size:.0f} МБ)" for (name, dev), (_, size) in self._models.items())
+            return (f"Пул моделей: загрузок {self.loads}, повторных использований {self.reuses}, "
+                    f"вытеснено {self.evictions}; в памяти: {resident or 'нет'}")
+
+
+class ModelPrefetcher:
+    """Фоновая загрузка выбранной модели в пул.
+
+    Загрузки выполняются по одной в своем потоке. Новый выбор заменяет ожидающий;
+    модель, загрузка которой стала ненужной, по окончании убирается из пула
+    (если до этого её там не было). Строка status описывает текущее состояние.
+    """
+
+    def __init__(self, pool=None, device_fn=device_for):
+        self._pool = pool
+        self._device_fn = device_fn
+        self._lock = threading.Lock()
+        self._wanted = None
+        self._wake = threading.Event()
+        self._thread = None
+        self.status = ""
+
+    def request(self, model_name):
+        """Запрашивает загрузку модели (не блокирует)"""
+        with self._lock:
+            self._wanted = model_name
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="model-prefetch", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def cancel(self):
+        """Отменяет ожидающую загрузку; уже идущая загрузка будет выброшена из пула по окончании"""
+        with self._lock:
+            self._wanted = None
+        self._wake.set()
+
+    def _is_wanted(self, model_name):
+        with self._lock:
+            return self._wanted == model_name
+
+    def _run(self):
+        pool = self._pool or get_model_pool()
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                model_name = self._wanted
+            if model_name is None:
+                continue
+            try:
+                device = self._device_fn(model_name)
+                if pool.is_loaded(model_name, device):
+                    self.status = f"Модель {model_name} уже в памяти ({device})"
+                    continue
+                self.status = f"Загрузка модели {model_name} ({device})..."
+                pool.get(model_name, device)
+            except Exception as e:
+                logging.error(f"Model prefetch of {model_name} failed: {e}")
+                self.status = f"Ошибка загрузки модели {model_name}: {e}"
+                continue
+            if self._is_wanted(model_name):
+                self.status = f"Модель {model_name} загружена ({device})"
+                logging.info(f"Model prefetch: {model_name} ready on {device}")
+            else:
+                # Пока модель загружалась, выбрали другую - не держим ненужную модель в памяти
+                pool.discard(model_name, device)
+                logging.info(f"Model prefetch: {model_name} superseded, discarded")
+                if self._is_wanted(None):
+                    self.status = ""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_model_pool():
+    """Возвращает общий для процесса пул моделей"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool()
+        return _pool
@@ -0,0 +1,72 @@
+"""Рабочие процессы для параллельной пакетной транскрипции (whisper_subtitles.py --workers N)"""
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from media_utils import probe_duration
+from transcription_cache import TRANSCRIBE_OPTIONS
+from vad import transcribe_media
+
+# Модель, загруженная один раз в каждом рабочем процессе
+_model = None
+_use_vad = False
+
+
+def _init_worker(model_name, device, torch_threads, use_vad=False):
+    """Инициализация рабочего процесса: бюджет потоков torch и загрузка модели"""
+    global _model, _use_vad
+    _use_vad = use_vad
+    import torch
+    from model_pool import get_model_pool
+    torch.set_num_threads(torch_threads)
+    _model = get_model_pool().get(model_name, device)
+    logging.info(f"Worker {os.getpid()}: model {model_name} loaded on {device}, {torch_threads} torch threads")
+
+
+def _transcribe_one(filepath):
+    """Транскрибирует один файл в рабочем процессе; ошибки возвращаются, а не пробрасываются"""
+    started = time.time()
+    try:
+        result = transcribe_media(_model, filepath, _use_vad, verbose=False, **TRANSCRIBE_OPTIONS)
+        return filepath, result, None, time.time() - started
+    except Exception as e:
+        return filepath, None, str(e), time.time() - started
+
+
+def schedule_longest_first(files):
+    """Сортирует файлы по убыванию длительности (ffprobe), неизвестная длительность оценивается по размеру"""
+    durations = {}
+    for f in files:
+        duration = probe_duration(f)
+        durations[f] = duration if duration is not None else f.stat().st_size / (1024 * 1024)
+    return sorted(files, key=lambda f: durations[f], reverse=True)
+
+
+def threads_per_worker(workers):
+    """Делит ядра CPU между рабочими процессами"""
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def transcribe_parallel(files, model_name, device, workers, use_vad=False):
+    """Транскрибирует файлы пулом процессов.
+
+    Генератор возвращает кортежи (путь, результат Whisper или None, текст ошибки или None,
+    время обработки) по мере завершения файлов.
+    """
+    ordered = schedule_longest_first(files)
+    torch_threads = threads_per_worker(workers)
+    # spawn - единственный безопасный режим для torch/CUDA на всех платформах
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(model_name, device, torch_threads, use_vad)) as executor:
+        futures = {executor.submit(_transcribe_one, str(f)): f for f in ordered}
+        for future in as_completed(futures):
+            filepath = futures[future]
+            try:
+                _, result, error, elapsed = future.result()
+            except Exception as e:
+                # Например, BrokenProcessPool, если рабочий процесс не смог загрузить модель
+                result, error, elapsed = None, f"Сбой рабочего процесса: {e}", 0.0
+            yield filepath, result, error, elapsed
@@ -0,0 +1,204 @@
+"""Кэш декодированного звука: 16 кГц моно float32 на диске, открывается через memmap без повторного декодирования"""
+import logging
+import os
+import queue
+import subprocess
+import threading
+
+import numpy as np
+
+from media_utils import CACHE_ROOT, StderrTail, decode_audio, file_hash
+
+# --- Конфигурация ---
+SAMPLE_RATE = 16000  # Частота, ожидаемая Whisper
+PCM_DIR = CACHE_ROOT / "pcm"
+MAX_PCM_CACHE_MB = int(os.environ.get("TRANSCRIBE_PCM_CACHE_MB", "4096"))  # 0 - кэш отключен
+DECODE_BLOCK_SEC = 30  # Сколько секунд звука читается из ffmpeg за раз при записи в кэш
+PREFETCH_FILES = 1  # Сколько декодированных файлов может ждать в очереди (плюс один декодируется)
+
+
+class PcmWriter:
+    """Запись звука в кэш по частям; запись появляется в кэше только после commit()"""
+
+    def __init__(self, cache, key):
+        self._cache = cache
+        self._path = cache._path(key)
+        self._cache.directory.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self._file = open(self._tmp_path, "wb")
+        self.samples = 0
+
+    def write(self, samples):
+        self._file.write(np.asarray(samples, dtype="<f4").tobytes())
+        self.samples += len(samples)
+
+    def commit(self):
+        """Переносит записанный звук в кэш (пустой звук не сохраняется)"""
+        self._file.close()
+        if not self.samples:
+            self.discard()
+            return
+        os.replace(self._tmp_path, self._path)
+        self._cache._evict()
+
+    def discard(self):
+        """Удаляет недописанный файл"""
+        if not self._file.closed:
+            self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
+class PcmCache:
+    """Звук, декодированный ffmpeg-ом, с ключом по содержимому файла и LRU-вытеснением по размеру"""
+
+    def __init__(self, directory=PCM_DIR, max_mb=MAX_PCM_CACHE_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def make_key(self, input_filepath, sample_rate=SAMPLE_RATE):
+        """Ключ кэша: хэш содержимого файла + частота дискретизации"""
+        return f"{file_hash(input_filepath)}_{sample_rate}"
+
+    def _path(self, key):
+        return self.directory / f"{key}.f32"
+
+    def get(self, key):
+        """Возвращает звук как memmap или None.
+
+        Массив открывается в режиме копирования при записи: страницы читаются
+        с диска по мере обращения, а сам файл кэша изменить нельзя.
+        """
+        path = self._path(key)
+        try:
+            if not path.stat().st_size:
+                return None
+            audio = np.memmap(path, dtype="<f4", mode="c")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Corrupted PCM cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        # Время изменения служит отметкой последнего использования для LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return audio
+
+    def writer(self, key):
+        """Открывает запись нового звука в кэш"""
+        return PcmWriter(self, key)
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for path in self.directory.glob("*.f32"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink(missing_ok=True)
+                except OSError as e:
+                    # В Windows файл, открытый через memmap идущей транскрипцией, удалить нельзя
+                    logging.warning(f"PCM cache: cannot evict {path.name}: {e}")
+                    continue
+                total -= size
+                logging.info(f"PCM cache: evicted {path.name}")
+
+
+def _decode_into(filepath, writer, sample_rate):
+    """Декодирует звук ffmpeg-ом и пишет его в кэш блоками, не держа весь файл в памяти"""
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-i", str(filepath),
+           "-map", "0:a:0", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = StderrTail(proc)
+    try:
+        for data in iter(lambda: proc.stdout.read(DECODE_BLOCK_SEC * sample_rate * 2), b""):
+            writer.write(np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0)
+        if proc.wait() != 0:
+            raise RuntimeError(f"Не удалось декодировать звук {filepath}: {stderr.text()}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+_cache = None
+
+
+def get_pcm_cache():
+    """Возвращает общий для процесса кэш звука"""
+    global _cache
+    if _cache is None:
+        _cache = PcmCache()
+    return _cache
+
+
+def load_audio(filepath, sample_rate=SAMPLE_RATE):
+    """Звук файла в моно float32: из кэша, а при промахе декодируется один раз и сохраняется"""
+    cache = get_pcm_cache()
+    if not cache.enabled:
+        return decode_audio(filepath, sample_rate)
+    key = cache.make_key(filepath, sample_rate)
+    audio = cache.get(key)
+    if audio is not None:
+        logging.info(f"PCM cache hit for {filepath}")
+        return audio
+    writer = cache.writer(key)
+    try:
+        _decode_into(filepath, writer, sample_rate)
+        writer.commit()
+    finally:
+        writer.discard()
+    audio = cache.get(key)
+    if audio is None:
+        # Запись сразу вытеснена (лимит меньше файла) или звук пуст
+        return decode_audio(filepath, sample_rate)
+    return audio
+
+
+def prefetch_audio(files, depth=PREFETCH_FILES, sample_rate=SAMPLE_RATE):
+    """Декодирует звук следующих файлов в фоновом потоке, пока обрабатывается текущий.
+
+    Выдает (путь, звук, ошибка) в исходном порядке. Очередь ограничена depth
+    файлами, поэтому поток опережает обработку не больше чем на depth + 1 файл.
+    """
+    files = list(files)
+    ready = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        for filepath in files:
+            try:
+                item = (filepath, load_audio(filepath, sample_rate), None)
+            except Exception as e:
+                item = (filepath, None, e)
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            if stop.is_set():
+                return
+
+    thread = threading.Thread(target=produce, name="audio-prefetch", daemon=True)
+    thread.start()
+    try:
+        for _ in files:
+            yield ready.get()
+    finally:
+        # Обработка прервана: поток не декодирует остальные файлы
+        stop.set()
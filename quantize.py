@@ -0,0 +1,68 @@
+"""Динамическое int8-квантование линейных слоев Whisper для распознавания на CPU с кэшем на диске"""
+import logging
+import os
+import threading
+import time
+
+from media_utils import CACHE_ROOT
+
+# --- Конфигурация ---
+QUANTIZED_DIR = CACHE_ROOT / "quantized"
+INT8_SUFFIX = "-int8"  # Имя варианта модели в пуле, кэше результатов и манифесте: "medium-int8"
+
+
+def model_variant(model_name, use_int8=False):
+    """Имя модели с учетом квантования"""
+    return f"{model_name}{INT8_SUFFIX}" if use_int8 else model_name
+
+
+def split_variant(model_name):
+    """Разбирает имя варианта: (имя модели Whisper, квантована ли)"""
+    if model_name.endswith(INT8_SUFFIX):
+        return model_name[:-len(INT8_SUFFIX)], True
+    return model_name, False
+
+
+def quantize_model(model):
+    """Заменяет линейные слои модели (fp32, CPU) на динамически квантованные int8"""
+    import torch
+    from whisper.model import Linear as WhisperLinear
+    # Слой Whisper - подкласс nn.Linear, который только приводит тип весов к типу входа;
+    # quantize_dynamic принимает лишь точный nn.Linear, поэтому класс заменяется
+    for module in model.modules():
+        if type(module) is WhisperLinear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model.float().eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _cache_path(model_name):
+    import torch
+    return QUANTIZED_DIR / f"{model_name}{INT8_SUFFIX}-torch{torch.__version__}.pt"
+
+
+def load_quantized_model(model_name):
+    """Возвращает квантованную модель: из кэша на диске или квантует fp32-модель и сохраняет результат"""
+    import torch
+    import whisper
+    path = _cache_path(model_name)
+    if path.exists():
+        try:
+            started = time.time()
+            model = torch.load(path, map_location="cpu", weights_only=False)
+            logging.info(f"Quantized model {model_name} loaded from cache in {time.time() - started:.1f} s")
+            return model
+        except Exception as e:
+            logging.warning(f"Corrupted quantized model cache {path.name}, re-quantizing: {e}")
+            path.unlink(missing_ok=True)
+
+    started = time.time()
+    model = quantize_model(whisper.load_model(model_name, device="cpu"))
+    logging.info(f"Model {model_name} quantized to int8 in {time.time() - started:.1f} s")
+    try:
+        QUANTIZED_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        torch.save(model, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logging.warning(f"Failed to cache quantized model {model_name}: {e}")
+    return model
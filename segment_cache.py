@@ -0,0 +1,104 @@
+"""Кэш закодированных видеофрагментов монтажа (повторная правка перекодирует только изменившиеся интервалы)
+и прокси исходников низкого разрешения для предпросмотра"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from media_utils import CACHE_ROOT
+
+# --- Конфигурация ---
+SEGMENT_DIR = CACHE_ROOT / "segments"
+MAX_SEGMENT_CACHE_MB = int(os.environ.get("TRANSCRIBE_SEGMENT_CACHE_MB", "8192"))  # 0 - кэш отключен
+SEGMENT_SUFFIX = ".mkv"
+# Прокси исходников для предпросмотра хранятся тем же способом в отдельной папке
+PROXY_DIR = CACHE_ROOT / "proxies"
+MAX_PROXY_CACHE_MB = int(os.environ.get("TRANSCRIBE_PROXY_CACHE_MB", "2048"))  # 0 - прокси не сохраняются
+
+
+class SegmentCache:
+    """Фрагменты с ключом по содержимому исходника, границам в кадрах и параметрам кодирования; LRU-вытеснение по размеру"""
+
+    def __init__(self, directory=SEGMENT_DIR, max_mb=MAX_SEGMENT_CACHE_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def make_key(self, source_hash, first_frame, last_frame, settings):
+        """Ключ фрагмента: хэш исходника + кадры [first_frame, last_frame) + параметры кодирования"""
+        payload = json.dumps([source_hash, first_frame, last_frame, settings], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.directory / f"{key}{SEGMENT_SUFFIX}"
+
+    def get(self, key):
+        """Возвращает путь к фрагменту или None"""
+        path = self._path(key)
+        try:
+            if not path.stat().st_size:
+                return None
+            # Время изменения служит отметкой последнего использования для LRU
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def temp_path(self, key):
+        """Путь для записи нового фрагмента (расширение сохраняется, чтобы ffmpeg выбрал контейнер)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return self.directory / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp{SEGMENT_SUFFIX}"
+
+    def put(self, key, temp_path):
+        """Переносит записанный фрагмент в кэш и возвращает его путь"""
+        path = self._path(key)
+        os.replace(temp_path, path)
+        return path
+
+    def evict(self, keep=()):
+        """Удаляет давно не использованные фрагменты сверх лимита, кроме нужных текущему рендеру"""
+        keep = set(keep)
+        with self._lock:
+            entries = []
+            for path in self.directory.glob(f"*{SEGMENT_SUFFIX}"):
+                if ".tmp" in path.name:
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path in keep:
+                    continue
+                path.unlink(missing_ok=True)
+                total -= size
+                logging.info(f"Segment cache: evicted {path.name}")
+
+
+_cache = None
+_proxy_cache = None
+
+
+def get_segment_cache():
+    """Возвращает общий для процесса кэш фрагментов"""
+    global _cache
+    if _cache is None:
+        _cache = SegmentCache()
+    return _cache
+
+
+def get_proxy_cache():
+    """Возвращает общий для процесса кэш прокси для предпросмотра"""
+    global _proxy_cache
+    if _proxy_cache is None:
+        _proxy_cache = SegmentCache(PROXY_DIR, MAX_PROXY_CACHE_MB)
+    return _proxy_cache
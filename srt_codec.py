@@ -0,0 +1,188 @@
+"""Потоковое чтение и запись .srt: файл читается построчно, временные метки преобразуются пачками"""
+import logging
+import re
+
+import numpy as np
+
+from word_timeline import WordTimeline
+
+# --- Конфигурация ---
+BATCH_SIZE = 65536  # Количество субтитров, преобразуемых за один раз
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+_TIME_PATTERN = re.compile(r"(\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,3}))?")
+# Позиции цифр в "чч:мм:сс,мсс" и их вес в миллисекундах
+_DIGIT_POSITIONS = [0, 1, 3, 4, 6, 7, 9, 10, 11]
+_DIGIT_WEIGHTS = np.array([36000000, 3600000, 600000, 60000, 10000, 1000, 100, 10, 1], dtype=np.int64)
+
+
+def parse_time(time_str):
+    """Преобразует время в формате чч:мм:сс,миллисекунды в секунды"""
+    match = _TIME_PATTERN.match(time_str.strip())
+    if not match:
+        raise ValueError(f"Некорректный формат времени: {time_str}")
+    hours, minutes, seconds, milliseconds = match.groups()
+    seconds = float(seconds) + (float(f"0.{milliseconds}") if milliseconds else 0)
+    return int(hours) * 3600 + int(minutes) * 60 + seconds
+
+
+def parse_times(time_strs):
+    """Преобразует пачку временных меток в массив секунд.
+
+    Метки стандартного вида "чч:мм:сс,мсс" разбираются векторно, остальные -
+    по одной через parse_time; нераспознанные метки становятся NaN.
+    """
+    count = len(time_strs)
+    result = np.full(count, np.nan)
+    if not count:
+        return result
+    try:
+        raw = "".join(time_strs).encode("ascii")
+    except UnicodeEncodeError:
+        raw = b""
+    if len(raw) == 12 * count:
+        chars = np.frombuffer(raw, dtype=np.uint8).reshape(count, 12)
+        digits = chars[:, _DIGIT_POSITIONS].astype(np.int64) - ord("0")
+        valid = ((digits >= 0) & (digits <= 9)).all(axis=1)
+        valid &= (chars[:, 2] == ord(":")) & (chars[:, 5] == ord(":"))
+        valid &= (chars[:, 8] == ord(",")) | (chars[:, 8] == ord("."))
+        result[valid] = (digits[valid] @ _DIGIT_WEIGHTS) / 1000.0
+        slow = np.flatnonzero(~valid).tolist()
+    else:
+        slow = range(count)
+    for i in slow:
+        try:
+            result[i] = parse_time(time_strs[i])
+        except ValueError:
+            pass
+    return result
+
+
+def iter_srt_batches(srt_filepath, batch_size=BATCH_SIZE):
+    """Читает .srt построчно и выдает пачки (начала, концы, тексты).
+
+    Используется только первая строка текста субтитра (в проекте один субтитр -
+    одно слово), субтитры с пустым текстом и некорректным временем пропускаются.
+    Память ограничена размером пачки.
+    """
+    start_strs = []
+    end_strs = []
+    texts = []
+    state = "index"
+    with open(srt_filepath, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if state == "index":
+                if line.isdigit():
+                    state = "time"
+            elif state == "time":
+                parts = line.split(" --> ")
+                if len(parts) == 2:
+                    state = "text"
+                else:
+                    logging.error(f"Failed to parse time line in {srt_filepath}: {line}")
+                    state = "index"
+            else:
+                if line:
+                    start_strs.append(parts[0].strip())
+                    end_strs.append(parts[1].strip())
+                    texts.append(line)
+                    if len(texts) >= batch_size:
+                        yield _convert_batch(srt_filepath, start_strs, end_strs, texts)
+                        start_strs, end_strs, texts = [], [], []
+                state = "index"
+    if texts:
+        yield _convert_batch(srt_filepath, start_strs, end_strs, texts)
+
+
+def _convert_batch(srt_filepath, start_strs, end_strs, texts):
+    starts = parse_times(start_strs)
+    ends = parse_times(end_strs)
+    valid = ~(np.isnan(starts) | np.isnan(ends))
+    if not valid.all():
+        for i in np.flatnonzero(~valid).tolist():
+            logging.error(f"Failed to parse time line in {srt_filepath}: {start_strs[i]} --> {end_strs[i]}")
+        keep = np.flatnonzero(valid).tolist()
+        return starts[valid], ends[valid], [texts[i] for i in keep]
+    return starts, ends, texts
+
+
+def read_srt(srt_filepath):
+    """Читает .srt и возвращает WordTimeline"""
+    start_batches = []
+    end_batches = []
+    texts = []
+    for starts, ends, batch_texts in iter_srt_batches(srt_filepath):
+        start_batches.append(starts)
+        end_batches.append(ends)
+        texts.extend(batch_texts)
+    if not texts:
+        return WordTimeline.empty()
+    return WordTimeline.from_lists(np.concatenate(start_batches), np.concatenate(end_batches), texts)
+
+
+def format_times(seconds):
+    """Форматирует массив секунд в метки "чч:мм:сс,мсс".
+
+    Миллисекунды отбрасываются, а не округляются, теми же операциями, что и в
+    прежнем create_srt (int((t % 1) * 1000)): повторно созданный .srt совпадает побайтно.
+    """
+    seconds = np.maximum(np.asarray(seconds, dtype=np.float64), 0.0)
+    whole = np.floor(seconds).astype(np.int64)
+    ms = np.floor(np.mod(seconds, 1.0) * 1000).astype(np.int64)
+    hours = np.minimum(whole // 3600, 99)
+    chars = np.empty((len(whole), 12), dtype=np.uint8)
+    for position, value in (
+        (0, hours // 10), (1, hours % 10),
+        (3, whole // 600 % 6), (4, whole // 60 % 10),
+        (6, whole // 10 % 6), (7, whole % 10),
+        (9, ms // 100), (10, ms // 10 % 10), (11, ms % 10),
+    ):
+        chars[:, position] = value + ord("0")
+    chars[:, 2] = chars[:, 5] = ord(":")
+    chars[:, 8] = ord(",")
+    raw = chars.tobytes().decode("ascii")
+    return [raw[i:i + 12] for i in range(0, len(raw), 12)]
+
+
+class SrtWriter:
+    """Буферизованная запись .srt пачками: субтитры нумеруются сквозным образом"""
+
+    def __init__(self, output_filepath):
+        self._file = open(output_filepath, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES)
+        self.count = 0
+
+    def write_batch(self, starts, ends, texts):
+        """Записывает пачку субтитров"""
+        start_strs = format_times(starts)
+        end_strs = format_times(ends)
+        first = self.count + 1
+        self._file.write("".join(
+            f"{first + i}\n{start_strs[i]} --> {end_strs[i]}\n{text}\n\n" for i, text in enumerate(texts)))
+        self.count += len(texts)
+
+    def write_words(self, words):
+        """Записывает слова (WordTimeline или список словарей) пачками по BATCH_SIZE"""
+        words = WordTimeline.from_words(words)
+        texts = words.texts()
+        for first in range(0, len(words), BATCH_SIZE):
+            last = first + BATCH_SIZE
+            self.write_batch(words.starts[first:last], words.ends[first:last], texts[first:last])
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_srt(words, output_filepath):
+    """Создает .srt файл из слов с временными метками"""
+    with SrtWriter(output_filepath) as writer:
+        writer.write_words(words)
@@ -0,0 +1,80 @@
+"""Проверка пословного сравнения (text_diff.py) по difflib.SequenceMatcher.
+
+Запуск: python -m pytest tests
+"""
+import difflib
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from text_diff import kept_word_indices, match_tokens, normalize_token  # noqa: E402
+
+SHORT_WORDS = ["и", "в", "не", "на", "я", "что", "он", "с", "а", "как", "это", "по", "но", "к", "у"]
+
+
+def difflib_count(original_words, edited_words):
+    """Число совпавших слов по difflib (нижняя граница наибольшей общей подпоследовательности)"""
+    matcher = difflib.SequenceMatcher(None, [normalize_token(w) for w in original_words],
+                                      [normalize_token(w) for w in edited_words], autojunk=False)
+    return sum(block.size for block in matcher.get_matching_blocks())
+
+
+def assert_matches(original_words, edited_words):
+    """Пары возрастают, сопоставлены одинаковые слова и совпавших не меньше, чем у difflib"""
+    matches = match_tokens(original_words, edited_words)
+    for (i0, j0), (i1, j1) in zip(matches, matches[1:]):
+        assert i0 < i1 and j0 < j1
+    for i, j in matches:
+        assert normalize_token(original_words[i]) == normalize_token(edited_words[j])
+    assert len(matches) >= difflib_count(original_words, edited_words)
+    return matches
+
+
+def make_words(rng, count):
+    return [rng.choice(SHORT_WORDS) for _ in range(count)]
+
+
+def test_moved_unique_word_does_not_anchor():
+    # Уникальное слово перенесено далеко вперед: опора по нему вырезала бы больше половины текста
+    words = make_words(random.Random(1), 200)
+    words[20] = "Москва"
+    edited = words[:20] + words[21:150] + ["Москва"] + words[150:]
+    kept = kept_word_indices(" ".join(words), " ".join(edited))
+    assert len(kept) == 199
+
+
+def test_deletions():
+    rng = random.Random(2)
+    for _ in range(50):
+        words = make_words(rng, rng.randint(100, 600))
+        edited = [w for w in words if rng.random() > 0.1]
+        matches = assert_matches(words, edited)
+        assert len(matches) == len(edited)
+
+
+def test_insertions_and_moves():
+    rng = random.Random(3)
+    for _ in range(50):
+        words = [w if rng.random() < 0.8 else f"слово{rng.randint(0, 300)}" for w in make_words(rng, 400)]
+        edited = [w for w in words if rng.random() > 0.05]
+        for _ in range(5):
+            edited.insert(rng.randint(0, len(edited)), rng.choice(SHORT_WORDS + ["новое"]))
+        for _ in range(2):
+            edited.insert(rng.randint(0, len(edited)), edited.pop(rng.randrange(len(edited))))
+        assert_matches(words, edited)
+
+
+def test_punctuation_only_edits():
+    words = "это было в Москве и ещё в Питере".split()
+    edited = "Это было, в москве! И еще в Питере.".split()
+    assert kept_word_indices(" ".join(words), " ".join(edited)) == list(range(len(words)))
+
+
+def test_alternate_words_removed():
+    # Оставлено каждое второе слово: поиск ограничен по числу правок и не должен зависать
+    rng = random.Random(4)
+    words = [f"{rng.choice(SHORT_WORDS)}{rng.randint(0, 50)}" for _ in range(5000)]
+    kept = kept_word_indices(" ".join(words), " ".join(words[::2]))
+    assert len(kept) >= 0.99 * len(words[::2])
@@ -0,0 +1,243 @@
+"""Пословное сравнение исходного и отредактированного текста (diff Майерса с линейной памятью)"""
+import re
+from bisect import bisect_left
+
+_PUNCTUATION = re.compile(r"[^\w]+")
+SMALL_GAP = 64  # Участки короче этого сравниваются алгоритмом Майерса без деления по опорам
+MAX_ANCHOR_SIZE = 4  # Наибольшая длина n-граммы, используемой как опора
+# Наибольшее число правок, до которого средняя «змейка» ищется точно; дальше участок
+# делится в точке наибольшего продвижения (как в xdiff), чтобы время оставалось линейным
+MAX_EDIT_COST = 32
+
+
+def normalize_token(token):
+    """Приводит слово к виду для сравнения: нижний регистр, без знаков препинания, ё -> е"""
+    lowered = token.lower().replace("ё", "е")
+    stripped = _PUNCTUATION.sub("", lowered)
+    return stripped or lowered
+
+
+def _encode(original_tokens, edited_tokens):
+    """Заменяет нормализованные слова целыми числами: сравнение чисел быстрее сравнения строк"""
+    ids = {}
+    a = [ids.setdefault(normalize_token(t), len(ids)) for t in original_tokens]
+    b = [ids.setdefault(normalize_token(t), len(ids)) for t in edited_tokens]
+    return a, b
+
+
+def _furthest_point(v, offset, d, n, m):
+    """Точка фронта поиска на шаге d, дальше всего продвинувшаяся по обоим участкам: (x, y, x + y)"""
+    best = (0, 0, -1)
+    for k in range(-d, d + 1, 2):
+        x = v[offset + k]
+        y = x - k
+        if x <= n and 0 <= y <= m and x + y > best[2]:
+            best = (x, y, x + y)
+    return best
+
+
+def _middle_snake(a, alo, ahi, b, blo, bhi, max_cost=MAX_EDIT_COST):
+    """Находит среднюю «змейку» кратчайшего пути редактирования (Myers, 1986).
+
+    Возвращает (D, x0, y0, x1, y1): число правок и диагональный участок
+    (x0, y0) -> (x1, y1) в абсолютных индексах, через который проходит путь.
+    Если правок больше 2 * max_cost, возвращается пустой участок в точке, до
+    которой поиск продвинулся дальше всего: путь уже не кратчайший, но время
+    не растет квадратично на сильно переписанном тексте.
+    """
+    n = ahi - alo
+    m = bhi - blo
+    delta = n - m
+    odd = delta & 1
+    max_d = min((n + m + 1) // 2, max_cost)
+    offset = max_d + 1
+    vf = [0] * (2 * offset + 1)
+    vb = [0] * (2 * offset + 1)
+    for d in range(max_d + 1):
+        # Прямой проход
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[offset + k - 1] < vf[offset + k + 1]):
+                x = vf[offset + k + 1]
+            else:
+                x = vf[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            vf[offset + k] = x
+            if odd and delta - (d - 1) <= k <= delta + (d - 1) and x + vb[offset + delta - k] >= n:
+                return 2 * d - 1, alo + x0, blo + y0, alo + x, blo + y
+        # Обратный проход (по перевёрнутым последовательностям)
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[offset + k - 1] < vb[offset + k + 1]):
+                x = vb[offset + k + 1]
+            else:
+                x = vb[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            vb[offset + k] = x
+            if not odd and -d <= delta - k <= d and x + vf[offset + delta - k] >= n:
+                return 2 * d, ahi - x, bhi - y, ahi - x0, bhi - y0
+        if d >= max_cost:
+            fx, fy, forward = _furthest_point(vf, offset, d, n, m)
+            bx, by, backward = _furthest_point(vb, offset, d, n, m)
+            if forward >= backward:
+                x, y = alo + fx, blo + fy
+            else:
+                x, y = ahi - bx, bhi - by
+            return 2 * d, x, y, x, y
+    raise AssertionError("middle snake not found")
+
+
+def _myers(a, alo, ahi, b, blo, bhi, matches):
+    """Добавляет в matches пары совпавших индексов (i, j) наибольшей общей подпоследовательности.
+
+    Участки обрабатываются через явный стек: при делении по точке наибольшего
+    продвижения глубина рекурсии росла бы с длиной текста.
+    """
+    # В стеке лежат участки (alo, ahi, blo, bhi) и готовые списки пар, в порядке, обратном выводу
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        task = stack.pop()
+        if isinstance(task, list):
+            matches.extend(task)
+            continue
+        alo, ahi, blo, bhi = task
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        suffix = []
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            suffix.append((ahi, bhi))
+        suffix.reverse()
+
+        if alo < ahi and blo < bhi:
+            d, x0, y0, x1, y1 = _middle_snake(a, alo, ahi, b, blo, bhi)
+            if d > 1:
+                stack.append(suffix)
+                stack.append((x1, ahi, y1, bhi))
+                stack.append([(x0 + t, y0 + t) for t in range(x1 - x0)])
+                stack.append((alo, x0, blo, y0))
+                continue
+            # Осталась одна вставка или удаление: короткая последовательность целиком входит в длинную
+            longer_a = ahi - alo > bhi - blo
+            i, j = alo, blo
+            while i < ahi and j < bhi:
+                if a[i] == b[j]:
+                    matches.append((i, j))
+                    i += 1
+                    j += 1
+                elif longer_a:
+                    i += 1
+                else:
+                    j += 1
+        matches.extend(suffix)
+
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi, size):
+    """Опорные пары для patience diff: n-граммы длины size, встречающиеся ровно один раз
+    в обоих участках, взятые в виде наибольшей возрастающей последовательности без перекрытий"""
+    first_a = {}
+    for i in range(alo, ahi - size + 1):
+        key = tuple(a[i:i + size])
+        first_a[key] = -1 if key in first_a else i
+    first_b = {}
+    for j in range(blo, bhi - size + 1):
+        key = tuple(b[j:j + size])
+        first_b[key] = -1 if key in first_b else j
+    pairs = []
+    for key, i in first_a.items():
+        j = first_b.get(key, -1)
+        if i >= 0 and j >= 0:
+            pairs.append((i, j))
+    pairs.sort()
+
+    # Наибольшая возрастающая по j подпоследовательность (patience sorting)
+    tails = []
+    tail_index = []
+    back = [-1] * len(pairs)
+    for p, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_index.append(p)
+        else:
+            tails[pos] = j
+            tail_index[pos] = p
+        back[p] = tail_index[pos - 1] if pos > 0 else -1
+    chain = []
+    p = tail_index[-1] if tail_index else -1
+    while p >= 0:
+        chain.append(pairs[p])
+        p = back[p]
+    chain.reverse()
+
+    anchors = []
+    for i, j in chain:
+        if not anchors or (i >= anchors[-1][0] + size and j >= anchors[-1][1] + size):
+            anchors.append((i, j))
+    return anchors
+
+
+def _matchable_count(a, alo, ahi, b, blo, bhi):
+    """Сколько слов отредактированного участка встречается в исходном участке (верхняя оценка совпадений)"""
+    present = set(a[alo:ahi])
+    return min(ahi - alo, sum(1 for token in b[blo:bhi] if token in present))
+
+
+def _diff(a, alo, ahi, b, blo, bhi, matches, size=1):
+    """Делит участок по уникальным n-граммам и сравнивает промежутки алгоритмом Майерса.
+
+    Если промежутки между опорами остаются большими, они делятся повторно по
+    более длинным n-граммам: в транскриптах с частыми короткими словами
+    ("и", "в", "не") уникальные одиночные слова встречаются редко.
+    """
+    if min(ahi - alo, bhi - blo) <= SMALL_GAP or size > MAX_ANCHOR_SIZE:
+        _myers(a, alo, ahi, b, blo, bhi, matches)
+        return
+    start_alo, start_blo = alo, blo
+    anchored = []
+    anchors = _unique_anchors(a, alo, ahi, b, blo, bhi, size)
+    for i, j in anchors:
+        _diff(a, alo, i, b, blo, j, anchored, size + 1)
+        anchored.extend((i + t, j + t) for t in range(size))
+        alo, blo = i + size, j + size
+    _diff(a, alo, ahi, b, blo, bhi, anchored, size + 1)
+
+    # Опора может оказаться ложной: n-грамма сложилась из слов, которые в исходном не стояли
+    # рядом (удаление склеило их), или уникальное слово перенесено в другое место текста.
+    # Если осталось несопоставленным слово, которое есть в исходном участке (при чистом
+    # удалении такого не бывает), участок проверяется алгоритмом Майерса. Без опор участок
+    # целиком передан следующему уровню и уже проверен там
+    if anchors and len(anchored) < _matchable_count(a, start_alo, ahi, b, start_blo, bhi):
+        plain = []
+        _myers(a, start_alo, ahi, b, start_blo, bhi, plain)
+        if len(plain) > len(anchored):
+            anchored = plain
+    matches.extend(anchored)
+
+
+def match_tokens(original_tokens, edited_tokens):
+    """Сопоставляет слова отредактированного текста словам исходного.
+
+    Текст разбивается на участки по словам и n-граммам, уникальным в обоих
+    текстах (patience diff), затем каждый участок сравнивается алгоритмом
+    Майерса с линейной памятью. Возвращает список пар (индекс в исходном,
+    индекс в отредактированном) по возрастанию.
+    """
+    a, b = _encode(original_tokens, edited_tokens)
+    matches = []
+    _diff(a, 0, len(a), b, 0, len(b), matches)
+    return matches
+
+
+def kept_word_indices(original_text, edited_text):
+    """Индексы слов исходного текста, оставшихся после редактирования; вставленные слова игнорируются"""
+    return [i for i, _ in match_tokens(original_text.split(), edited_text.split())]
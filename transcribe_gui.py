@@ -5,13 +5,25 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 from tkinterdnd2 import TkinterDnD, DND_FILES
 import logging
 import shutil
-import whisper
-import torch
-from moviepy.editor import VideoFileClip, concatenate_videoclips
-from tqdm import tqdm
-import re
 import os
 import subprocess
+import queue
+import importlib
+import threading
+import time
+from model_pool import get_model_pool, device_for, ModelPrefetcher
+from quantize import model_variant, split_variant
+from transcription_cache import get_transcription_cache, cache_options, TRANSCRIBE_OPTIONS
+from vad import transcribe_media, describe_stats
+from job_queue import Job, JobQueue
+from text_diff import kept_word_indices
+from word_timeline import WordTimeline
+from srt_codec import write_srt
+from word_sidecar import load_words, write_sidecar, sidecar_path
+from keep_ranges import build_keep_ranges, remap_words, total_duration, snap_ranges_to_frames
+from media_utils import probe_source, probe_duration, file_hash
+from chunked_transcribe import transcribe_chunked
+from ffmpeg_render import render_ranges, render_smart_cut, render_parallel, render_incremental, render_preview, render_audio
 
 # --- Конфигурация ---
 SRT_DIR_NAME = "transcribed_texts"
@@ -21,7 +33,17 @@ SUPPORTED_EXTENSIONS = {
     ".mp4", ".mov", ".avi", ".mkv", ".webm", ".mpeg", ".mpg"
 }
 VIDEO_EXTENSIONS = {".mp4", ".mkv", ".avi", ".mov"}
-MAX_FILE_SIZE_MB = 1024  # Максимальный размер файла в МБ
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".flac", ".ogg", ".aac"}  # Монтируются только по звуку, без видео
+MAX_FILE_SIZE_MB = 1024  # Файлы больше этого размера (МБ) транскрибируются по частям
+VAD_ENABLED = False  # Передавать в Whisper только участки речи (значение флажка по умолчанию)
+INT8_CPU = False  # Динамически квантованная int8-модель на CPU (значение флажка по умолчанию)
+KEEP_GAP_TOLERANCE_SEC = 0.3  # Паузы между оставшимися соседними словами короче этого значения не вырезаются
+KEEP_PADDING_SEC = 0.0  # Запас по краям вырезаемых фрагментов (только за счет тишины)
+RENDER_ENGINES = ["moviepy", "ffmpeg", "smartcut", "parallel", "incremental"]
+RENDER_ENGINE = "moviepy"  # moviepy - через Python/NumPy, ffmpeg - одним вызовом ffmpeg без декодирования в Python,
+# smartcut - копирование целых GOP без перекодирования, перекодируются только края разрезов,
+# parallel - куски равной длительности кодируются одновременно в нескольких процессах ffmpeg,
+# incremental - фрагменты прошлых рендеров берутся из кэша, кодируются только изменённые
 SUPPORTED_MODELS = [
     {"name": "tiny", "display": "tiny   75mb (1vram)", "description": "Самая легкая модель, низкая точность, подходит для слабых ПК"},
     {"name": "base", "display": "base   142mb (2vram)", "description": "Легкая модель, хороший баланс скорости и точности"},
@@ -31,6 +53,13 @@ SUPPORTED_MODELS = [
     {"name": "large-v2", "display": "large-v2   2.9gb (10vram)", "description": "Улучшенная версия large, еще выше точность"},
     {"name": "large-v3", "display": "large-v3   2.9gb (10vram)", "description": "Новейшая модель, максимальная точность, очень ресурсоемкая"}
 ]
+JOB_WORKERS = 1  # Количество одновременно выполняемых заданий
+POLL_INTERVAL_MS = 100  # Период вывода накопленного лога и состояния очереди
+# whisper, torch и moviepy импортируются при первом использовании, а не при запуске окна.
+# После показа окна их можно заранее импортировать в фоне, чтобы первое задание не ждало загрузки
+WARMUP_IMPORTS = True
+WARMUP_DELAY_MS = 500
+WARMUP_MODULES = ["torch", "whisper", "moviepy.editor"]
 
 # --- Настройка логирования ---
 logging.basicConfig(
@@ -39,14 +68,53 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+class LogBuffer:
+    """Потокобезопасный буфер лога: строки из рабочих потоков выводятся в виджет пачками"""
+
+    def __init__(self, widget):
+        self.widget = widget
+        self._lines = queue.SimpleQueue()
+
+    def post(self, message):
+        self._lines.put(message)
+
+    def flush(self):
+        """Переносит накопленные строки в виджет (вызывается только из главного потока)"""
+        lines = []
+        while True:
+            try:
+                lines.append(self._lines.get_nowait())
+            except queue.Empty:
+                break
+        if lines:
+            self.widget.insert(tk.END, "\n".join(lines) + "\n")
+            self.widget.see(tk.END)
+
 def log_message(message, widget=None):
     """Выводит сообщение в лог и в текстовое поле GUI"""
     print(message)
     logging.info(message)
-    if widget:
+    if isinstance(widget, LogBuffer):
+        widget.post(message)
+    elif widget:
         widget.insert(tk.END, message + "\n")
         widget.see(tk.END)
 
+def warm_up_imports():
+    """Фоновый импорт тяжелых библиотек (ошибки только записываются в лог)"""
+    started = time.time()
+    for module_name in WARMUP_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            logging.warning(f"Фоновый импорт {module_name} не удался: {e}")
+    logging.info(f"Фоновый импорт библиотек завершен за {time.time() - started:.1f} сек")
+
+def begin_stage(job, stage_name):
+    """Отмечает этап задания и проверяет отмену (без задания ничего не делает)"""
+    if job is not None:
+        job.begin_stage(stage_name)
+
 def check_model_availability(model_name):
     """Проверяет, существует ли модель в локальном кэше"""
     cache_dir = Path.home() / ".cache" / "whisper"
@@ -57,55 +125,136 @@ def check_model_availability(model_name):
     return False
 
 def create_srt(words, output_filepath):
-    """Создает .srt файл из списка слов с временными метками"""
+    """Создает .srt файл из слов с временными метками (WordTimeline или список словарей)"""
     try:
-        with open(output_filepath, "w", encoding="utf-8") as f:
-            for i, word in enumerate(words, 1):
-                start_time = word.get("start", 0)
-                end_time = word.get("end", start_time + 0.5)
-                text = word["word"].strip()
-                start_srt = f"{int(start_time//3600):02d}:{int((start_time%3600)//60):02d}:{int(start_time%60):02d},{int((start_time%1)*1000):03d}"
-                end_srt = f"{int(end_time//3600):02d}:{int((end_time%3600)//60):02d}:{int(end_time%60):02d},{int((end_time%1)*1000):03d}"
-                f.write(f"{i}\n{start_srt} --> {end_srt}\n{text}\n\n")
+        write_srt(words, output_filepath)
     except Exception as e:
         logging.error(f"Ошибка создания .srt файла {output_filepath}: {e}")
         raise
 
-def transcribe_file(input_filepath, model_name, output_dir, log_widget):
-    """Транскрибирует файл и создает .srt и .txt"""
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+TRANSCRIBE_STAGES = ["Загрузка модели", "Распознавание речи", "Сохранение результатов"]
+
+def load_pooled_model(model_name, log_widget):
+    """Берет модель из пула (загружая при необходимости); возвращает модель или None"""
+    try:
+        device = device_for(model_name)
+    except ImportError as e:
+        log_message(f"[!] Ошибка импорта torch: {e}. Установите: pip install -U torch", log_widget)
+        return None
     log_message(f"[*] Используемое устройство: {device}", log_widget)
     if device == "cpu" and model_name in ["medium", "large", "large-v2", "large-v3"]:
-        log_message(f"[!] Модель '{model_name}' может быть очень медленной на CPU.", log_widget)
+        log_message(f"[!] Модель '{model_name}' может быть очень медленной на CPU "
+                    f"(ускорение - флажок \"Быстрый режим CPU (int8)\").", log_widget)
+    elif split_variant(model_name)[1]:
+        log_message(f"[*] Квантованная int8-модель '{model_name}' на CPU.", log_widget)
 
-    log_message(f"[*] Загрузка модели Whisper '{model_name}'...", log_widget)
+    pool = get_model_pool()
     try:
-        model = whisper.load_model(model_name, device=device)
-        log_message("[*] Модель успешно загружена.", log_widget)
+        if pool.is_loaded(model_name, device):
+            model = pool.get(model_name, device)
+            log_message(f"[*] Модель Whisper '{model_name}' взята из пула.", log_widget)
+        else:
+            log_message(f"[*] Загрузка модели Whisper '{model_name}'...", log_widget)
+            model = pool.get(model_name, device)
+            log_message("[*] Модель успешно загружена.", log_widget)
+        log_message(f"[*] {pool.report()}", log_widget)
+        return model
     except Exception as e:
         log_message(f"[!] Ошибка загрузки модели: {e}", log_widget)
+        return None
+
+def transcribe_file_chunked(input_filepath, model_name, output_dir, log_widget, job=None, use_vad=False):
+    """Транскрибирует длинную запись окнами, дописывая .txt и .srt после каждого окна"""
+    output_filepath = output_dir / (input_filepath.stem + ".txt")
+    srt_filepath = output_dir / (input_filepath.stem + ".srt")
+    log_message(f"\n--- Обработка по частям: {input_filepath.name} ---", log_widget)
+    model = load_pooled_model(model_name, log_widget)
+    if model is None:
         return False
 
+    begin_stage(job, "Распознавание речи")
+    duration = probe_duration(input_filepath)
+
+    def on_window(index, offset):
+        if job is not None:
+            job.check_cancelled()
+            if duration:
+                job.set_progress(offset / duration)
+        total = f" из {duration / 60:.0f} мин" if duration else ""
+        log_message(f"  [*] Окно {index + 1}: с {offset / 60:.1f} мин{total}", log_widget)
+
+    try:
+        words = transcribe_chunked(model, input_filepath, output_filepath, srt_filepath, on_window=on_window,
+                                   use_vad=use_vad)
+        begin_stage(job, "Сохранение результатов")
+        log_message(f"  [*] Транскрипция сохранена в: {SRT_DIR_NAME}/{output_filepath.name}", log_widget)
+        log_message(f"  [*] Субтитры сохранены в: {SRT_DIR_NAME}/{srt_filepath.name} ({len(words)} слов)", log_widget)
+        try:
+            write_sidecar(words, sidecar_path(srt_filepath), model=model_name, language=TRANSCRIBE_OPTIONS["language"],
+                          source_sha256=file_hash(input_filepath))
+        except Exception as e:
+            log_message(f"  [!] Не удалось сохранить файл меток слов: {e}", log_widget)
+        return True
+    except Exception as e:
+        log_message(f"  [!] Ошибка транскрипции {input_filepath.name}: {e}", log_widget)
+        return False
+
+def transcribe_file(input_filepath, model_name, output_dir, log_widget, job=None, use_vad=VAD_ENABLED):
+    """Транскрибирует файл и создает .srt и .txt"""
+    begin_stage(job, "Загрузка модели")
+    # Большие файлы не декодируются в память целиком, а транскрибируются окнами
+    if input_filepath.stat().st_size > MAX_FILE_SIZE_MB * 1024 * 1024:
+        return transcribe_file_chunked(input_filepath, model_name, output_dir, log_widget, job, use_vad)
+
     output_filename = input_filepath.stem + ".txt"
     srt_filename = input_filepath.stem + ".srt"
     output_filepath = output_dir / output_filename
     srt_filepath = output_dir / srt_filename
 
+    # Неизменённый файл с той же моделью и параметрами не распознается повторно
+    cache = get_transcription_cache()
+    try:
+        cache_key = cache.make_key(input_filepath, model_name, cache_options(use_vad))
+        result = cache.get(cache_key)
+    except Exception as e:
+        log_message(f"[!] Кэш транскрипций недоступен: {e}", log_widget)
+        cache_key, result = None, None
+
     log_message(f"\n--- Обработка: {input_filepath.name} ---", log_widget)
     try:
-        result = model.transcribe(str(input_filepath), verbose=False, word_timestamps=True, language="ru")
+        if result is not None:
+            log_message("[*] Результат транскрипции взят из кэша, модель не загружается.", log_widget)
+        else:
+            model = load_pooled_model(model_name, log_widget)
+            if model is None:
+                return False
+            begin_stage(job, "Распознавание речи")
+            result = transcribe_media(model, input_filepath, use_vad, verbose=False, **TRANSCRIBE_OPTIONS)
+            if "vad" in result:
+                log_message(f"  [*] {describe_stats(result['vad'])}", log_widget)
+            if cache_key:
+                try:
+                    cache.put(cache_key, result)
+                except Exception as e:
+                    log_message(f"[!] Не удалось сохранить результат в кэш: {e}", log_widget)
+
+        begin_stage(job, "Сохранение результатов")
         transcribed_text = result["text"]
 
         with open(output_filepath, "w", encoding="utf-8") as f:
             f.write(transcribed_text)
         log_message(f"  [*] Транскрипция сохранена в: {SRT_DIR_NAME}/{output_filename}", log_widget)
 
-        words = []
-        for segment in result["segments"]:
-            words.extend(segment.get("words", []))
+        words = WordTimeline.from_words(word for segment in result["segments"] for word in segment.get("words", []))
         if words:
             create_srt(words, srt_filepath)
             log_message(f"  [*] Субтитры сохранены в: {SRT_DIR_NAME}/{srt_filename}", log_widget)
+            # Бинарная копия меток слов: редактор открывает её без разбора .srt
+            try:
+                write_sidecar(words, sidecar_path(srt_filepath), model=model_name, language=result.get("language"),
+                              source_sha256=file_hash(input_filepath))
+            except Exception as e:
+                log_message(f"  [!] Не удалось сохранить файл меток слов: {e}", log_widget)
         else:
             log_message(f"  [!] Не удалось получить временные метки слов для {input_filepath.name}", log_widget)
 
@@ -115,48 +264,9 @@ def transcribe_file(input_filepath, model_name, output_dir, log_widget):
         return False
 
 def parse_srt(srt_filepath):
-    """Парсит .srt файл и возвращает список слов с временными метками и текст без меток"""
-    words = []
-    text = []
-    with open(srt_filepath, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-        i = 0
-        while i < len(lines):
-            if lines[i].strip().isdigit():
-                i += 1
-                if i >= len(lines):
-                    break
-                time_line = lines[i].strip()
-                try:
-                    start_str, end_str = time_line.split(" --> ")
-                    start_time = parse_time(start_str)
-                    end_time = parse_time(end_str)
-                    i += 1
-                    if i >= len(lines):
-                        break
-                    word = lines[i].strip()
-                    if word:
-                        words.append({"start": start_time, "end": end_time, "word": word})
-                        text.append(word)
-                    i += 1
-                except Exception as e:
-                    logging.error(f"Ошибка парсинга строки времени в {srt_filepath}: {time_line}, ошибка: {e}")
-                    i += 1
-                    continue
-            else:
-                i += 1
-    return words, " ".join(text)
-
-def parse_time(time_str):
-    """Преобразует время в формате чч:мм:сс,миллисекунды в секунды"""
-    time_str = time_str.strip()
-    time_str = time_str.replace(",", ".")
-    match = re.match(r"(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,3}))?", time_str)
-    if not match:
-        raise ValueError(f"Некорректный формат времени: {time_str}")
-    hours, minutes, seconds, milliseconds = match.groups()
-    seconds = float(seconds) + (float(f"0.{milliseconds}") if milliseconds else 0)
-    return int(hours) * 3600 + int(minutes) * 60 + seconds
+    """Загружает слова .srt (из файла .words, если он актуален) и возвращает WordTimeline и текст без меток"""
+    words = load_words(srt_filepath)
+    return words, words.joined_text()
 
 def edit_text_gui(original_text, callback, log_widget, parent):
     """Открывает текстовый редактор для редактирования текста"""
@@ -179,106 +289,208 @@ def edit_text_gui(original_text, callback, log_widget, parent):
     root.grab_set()  # Блокируем основное окно
     root.wait_window()  # Ждем закрытия окна
 
-def edit_video(video_filepath, srt_filepath, output_dir, log_widget, parent):
-    """Редактирует видео на основе отредактированного текста из .srt"""
-    log_message("[*] Начало редактирования видео", log_widget)
+EDIT_STAGES = ["Загрузка видео", "Кодирование видео", "Создание .srt"]
+PREVIEW_STAGES = ["Загрузка видео", "Кодирование видео"]
+
+# Последняя правка текста для каждого .srt (в пределах сеанса): после предпросмотра
+# редактор открывается с тем же текстом, и правку не нужно повторять для экспорта
+_edit_drafts = {}
+
+def prepare_edit(srt_filepath, log_widget, parent):
+    """Открывает редактор текста и возвращает (слова, индексы оставшихся слов) или None"""
+    words, original_text = parse_srt(srt_filepath)
+    if not words:
+        log_message(f"[!] Не удалось извлечь слова из {srt_filepath.name}. Проверьте формат .srt файла.", log_widget)
+        return None
+    log_message(f"[*] Загружено {len(words)} слов из {srt_filepath.name}", log_widget)
+
+    edited_text = [None]
+    def set_edited_text(text):
+        edited_text[0] = text
+        log_message("[*] Получен отредактированный текст", log_widget)
+
+    # Запускаем редактор
+    draft_key = (str(srt_filepath.resolve()), srt_filepath.stat().st_mtime_ns)
+    edit_text_gui(_edit_drafts.get(draft_key, original_text), set_edited_text, log_widget, parent)
+
+    # Проверяем, получен ли текст
+    if edited_text[0] is None:
+        log_message("[!] Редактирование текста не завершено", log_widget)
+        return None
+    _edit_drafts[draft_key] = edited_text[0]
+
+    # Проверяем, не пустой ли отредактированный текст
+    if not edited_text[0].strip():
+        log_message("[!] Отредактированный текст пуст. Оставьте хотя бы одно слово.", log_widget)
+        return None
+
+    # Сравниваем тексты
+    log_message("[*] Сравнение исходного и отредактированного текста", log_widget)
     try:
-        words, original_text = parse_srt(srt_filepath)
-        if not words:
-            log_message(f"[!] Не удалось извлечь слова из {srt_filepath.name}. Проверьте формат .srt файла.", log_widget)
-            return False
-        log_message(f"[*] Загружено {len(words)} слов из {srt_filepath.name}", log_widget)
-
-        edited_text = [None]
-        def set_edited_text(text):
-            edited_text[0] = text
-            log_message("[*] Получен отредактированный текст", log_widget)
-
-        # Запускаем редактор
-        edit_text_gui(original_text, set_edited_text, log_widget, parent)
-
-        # Проверяем, получен ли текст
-        if edited_text[0] is None:
-            log_message("[!] Редактирование текста не завершено", log_widget)
-            return False
-
-        # Проверяем, не пустой ли отредактированный текст
-        if not edited_text[0].strip():
-            log_message("[!] Отредактированный текст пуст. Оставьте хотя бы одно слово.", log_widget)
-            return False
-
-        # Сравниваем тексты
-        log_message("[*] Сравнение исходного и отредактированного текста", log_widget)
+        kept_indices = compare_texts(original_text, edited_text[0])
+        log_message(f"[*] Найдено {len(kept_indices)} совпадений слов", log_widget)
+        log_message(f"[*] После редактирования осталось {len(kept_indices)} слов", log_widget)
+    except Exception as e:
+        log_message(f"[!] Ошибка сравнения текстов: {e}", log_widget)
+        return None
+
+    # Проверяем, есть ли слова после редактирования
+    if not kept_indices:
+        log_message("[!] После редактирования не осталось слов для обработки.", log_widget)
+        return None
+    return words, kept_indices
+
+def render_with_moviepy(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding):
+    """Рендер через MoviePy; возвращает слова на новой временной шкале или None при ошибке"""
+    log_message(f"[*] Загрузка видео {video_filepath.name}", log_widget)
+    try:
+        from moviepy.editor import VideoFileClip, concatenate_videoclips
+        video = VideoFileClip(str(video_filepath))
+        log_message(f"[*] Видео {video_filepath.name} загружено, длительность: {video.duration} сек", log_widget)
+    except Exception as e:
+        log_message(f"[!] Ошибка загрузки видео: {e}", log_widget)
+        return None
+
+    # Объединяем оставшиеся слова в непрерывные интервалы и создаем по клипу на интервал
+    ranges = build_keep_ranges(words, kept_indices, video.duration, gap_tolerance, padding)
+    adjusted_words = plan_edit(words, kept_indices, ranges, video.duration, log_widget)
+    clips = []
+    for r in ranges:
         try:
-            kept_indices = compare_texts(original_text, edited_text[0])
-            log_message(f"[*] Найдено {len(kept_indices)} совпадений слов", log_widget)
-            filtered_words = [words[i] for i in kept_indices]
-            log_message(f"[*] После редактирования осталось {len(filtered_words)} слов", log_widget)
+            clips.append(video.subclip(r["start"], r["end"]))
         except Exception as e:
-            log_message(f"[!] Ошибка сравнения текстов: {e}", log_widget)
-            return False
+            log_message(f"[!] Ошибка обработки фрагмента ({r['start']}-{r['end']}): {e}", log_widget)
+            video.close()
+            return None
 
-        # Проверяем, есть ли слова после редактирования
-        if not filtered_words:
-            log_message("[!] После редактирования не осталось слов для обработки.", log_widget)
-            return False
+    if not clips:
+        log_message(f"[!] Не удалось создать фрагменты для видео {video_filepath.name}", log_widget)
+        video.close()
+        return None
 
-        # Загружаем видео
-        log_message(f"[*] Загрузка видео {video_filepath.name}", log_widget)
-        try:
-            video = VideoFileClip(str(video_filepath))
-            log_message(f"[*] Видео {video_filepath.name} загружено, длительность: {video.duration} сек", log_widget)
-        except Exception as e:
-            log_message(f"[!] Ошибка загрузки видео: {e}", log_widget)
-            return False
-
-        # Создаем клипы для оставшихся слов
-        clips = []
-        current_time = 0
-        adjusted_words = []
-        log_message("[*] Создание видеофрагментов", log_widget)
-        for word in filtered_words:
-            start = word["start"]
-            end = word["end"]
-            if start >= video.duration:
-                log_message(f"[!] Пропущен фрагмент {word['word']} (вне длительности видео: {start} > {video.duration})", log_widget)
-                continue
-            end = min(end, video.duration)
-            try:
-                clips.append(video.subclip(start, end))
-                adjusted_words.append({
-                    "start": current_time,
-                    "end": current_time + (end - start),
-                    "word": word["word"]
-                })
-                current_time += end - start
-            except Exception as e:
-                log_message(f"[!] Ошибка обработки фрагмента {word['word']} ({start}-{end}): {e}", log_widget)
-                continue
-
-        if not clips:
-            log_message(f"[!] Не удалось создать фрагменты для видео {video_filepath.name}", log_widget)
-            video.close()
-            return False
+    # Объединяем клипы
+    log_message("[*] Объединение видеофрагментов", log_widget)
+    try:
+        begin_stage(job, "Кодирование видео")
+        final_clip = concatenate_videoclips(clips, method="compose")
+        final_clip.write_videofile(str(output_video), codec="libx264", audio_codec="aac")
+    except Exception as e:
+        log_message(f"[!] Ошибка сохранения видео: {e}", log_widget)
+        return None
+    finally:
+        video.close()
+        for clip in clips:
+            clip.close()
+        if 'final_clip' in locals():
+            final_clip.close()
+    return adjusted_words
+
+def render_with_ffmpeg(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding,
+                       renderer=render_ranges):
+    """Рендер одним вызовом ffmpeg (trim/atrim + concat); возвращает слова на новой шкале или None"""
+    try:
+        source = probe_source(video_filepath)
+        log_message(f"[*] {'Видео' if source['has_video'] else 'Аудио'} {video_filepath.name}: "
+                    f"длительность {source['duration']} сек" + (f", {source['fps']} кадр/с" if source["fps"] else ""),
+                    log_widget)
+    except Exception as e:
+        log_message(f"[!] Ошибка чтения параметров видео: {e}", log_widget)
+        return None
+
+    ranges = build_keep_ranges(words, kept_indices, source["duration"], gap_tolerance, padding)
+    ranges = snap_ranges_to_frames(ranges, source["fps"])
+    adjusted_words = plan_edit(words, kept_indices, ranges, source["duration"], log_widget)
+    if not ranges:
+        log_message(f"[!] Не удалось создать фрагменты для видео {video_filepath.name}", log_widget)
+        return None
+
+    begin_stage(job, "Кодирование видео")
+    log_message("[*] Кодирование через ffmpeg", log_widget)
+    try:
+        stats = renderer(video_filepath, ranges, output_video, source,
+                         progress=job.set_progress if job else None,
+                         cancel_event=job.cancel_event if job else None)
+    except Exception as e:
+        log_message(f"[!] Ошибка сохранения видео: {e}", log_widget)
+        return None
+    log_render_stats(stats, log_widget)
+    return adjusted_words
+
+def render_with_smart_cut(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding):
+    """Умная нарезка: целые GOP копируются, перекодируются только края разрезов"""
+    return render_with_ffmpeg(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding,
+                              renderer=render_smart_cut)
+
+def render_with_parallel(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding):
+    """Параллельный экспорт: куски равной длительности кодируются одновременно и склеиваются без перекодирования"""
+    return render_with_ffmpeg(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding,
+                              renderer=render_parallel)
+
+def render_with_incremental(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding):
+    """Повторный экспорт: неизменённые фрагменты берутся из кэша, кодируются только новые"""
+    return render_with_ffmpeg(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding,
+                              renderer=render_incremental)
+
+def render_with_preview(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding):
+    """Предпросмотр: монтаж из прокси низкого разрешения с быстрым кодированием"""
+    return render_with_ffmpeg(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding,
+                              renderer=render_preview)
+
+def render_with_audio(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding):
+    """Монтаж звукового файла: разрезы по отсчётам, короткое сглаживание стыков, без видео"""
+    return render_with_ffmpeg(video_filepath, words, kept_indices, output_video, log_widget, job, gap_tolerance, padding,
+                              renderer=render_audio)
+
+def log_render_stats(stats, log_widget):
+    """Сообщает, сколько видео скопировано или взято из кэша без перекодирования, или на сколько кусков разбит экспорт"""
+    if stats and "copied" in stats:
+        log_message(f"[*] Умная нарезка: {stats['pieces']} кусков, скопировано {stats['copied']:.1f} сек, "
+                    f"перекодировано {stats['encoded']:.1f} сек", log_widget)
+    elif stats and "reused" in stats:
+        log_message(f"[*] Повторный экспорт: {stats['segments']} фрагментов, из кэша {stats['reused']:.1f} сек, "
+                    f"закодировано {stats['encoded']:.1f} сек", log_widget)
+    elif stats and "crossfades" in stats:
+        log_message(f"[*] Монтаж звука: {stats['sample_rate']} Гц, сглажено стыков: {stats['crossfades']}", log_widget)
+    elif stats and "proxy" in stats:
+        log_message("[*] Прокси исходника создан и сохранен для следующих предпросмотров" if stats["proxy"]
+                    else "[*] Предпросмотр собран из сохраненного прокси исходника", log_widget)
+    elif stats:
+        log_message(f"[*] Параллельный экспорт: {stats['chunks']} кусков в {stats['workers']} процессах ffmpeg", log_widget)
+
+def plan_edit(words, kept_indices, ranges, duration, log_widget):
+    """Сообщает о плане монтажа и возвращает слова на новой временной шкале"""
+    skipped = len(kept_indices) - sum(len(r["words"]) for r in ranges)
+    if skipped:
+        log_message(f"[!] Пропущено {skipped} слов вне длительности видео ({duration} сек)", log_widget)
+    adjusted_words = remap_words(words, ranges)
+    log_message(f"[*] Создание видеофрагментов: {len(ranges)} интервалов для {len(adjusted_words)} слов, "
+                f"итоговая длительность {total_duration(ranges):.1f} сек", log_widget)
+    return adjusted_words
+
+RENDER_FUNCTIONS = {
+    "moviepy": render_with_moviepy,
+    "ffmpeg": render_with_ffmpeg,
+    "smartcut": render_with_smart_cut,
+    "parallel": render_with_parallel,
+    "incremental": render_with_incremental,
+    "audio": render_with_audio,  # Выбирается автоматически для AUDIO_EXTENSIONS, в списке движков не показывается
+}
 
-        # Объединяем клипы
-        log_message("[*] Объединение видеофрагментов", log_widget)
-        try:
-            final_clip = concatenate_videoclips(clips, method="compose")
-            output_video = output_dir / f"edited_{video_filepath.name}"
-            final_clip.write_videofile(str(output_video), codec="libx264", audio_codec="aac")
-            log_message(f"[*] Отредактированное видео сохранено в: {OUTPUT_DIR_NAME}/edited_{video_filepath.name}", log_widget)
-        except Exception as e:
-            log_message(f"[!] Ошибка сохранения видео: {e}", log_widget)
+def render_edit(video_filepath, srt_filepath, words, kept_indices, output_dir, log_widget, job=None,
+                gap_tolerance=KEEP_GAP_TOLERANCE_SEC, padding=KEEP_PADDING_SEC, engine=RENDER_ENGINE):
+    """Собирает видео из оставшихся слов и создает обновленный .srt (можно вызывать из рабочего потока)"""
+    try:
+        begin_stage(job, "Загрузка видео")
+        output_video = output_dir / f"edited_{video_filepath.name}"
+        log_message(f"[*] Движок рендера: {engine}", log_widget)
+        adjusted_words = RENDER_FUNCTIONS[engine](video_filepath, words, kept_indices, output_video,
+                                                  log_widget, job, gap_tolerance, padding)
+        if adjusted_words is None:
             return False
-        finally:
-            video.close()
-            for clip in clips:
-                clip.close()
-            if 'final_clip' in locals():
-                final_clip.close()
+        log_message(f"[*] Отредактированное видео сохранено в: {OUTPUT_DIR_NAME}/edited_{video_filepath.name}", log_widget)
 
         # Создаем новый .srt файл
+        begin_stage(job, "Создание .srt")
         log_message("[*] Создание обновленного .srt файла", log_widget)
         try:
             output_srt = output_dir / f"edited_{srt_filepath.name}"
@@ -293,18 +505,50 @@ def edit_video(video_filepath, srt_filepath, output_dir, log_widget, parent):
         log_message(f"[!] Общая ошибка редактирования видео: {e}", log_widget)
         return False
 
+def render_preview_edit(video_filepath, words, kept_indices, output_dir, log_widget, job=None,
+                        gap_tolerance=KEEP_GAP_TOLERANCE_SEC, padding=KEEP_PADDING_SEC):
+    """Собирает быстрый предпросмотр монтажа и открывает его в проигрывателе по умолчанию"""
+    try:
+        begin_stage(job, "Загрузка видео")
+        output_video = output_dir / f"preview_{video_filepath.stem}.mp4"
+        log_message("[*] Предпросмотр: прокси низкого разрешения, быстрое кодирование", log_widget)
+        if render_with_preview(video_filepath, words, kept_indices, output_video, log_widget, job,
+                               gap_tolerance, padding) is None:
+            return False
+        log_message(f"[*] Предпросмотр сохранен в: {OUTPUT_DIR_NAME}/{output_video.name}", log_widget)
+        open_with_default_app(output_video)
+        return True
+    except Exception as e:
+        log_message(f"[!] Ошибка предпросмотра: {e}", log_widget)
+        return False
+
+def open_with_default_app(path):
+    """Открывает файл или папку в приложении по умолчанию"""
+    if sys.platform == "win32":
+        os.startfile(path)
+    else:
+        opener = "open" if sys.platform == "darwin" else "xdg-open"
+        subprocess.run([opener, str(path)])
+
+def edit_video(video_filepath, srt_filepath, output_dir, log_widget, parent,
+               gap_tolerance=KEEP_GAP_TOLERANCE_SEC, padding=KEEP_PADDING_SEC, engine=RENDER_ENGINE):
+    """Редактирует видео на основе отредактированного текста из .srt"""
+    log_message("[*] Начало редактирования видео", log_widget)
+    try:
+        edit = prepare_edit(srt_filepath, log_widget, parent)
+    except Exception as e:
+        log_message(f"[!] Общая ошибка редактирования видео: {e}", log_widget)
+        return False
+    if edit is None:
+        return False
+    words, kept_indices = edit
+    return render_edit(video_filepath, srt_filepath, words, kept_indices, output_dir, log_widget,
+                       gap_tolerance=gap_tolerance, padding=padding, engine=engine)
+
 def compare_texts(original_text, edited_text):
     """Сравнивает исходный и отредактированный текст, возвращает список оставшихся слов"""
     try:
-        original_words = original_text.split()
-        edited_words = edited_text.split()
-        kept_indices = []
-        j = 0
-        for i, orig_word in enumerate(original_words):
-            if j < len(edited_words) and orig_word.lower() == edited_words[j].lower():
-                kept_indices.append(i)
-                j += 1
-        return kept_indices
+        return kept_word_indices(original_text, edited_text)
     except Exception as e:
         logging.error(f"Ошибка в compare_texts: {e}")
         raise
@@ -313,7 +557,7 @@ class TranscribeGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Whisper Video Transcriber")
-        self.root.geometry("800x600")
+        self.root.geometry("800x760")
         
         # Определяем директорию скрипта
         self.script_dir = Path(__file__).parent
@@ -321,6 +565,7 @@ class TranscribeGUI:
         # Переменные
         self.file_path = tk.StringVar()
         self.model_name = tk.StringVar(value="base")
+        self.selected_files = []
 
         # №4: Кнопка "?" в правом верхнем углу
         top_frame = tk.Frame(root)
@@ -344,12 +589,33 @@ class TranscribeGUI:
         tk.Label(root, text="Выберите модель Whisper:").pack()
         model_combo = ttk.Combobox(root, textvariable=self.model_name, values=[m["display"] for m in SUPPORTED_MODELS])
         model_combo.pack(pady=5)
+        # Выбранная модель заранее загружается в пул в фоне, чтобы распознавание начиналось сразу
+        self.model_prefetcher = ModelPrefetcher()
+        self.shown_prefetch_status = ""
+        model_combo.bind("<<ComboboxSelected>>", self.on_model_selected)
+        self.model_status = tk.Label(root, text="", fg="gray")
+        self.model_status.pack()
+
+        # Пропуск тишины перед распознаванием
+        self.use_vad = tk.BooleanVar(value=VAD_ENABLED)
+        tk.Checkbutton(root, text="Пропускать тишину (VAD)", variable=self.use_vad).pack()
+
+        # Квантованная модель для быстрого распознавания на CPU
+        self.use_int8 = tk.BooleanVar(value=INT8_CPU)
+        tk.Checkbutton(root, text="Быстрый режим CPU (int8)", variable=self.use_int8,
+                       command=self.on_model_selected).pack()
+
+        # Движок рендера отредактированного видео
+        self.render_engine = tk.StringVar(value=RENDER_ENGINE)
+        tk.Label(root, text="Движок рендера:").pack()
+        ttk.Combobox(root, textvariable=self.render_engine, values=RENDER_ENGINES, state="readonly").pack(pady=5)
 
         # Кнопки "Создать субтитры" и "Редактировать видео" (центр)
         main_button_frame = tk.Frame(root)
         main_button_frame.pack(pady=10)
         tk.Button(main_button_frame, text="Создать субтитры", command=self.run_transcription).pack(side=tk.LEFT, padx=5)
         tk.Button(main_button_frame, text="Редактировать видео", command=self.run_editing).pack(side=tk.LEFT, padx=5)
+        tk.Button(main_button_frame, text="Предпросмотр", command=self.run_preview).pack(side=tk.LEFT, padx=5)
 
         # №1 и №2: Кнопки "Текст+Субтитры" и "Видео+Субтитры" (справа, вертикально)
         side_button_frame = tk.Frame(root)
@@ -357,10 +623,21 @@ class TranscribeGUI:
         tk.Button(side_button_frame, text="Текст+Субтитры", command=self.open_transcribed_texts).pack(pady=5)
         tk.Button(side_button_frame, text="Видео+Субтитры", command=self.open_edited_videos).pack(pady=5)
 
+        # Очередь заданий с прогрессом и отменой
+        tk.Label(root, text="Очередь заданий:").pack()
+        self.job_list = tk.Listbox(root, width=70, height=4)
+        self.job_list.pack(pady=5)
+        queue_frame = tk.Frame(root)
+        queue_frame.pack()
+        self.progress = ttk.Progressbar(queue_frame, length=400, maximum=1.0)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        tk.Button(queue_frame, text="Отменить", command=self.cancel_job).pack(side=tk.LEFT, padx=5)
+
         # Лог вывода
         tk.Label(root, text="Лог:").pack()
         self.log_area = scrolledtext.ScrolledText(root, wrap=tk.WORD, width=70, height=10)
         self.log_area.pack(pady=10)
+        self.log = LogBuffer(self.log_area)
 
         # Проверка ffmpeg
         if not shutil.which("ffmpeg"):
@@ -368,21 +645,107 @@ class TranscribeGUI:
             messagebox.showerror("Ошибка", "ffmpeg не найден. Установите ffmpeg и добавьте его в PATH.")
             sys.exit(1)
 
+        # Задания выполняются в рабочем потоке, их состояние передается в главный поток через очередь
+        self.job_events = queue.SimpleQueue()
+        self.job_queue = JobQueue(on_update=self.job_events.put, workers=JOB_WORKERS)
+        self.job_rows = []
+        self.job_messages = {}  # id задания -> (сообщение об успехе, сообщение об ошибке)
+        self.root.after(POLL_INTERVAL_MS, self.poll)
+        if WARMUP_IMPORTS:
+            self.root.after(WARMUP_DELAY_MS, lambda: threading.Thread(
+                target=warm_up_imports, name="import-warmup", daemon=True).start())
+
+    def poll(self):
+        """Выводит накопленный лог и обновляет состояние очереди (главный поток)"""
+        self.log.flush()
+        if self.model_prefetcher.status != self.shown_prefetch_status:
+            self.shown_prefetch_status = self.model_prefetcher.status
+            self.model_status.config(text=self.shown_prefetch_status)
+        finished = []
+        changed = False
+        while True:
+            try:
+                job = self.job_events.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            if job.status in ("done", "failed", "cancelled") and job not in finished:
+                finished.append(job)
+        if changed:
+            self.refresh_jobs()
+        self.log.flush()
+        # Планируем следующий опрос до показа диалогов, чтобы лог продолжал обновляться
+        self.root.after(POLL_INTERVAL_MS, self.poll)
+        for job in finished:
+            self.job_finished(job)
+
+    def refresh_jobs(self):
+        self.job_rows = list(self.job_queue.jobs)
+        self.job_list.delete(0, tk.END)
+        for job in self.job_rows:
+            self.job_list.insert(tk.END, job.describe())
+        running = next((j for j in self.job_rows if j.status == "running"), None)
+        self.progress["value"] = running.progress if running else 0.0
+
+    def job_finished(self, job):
+        if job.id not in self.job_messages:
+            return  # Уже сообщили о завершении
+        success_message, error_message = self.job_messages.pop(job.id)
+        if job.status == "done":
+            log_message(f"[*] Задание #{job.id} завершено: {job.name}", self.log_area)
+            messagebox.showinfo("Успех", success_message)
+        elif job.status == "cancelled":
+            log_message(f"[*] Задание #{job.id} отменено: {job.name}", self.log_area)
+        else:
+            log_message(f"[!] Задание #{job.id} завершилось с ошибкой: {job.name}", self.log_area)
+            messagebox.showerror("Ошибка", error_message)
+
+    def cancel_job(self):
+        """Отменяет выбранное задание, а если ничего не выбрано - выполняемое"""
+        selection = self.job_list.curselection()
+        if selection and selection[0] < len(self.job_rows):
+            job = self.job_rows[selection[0]]
+        else:
+            job = next((j for j in self.job_rows if j.status == "running"), None)
+        if job and self.job_queue.cancel(job.id):
+            log_message(f"[*] Запрошена отмена задания #{job.id}: {job.name}", self.log_area)
+
+    def submit_job(self, name, func, stages, success_message, error_message):
+        job = Job(name, func, stages)
+        self.job_messages[job.id] = (success_message, error_message)
+        self.job_queue.submit(job)
+        log_message(f"[*] Задание #{job.id} поставлено в очередь: {name}", self.log_area)
+        return job
+
+    def set_selected_files(self, paths):
+        """Запоминает выбранные файлы; в поле ввода показывается первый"""
+        self.selected_files = [str(p) for p in paths]
+        self.file_path.set(self.selected_files[0] if self.selected_files else "")
+
+    def get_selected_files(self):
+        """Возвращает файлы для обработки: выбранные списком или введенный вручную путь"""
+        file_path = self.file_path.get()
+        if self.selected_files and file_path == self.selected_files[0]:
+            return [Path(p) for p in self.selected_files]
+        return [Path(file_path)] if file_path else []
+
     def select_file(self):
-        file_path = filedialog.askopenfilename(filetypes=[("Media files", list(SUPPORTED_EXTENSIONS))])
-        if file_path:
-            self.file_path.set(file_path)
-            log_message(f"[*] Выбран файл: {file_path}", self.log_area)
+        file_paths = filedialog.askopenfilenames(filetypes=[("Media files", list(SUPPORTED_EXTENSIONS))])
+        if file_paths:
+            self.set_selected_files(file_paths)
+            for file_path in file_paths:
+                log_message(f"[*] Выбран файл: {file_path}", self.log_area)
 
     def drop_file(self, event):
-        file_path = event.data
-        if file_path.startswith("{") and file_path.endswith("}"):
-            file_path = file_path[1:-1]
-        if Path(file_path).suffix.lower() in SUPPORTED_EXTENSIONS:
-            self.file_path.set(file_path)
-            log_message(f"[*] Перетащен файл: {file_path}", self.log_area)
-        else:
-            log_message(f"[!] Неподдерживаемый формат файла: {file_path}", self.log_area)
+        accepted = []
+        for file_path in self.root.tk.splitlist(event.data):
+            if Path(file_path).suffix.lower() in SUPPORTED_EXTENSIONS:
+                accepted.append(file_path)
+                log_message(f"[*] Перетащен файл: {file_path}", self.log_area)
+            else:
+                log_message(f"[!] Неподдерживаемый формат файла: {file_path}", self.log_area)
+        if accepted:
+            self.set_selected_files(accepted)
 
     def open_transcribed_texts(self):
         file_path = self.file_path.get()
@@ -430,63 +793,113 @@ class TranscribeGUI:
             log_message("[!] Файл README.txt не найден.", self.log_area)
             messagebox.showwarning("Предупреждение", "Файл README.txt не найден.")
 
+    def on_model_selected(self, event=None):
+        """Начинает фоновую загрузку выбранной модели, если её веса уже скачаны"""
+        model_name = self.model_name.get().split()[0]
+        if check_model_availability(model_name):
+            self.model_prefetcher.request(model_variant(model_name, self.use_int8.get()))
+        else:
+            # Скачивание весов в фоне не запускаем: оно начнется только по кнопке
+            self.model_prefetcher.cancel()
+            self.model_status.config(text=f"Модель {model_name} не скачана, будет загружена при запуске транскрипции")
+
     def run_transcription(self):
-        file_path = self.file_path.get()
-        if not file_path or not Path(file_path).exists():
+        files = [f for f in self.get_selected_files() if f.exists()]
+        if not files:
             log_message("[!] Выберите файл для обработки.", self.log_area)
             messagebox.showwarning("Предупреждение", "Выберите файл для обработки.")
             return
 
-        input_filepath = Path(file_path)
-        file_size_mb = input_filepath.stat().st_size / (1024 * 1024)
-        if file_size_mb > MAX_FILE_SIZE_MB:
-            log_message(f"[!] Файл {input_filepath.name} слишком большой ({file_size_mb:.2f} МБ).", self.log_area)
-            return
-
-        output_dir = input_filepath.parent / SRT_DIR_NAME
-        output_dir.mkdir(parents=True, exist_ok=True)
-
         # Получаем чистое имя модели (без размера и требований)
-        selected_model = self.model_name.get().split()[0]
-        log_message(f"[*] Начинается транскрипция файла {input_filepath.name}...", self.log_area)
-        success = transcribe_file(input_filepath, selected_model, output_dir, self.log_area)
-        if success:
-            log_message(f"[*] Транскрипция завершена.", self.log_area)
-            messagebox.showinfo("Успех", f"Субтитры и транскрипция сохранены в {SRT_DIR_NAME}.")
-        else:
-            log_message(f"[!] Ошибка транскрипции.", self.log_area)
-            messagebox.showerror("Ошибка", "Не удалось выполнить транскрипцию.")
-
-    def run_editing(self):
-        file_path = self.file_path.get()
-        if not file_path or not Path(file_path).exists():
+        selected_model = model_variant(self.model_name.get().split()[0], self.use_int8.get())
+        use_vad = self.use_vad.get()
+        for input_filepath in files:
+            file_size_mb = input_filepath.stat().st_size / (1024 * 1024)
+            if file_size_mb > MAX_FILE_SIZE_MB:
+                log_message(f"[*] Файл {input_filepath.name} большой ({file_size_mb:.2f} МБ), "
+                            f"будет обработан по частям.", self.log_area)
+
+            output_dir = input_filepath.parent / SRT_DIR_NAME
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+            def task(job, input_filepath=input_filepath, output_dir=output_dir):
+                log_message(f"[*] Начинается транскрипция файла {input_filepath.name}...", self.log)
+                return transcribe_file(input_filepath, selected_model, output_dir, self.log, job, use_vad)
+
+            self.submit_job(
+                f"Транскрипция {input_filepath.name} ({selected_model})", task, TRANSCRIBE_STAGES,
+                f"Субтитры и транскрипция для {input_filepath.name} сохранены в {SRT_DIR_NAME}.",
+                f"Не удалось выполнить транскрипцию {input_filepath.name}.")
+
+    def run_preview(self):
+        """Как "Редактировать видео", но вместо экспорта собирает и открывает быстрый предпросмотр"""
+        self.run_editing(preview=True)
+
+    def run_editing(self, preview=False):
+        files = [f for f in self.get_selected_files() if f.exists()]
+        if not files:
             log_message("[!] Выберите файл для обработки.", self.log_area)
             messagebox.showwarning("Предупреждение", "Выберите файл для обработки.")
             return
 
-        input_filepath = Path(file_path)
-        if input_filepath.suffix.lower() not in VIDEO_EXTENSIONS:
-            log_message("[!] Файл должен быть видео (mp4, mkv, avi, mov).", self.log_area)
-            messagebox.showwarning("Предупреждение", "Файл должен быть видео (mp4, mkv, avi, mov).")
-            return
+        for input_filepath in files:
+            is_audio = input_filepath.suffix.lower() in AUDIO_EXTENSIONS
+            if input_filepath.suffix.lower() not in VIDEO_EXTENSIONS and not is_audio:
+                log_message("[!] Файл должен быть видео (mp4, mkv, avi, mov) или аудио (mp3, wav, m4a, flac, ogg, aac).",
+                            self.log_area)
+                messagebox.showwarning("Предупреждение",
+                                       "Файл должен быть видео (mp4, mkv, avi, mov) или аудио (mp3, wav, m4a, flac, ogg, aac).")
+                continue
+            if preview and is_audio:
+                # Монтаж звука и так быстрый: для звуковых файлов предпросмотр не собирается
+                log_message(f"[!] Предпросмотр для звукового файла {input_filepath.name} не нужен, "
+                            f"используйте \"Редактировать видео\".", self.log_area)
+                continue
 
-        srt_filepath = input_filepath.parent / SRT_DIR_NAME / f"{input_filepath.stem}.srt"
-        if not srt_filepath.exists():
-            log_message(f"[!] Файл .srt для {input_filepath.name} не найден в папке {SRT_DIR_NAME}.", self.log_area)
-            messagebox.showwarning("Предупреждение", f"Файл .srt для {input_filepath.name} не найден.")
-            return
+            srt_filepath = input_filepath.parent / SRT_DIR_NAME / f"{input_filepath.stem}.srt"
+            if not srt_filepath.exists():
+                log_message(f"[!] Файл .srt для {input_filepath.name} не найден в папке {SRT_DIR_NAME}.", self.log_area)
+                messagebox.showwarning("Предупреждение", f"Файл .srt для {input_filepath.name} не найден.")
+                continue
 
-        output_dir = input_filepath.parent / OUTPUT_DIR_NAME
-        output_dir.mkdir(parents=True, exist_ok=True)
+            output_dir = input_filepath.parent / OUTPUT_DIR_NAME
+            output_dir.mkdir(parents=True, exist_ok=True)
 
-        log_message(f"[*] Начинается редактирование видео {input_filepath.name}...", self.log_area)
-        success = edit_video(input_filepath, srt_filepath, output_dir, self.log_area, self.root)
-        if success:
-            log_message(f"[*] Редактирование завершено.", self.log_area)
-            messagebox.showinfo("Успех", f"Отредактированное видео и .srt сохранены в {OUTPUT_DIR_NAME}.")
-        else:
-            log_message(f"[!] Ошибка редактирования.", self.log_area)
-            messagebox.showerror("Ошибка", "Не удалось выполнить редактирование.")
+            # Редактор текста работает в главном потоке, рендер - в очереди заданий
+            log_message(f"[*] Начинается редактирование видео {input_filepath.name}...", self.log_area)
+            try:
+                edit = prepare_edit(srt_filepath, self.log_area, self.root)
+            except Exception as e:
+                log_message(f"[!] Общая ошибка редактирования видео: {e}", self.log_area)
+                edit = None
+            if edit is None:
+                log_message(f"[!] Ошибка редактирования.", self.log_area)
+                messagebox.showerror("Ошибка", "Не удалось выполнить редактирование.")
+                continue
+
+            if preview:
+                def task(job, input_filepath=input_filepath, edit=edit, output_dir=output_dir):
+                    words, kept_indices = edit
+                    return render_preview_edit(input_filepath, words, kept_indices, output_dir, self.log, job)
+
+                self.submit_job(
+                    f"Предпросмотр {input_filepath.name}", task, PREVIEW_STAGES,
+                    f"Предпросмотр {input_filepath.name} сохранен в {OUTPUT_DIR_NAME}.",
+                    f"Не удалось собрать предпросмотр {input_filepath.name}.")
+                continue
+
+            engine = "audio" if is_audio else self.render_engine.get()
+
+            def task(job, input_filepath=input_filepath, srt_filepath=srt_filepath, edit=edit, output_dir=output_dir,
+                     engine=engine):
+                words, kept_indices = edit
+                return render_edit(input_filepath, srt_filepath, words, kept_indices, output_dir, self.log, job,
+                                   engine=engine)
+
+            self.submit_job(
+                f"Редактирование {input_filepath.name}", task, EDIT_STAGES,
+                f"Отредактированное видео и .srt для {input_filepath.name} сохранены в {OUTPUT_DIR_NAME}.",
+                f"Не удалось выполнить редактирование {input_filepath.name}.")
 
 if __name__ == "__main__":
     root = TkinterDnD.Tk()
@@ -0,0 +1,102 @@
+"""Кэш результатов транскрипции с ключом по содержимому файла, модели и параметрам"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from media_utils import CACHE_ROOT, file_hash
+
+# --- Конфигурация ---
+RESULTS_DIR = CACHE_ROOT / "results"
+MAX_CACHE_MB = int(os.environ.get("TRANSCRIBE_RESULT_CACHE_MB", "2048"))
+# Параметры model.transcribe, влияющие на результат (входят в ключ кэша)
+TRANSCRIBE_OPTIONS = {"word_timestamps": True, "language": "ru"}
+
+
+def cache_options(use_vad=False):
+    """Параметры для ключа кэша: VAD меняет результат, поэтому учитывается отдельно"""
+    return {**TRANSCRIBE_OPTIONS, "vad": True} if use_vad else TRANSCRIBE_OPTIONS
+
+
+def _json_default(value):
+    """Преобразует числа NumPy/torch в обычные типы Python для JSON"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return float(value)
+
+
+class TranscriptionCache:
+    """Кэш полных результатов Whisper (текст, сегменты, слова) с LRU-вытеснением по размеру"""
+
+    def __init__(self, directory=RESULTS_DIR, max_mb=MAX_CACHE_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+
+    def make_key(self, input_filepath, model_name, options=TRANSCRIBE_OPTIONS):
+        """Ключ кэша: хэш содержимого файла + модель + параметры транскрипции"""
+        payload = json.dumps({"source": file_hash(input_filepath), "model": model_name, "options": options},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json.gz"
+
+    def get(self, key):
+        """Возвращает сохранённый результат или None"""
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Corrupted cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        # Время изменения служит отметкой последнего использования для LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result):
+        """Сохраняет результат и вытесняет давно не использованные записи сверх лимита"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, default=_json_default)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for path in self.directory.glob("*.json.gz"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                logging.info(f"Transcription cache: evicted {path.name}")
+
+
+_cache = None
+
+
+def get_transcription_cache():
+    """Возвращает общий для процесса кэш результатов"""
+    global _cache
+    if _cache is None:
+        _cache = TranscriptionCache()
+    return _cache
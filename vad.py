@@ -0,0 +1,163 @@
+"""Определение речи (VAD) по энергии и спектральной плоскостности: тишина не передается в Whisper"""
+import logging
+
+import numpy as np
+
+from pcm_cache import load_audio
+
+# --- Конфигурация ---
+SAMPLE_RATE = 16000
+FRAME_SEC = 0.02  # Длина анализируемого кадра
+ENERGY_MARGIN_DB = 12.0  # Насколько кадр речи громче уровня шума
+MIN_ENERGY_DB = -55.0  # Кадры тише этого уровня (dBFS) всегда считаются тишиной
+MAX_FLATNESS = 0.35  # Кадры с более плоским спектром (шум) не считаются речью
+SMOOTH_FRAMES = 5  # Решение по кадру принимается большинством в окне из стольких кадров
+SPEECH_BAND_HZ = (300, 4000)  # Полоса, по которой считается плоскостность спектра
+MIN_SILENCE_SEC = 0.6  # Паузы короче этого не вырезаются
+MIN_SPEECH_SEC = 0.2  # Более короткие всплески считаются шумом
+SPEECH_PAD_SEC = 0.2  # Запас тишины по краям участков речи
+BLOCK_FRAMES = 8192  # Кадров на один блок БПФ (ограничивает память)
+
+
+def frame_features(audio, sample_rate=SAMPLE_RATE):
+    """Энергия (dBFS) и спектральная плоскостность для кадров по FRAME_SEC"""
+    frame = int(FRAME_SEC * sample_rate)
+    count = len(audio) // frame
+    window = np.hanning(frame).astype(np.float32)
+    freqs = np.fft.rfftfreq(frame, 1.0 / sample_rate)
+    band = (freqs >= SPEECH_BAND_HZ[0]) & (freqs <= SPEECH_BAND_HZ[1])
+    energy = np.empty(count, dtype=np.float32)
+    flatness = np.empty(count, dtype=np.float32)
+    for first in range(0, count, BLOCK_FRAMES):
+        last = min(first + BLOCK_FRAMES, count)
+        frames = audio[first * frame:last * frame].reshape(last - first, frame)
+        energy[first:last] = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(frames * window, axis=1))[:, band] ** 2 + 1e-12
+        flatness[first:last] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return energy, flatness
+
+
+def _merge_regions(mask, frame_sec):
+    """Переводит маску кадров в интервалы (сек), сливает близкие и отбрасывает короткие"""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    regions = []
+    for start, end in zip((edges[::2] * frame_sec).tolist(), (edges[1::2] * frame_sec).tolist()):
+        if regions and start - regions[-1][1] < MIN_SILENCE_SEC:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+    return [(start, end) for start, end in regions if end - start >= MIN_SPEECH_SEC]
+
+
+def detect_speech(audio, sample_rate=SAMPLE_RATE):
+    """Возвращает список участков речи [(начало, конец)] в секундах"""
+    duration = len(audio) / sample_rate
+    energy, flatness = frame_features(audio, sample_rate)
+    if not len(energy):
+        return [(0.0, duration)] if duration else []
+    # Уровень шума - нижний дециль энергии; порог адаптируется к записи
+    noise_floor, loud = np.percentile(energy, [10, 90])
+    if loud - noise_floor < ENERGY_MARGIN_DB and loud > MIN_ENERGY_DB:
+        # Нет заметной разницы между тишиной и сигналом: ничего не вырезаем, чтобы не потерять речь
+        return [(0.0, duration)]
+    threshold = max(noise_floor + ENERGY_MARGIN_DB, MIN_ENERGY_DB)
+    mask = (energy > threshold) & (flatness < MAX_FLATNESS)
+    # Одиночные кадры (щелчки, всплески шума) не образуют участков речи
+    mask = np.convolve(mask.astype(np.float32), np.ones(SMOOTH_FRAMES) / SMOOTH_FRAMES, mode="same") > 0.5
+    regions = _merge_regions(mask, FRAME_SEC)
+
+    padded = []
+    for start, end in regions:
+        start = max(start - SPEECH_PAD_SEC, 0.0)
+        end = min(end + SPEECH_PAD_SEC, duration)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+
+class SpeechMap:
+    """Соответствие времени в склеенном звуке (только речь) и в исходной записи"""
+
+    def __init__(self, regions):
+        self.original_starts = np.array([start for start, _ in regions], dtype=np.float64)
+        lengths = np.array([end - start for start, end in regions], dtype=np.float64)
+        self.compact_starts = np.cumsum(lengths) - lengths
+        self.compact_ends = self.compact_starts + lengths
+
+    def to_original(self, t):
+        """Переводит время склеенного звука во время исходной записи"""
+        if not len(self.compact_starts):
+            return t
+        index = int(np.searchsorted(self.compact_starts, t, side="right")) - 1
+        index = min(max(index, 0), len(self.compact_starts) - 1)
+        t = min(t, self.compact_ends[index])
+        return float(self.original_starts[index] + (t - self.compact_starts[index]))
+
+
+def compact_speech(audio, regions, sample_rate=SAMPLE_RATE):
+    """Склеивает участки речи в один массив"""
+    pieces = [audio[int(start * sample_rate):int(end * sample_rate)] for start, end in regions]
+    return np.concatenate(pieces) if pieces else np.empty(0, dtype=np.float32)
+
+
+def remap_result(result, speech_map):
+    """Переносит временные метки сегментов и слов результата Whisper на исходную шкалу"""
+    for segment in result["segments"]:
+        segment["start"] = speech_map.to_original(segment["start"])
+        segment["end"] = speech_map.to_original(segment["end"])
+        for word in segment.get("words", []):
+            word["start"] = speech_map.to_original(word["start"])
+            word["end"] = speech_map.to_original(word["end"])
+    return result
+
+
+def speech_only(audio, sample_rate=SAMPLE_RATE):
+    """Находит речь и склеивает её; возвращает (звук речи, SpeechMap, статистика).
+
+    Статистика: {"total", "speech", "skipped" (сек), "regions"}.
+    """
+    total = len(audio) / sample_rate
+    regions = detect_speech(audio, sample_rate)
+    speech = sum(end - start for start, end in regions)
+    stats = {"total": total, "speech": speech, "skipped": total - speech, "regions": len(regions)}
+    logging.info(f"VAD: {len(regions)} speech regions, {speech:.1f} of {total:.1f} s kept")
+    return compact_speech(audio, regions, sample_rate), SpeechMap(regions), stats
+
+
+def transcribe_speech_only(model, audio, sample_rate=SAMPLE_RATE, **options):
+    """Транскрибирует только участки речи.
+
+    Возвращает результат Whisper на исходной шкале времени; статистика
+    пропуска добавляется в него под ключом "vad".
+    """
+    compact, speech_map, stats = speech_only(audio, sample_rate)
+    if not stats["regions"]:
+        return {"text": "", "segments": [], "language": options.get("language"), "vad": stats}
+    result = remap_result(model.transcribe(compact, **options), speech_map)
+    result["vad"] = stats
+    return result
+
+
+def transcribe_audio(model, audio, use_vad=False, **options):
+    """Транскрибирует уже декодированный звук целиком или, при use_vad, только участки речи"""
+    if not use_vad:
+        return model.transcribe(audio, **options)
+    return transcribe_speech_only(model, audio, **options)
+
+
+def transcribe_media(model, filepath, use_vad=False, **options):
+    """Транскрибирует файл целиком или, при use_vad, только участки речи.
+
+    Звук берется из кэша декодированного PCM, поэтому повторная транскрипция
+    (другой моделью, с VAD или без) не запускает ffmpeg.
+    """
+    return transcribe_audio(model, load_audio(filepath), use_vad, **options)
+
+
+def describe_stats(stats):
+    """Строка для лога: сколько звука пропущено"""
+    share = stats["skipped"] / stats["total"] * 100 if stats["total"] else 0.0
+    return (f"VAD: пропущено {stats['skipped']:.1f} сек из {stats['total']:.1f} ({share:.0f}%), "
+            f"участков речи: {stats['regions']}")
@@ -1,31 +1,47 @@
 import sys
 from pathlib import Path
-import re
+import argparse
 import logging
-import tkinter as tk
-from tkinter import scrolledtext
-from moviepy.editor import VideoFileClip, concatenate_videoclips
-
-# Задержка для просмотра вывода при запуске через двойной клик
-if sys.platform == "win32":
-    input("Нажмите Enter, чтобы начать...")
-
-# Проверка зависимостей
-try:
-    from moviepy.editor import VideoFileClip, concatenate_videoclips
-    print("[*] Библиотека moviepy успешно импортирована")
-except ImportError as e:
-    print(f"[!] Ошибка импорта moviepy: {e}")
-    print("Установите библиотеку в текущей среде:")
-    print("pip install -U moviepy")
-    if sys.platform == "win32":
-        input("\nНажмите Enter для выхода...")
-    sys.exit(1)
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from text_diff import kept_word_indices
+from edit_list import load_kept_indices, EDITED_TEXT_SUFFIX, EDL_SUFFIX
+from srt_codec import write_srt
+from word_sidecar import load_words
+from keep_ranges import build_keep_ranges, remap_words, total_duration, snap_ranges_to_frames
+from media_utils import probe_source
+from ffmpeg_render import (render_ranges, render_smart_cut, render_parallel, render_incremental, render_preview,
+                           render_audio, AUDIO_CROSSFADE_SEC)
+
+# Tk и MoviePy импортируются только при использовании: в режиме --edl с движками ffmpeg
+# скрипт работает на серверах без графической среды и без moviepy
+def check_moviepy():
+    """Проверка зависимости движка moviepy; завершает скрипт, если библиотека не установлена"""
+    try:
+        import moviepy.editor  # noqa: F401
+        print("[*] Библиотека moviepy успешно импортирована")
+    except ImportError as e:
+        print(f"[!] Ошибка импорта moviepy: {e}")
+        print("Установите библиотеку в текущей среде:")
+        print("pip install -U moviepy")
+        if sys.platform == "win32":
+            input("\nНажмите Enter для выхода...")
+        sys.exit(1)
 
 # --- Конфигурация ---
 SRT_DIR_NAME = "transcribed_texts"
 OUTPUT_DIR_NAME = "edited_videos"
-SUPPORTED_EXTENSIONS = {".mp4", ".mkv", ".avi", ".mov"}
+VIDEO_EXTENSIONS = {".mp4", ".mkv", ".avi", ".mov"}
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".flac", ".ogg", ".aac"}  # Монтируются только по звуку, без видео
+SUPPORTED_EXTENSIONS = VIDEO_EXTENSIONS | AUDIO_EXTENSIONS
+KEEP_GAP_TOLERANCE_SEC = 0.3  # Паузы между оставшимися соседними словами короче этого значения не вырезаются
+KEEP_PADDING_SEC = 0.0  # Запас по краям вырезаемых фрагментов (только за счет тишины)
+RENDER_ENGINES = ["moviepy", "ffmpeg", "smartcut", "parallel", "incremental"]
+EDIT_WORKERS = 2  # Сколько пар видео/.srt обрабатывается одновременно в режиме --edl
+RENDER_ENGINE = "moviepy"  # moviepy - через Python/NumPy, ffmpeg - одним вызовом ffmpeg без декодирования в Python,
+# smartcut - копирование целых GOP без перекодирования, перекодируются только края разрезов,
+# parallel - куски равной длительности кодируются одновременно в нескольких процессах ffmpeg,
+# incremental - фрагменты прошлых рендеров берутся из кэша, кодируются только изменённые
 
 # --- Настройка логирования ---
 logging.basicConfig(
@@ -35,65 +51,18 @@ logging.basicConfig(
 )
 
 def parse_srt(srt_filepath):
-    """Парсит .srt файл и возвращает список слов с временными метками и текст без меток"""
-    words = []
-    text = []
-    with open(srt_filepath, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-        i = 0
-        while i < len(lines):
-            if lines[i].strip().isdigit():  # Номер субтитра
-                i += 1
-                if i >= len(lines):
-                    break
-                time_line = lines[i].strip()
-                try:
-                    start_str, end_str = time_line.split(" --> ")
-                    start_time = parse_time(start_str)
-                    end_time = parse_time(end_str)
-                    i += 1
-                    if i >= len(lines):
-                        break
-                    word = lines[i].strip()
-                    if word:  # Пропускаем пустые строки
-                        words.append({"start": start_time, "end": end_time, "word": word})
-                        text.append(word)
-                    i += 1
-                except Exception as e:
-                    logging.error(f"Ошибка парсинга строки времени в {srt_filepath}: {time_line}, ошибка: {e}")
-                    i += 1
-                    continue
-            else:
-                i += 1
-    return words, " ".join(text)
-
-def parse_time(time_str):
-    """Преобразует время в формате чч:мм:сс,миллисекунды или чч:мм:сс:миллисекунды в секунды"""
-    # Удаляем пробелы и нормализуем формат
-    time_str = time_str.strip()
-    # Заменяем запятую на точку для миллисекунд и убираем лишние двоеточия
-    time_str = time_str.replace(",", ".")
-    # Используем регулярное выражение для извлечения чч:мм:сс.миллисекунды
-    match = re.match(r"(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,3}))?", time_str)
-    if not match:
-        raise ValueError(f"Некорректный формат времени: {time_str}")
-    hours, minutes, seconds, milliseconds = match.groups()
-    seconds = float(seconds) + (float(f"0.{milliseconds}") if milliseconds else 0)
-    return int(hours) * 3600 + int(minutes) * 60 + seconds
+    """Загружает слова .srt (из файла .words, если он актуален) и возвращает WordTimeline и текст без меток"""
+    words = load_words(srt_filepath)
+    return words, words.joined_text()
 
 def create_srt(words, output_filepath):
-    """Создает .srt файл из списка слов с временными метками"""
-    with open(output_filepath, "w", encoding="utf-8") as f:
-        for i, word in enumerate(words, 1):
-            start_time = word["start"]
-            end_time = word["end"]
-            text = word["word"].strip()
-            start_srt = f"{int(start_time//3600):02d}:{int((start_time%3600)//60):02d}:{int(start_time%60):02d},{int((start_time%1)*1000):03d}"
-            end_srt = f"{int(end_time//3600):02d}:{int((end_time%3600)//60):02d}:{int(end_time%60):02d},{int((end_time%1)*1000):03d}"
-            f.write(f"{i}\n{start_srt} --> {end_srt}\n{text}\n\n")
+    """Создает .srt файл из слов с временными метками"""
+    write_srt(words, output_filepath)
 
 def edit_text_gui(original_text, callback):
-    """Открывает текстовый редактор для редактирования текста"""
+    """Открывает текстовый редактор для редактирования текста (возврат после закрытия окна)"""
+    import tkinter as tk
+    from tkinter import scrolledtext
     root = tk.Tk()
     root.title("Редактор текста субтитров")
     root.geometry("600x400")
@@ -114,115 +83,246 @@ def edit_text_gui(original_text, callback):
 
 def compare_texts(original_text, edited_text):
     """Сравнивает исходный и отредактированный текст, возвращает список оставшихся слов"""
-    original_words = original_text.split()
-    edited_words = edited_text.split()
-    kept_indices = []
-    j = 0
-    for i, orig_word in enumerate(original_words):
-        if j < len(edited_words) and orig_word.lower() == edited_words[j].lower():
-            kept_indices.append(i)
-            j += 1
-    return kept_indices
-
-def edit_video(video_filepath, srt_filepath):
-    # Определяем директорию скрипта
-    try:
-        script_path = Path(__file__).resolve()
-        script_dir = script_path.parent
-    except NameError:
-        script_dir = Path.cwd()
-        logging.warning("Using current working directory as script directory")
-
-    output_dir = script_dir / OUTPUT_DIR_NAME
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    # Читаем .srt файл
-    words, original_text = parse_srt(srt_filepath)
-    if not words:
-        print(f"[!] Не удалось извлечь слова из {srt_filepath.name}. Проверьте формат .srt файла.")
-        logging.error(f"No words extracted from {srt_filepath.name}")
-        return
-    print(f"[*] Загружено {len(words)} слов из {srt_filepath.name}")
-
-    # Открываем текстовый редактор
-    edited_text = [None]
-    def set_edited_text(text):
-        edited_text[0] = text
-
-    edit_text_gui(original_text, set_edited_text)
-    while edited_text[0] is None:
-        pass  # Ждем, пока пользователь нажмет ОК
-
-    # Сравниваем исходный и отредактированный текст
-    kept_indices = compare_texts(original_text, edited_text[0])
-    filtered_words = [words[i] for i in kept_indices]
-    print(f"[*] После редактирования осталось {len(filtered_words)} слов")
+    return kept_word_indices(original_text, edited_text)
 
+def render_with_moviepy(video_filepath, words, kept_indices, output_video, gap_tolerance, padding):
+    """Рендер через MoviePy; возвращает слова на новой временной шкале или None при ошибке"""
     # Загружаем видео
     try:
+        from moviepy.editor import VideoFileClip, concatenate_videoclips
         video = VideoFileClip(str(video_filepath))
         print(f"[*] Видео {video_filepath.name} загружено")
     except Exception as e:
         print(f"[!] Ошибка загрузки видео: {e}")
         logging.error(f"Failed to load video {video_filepath.name}: {e}")
-        return
+        return None
 
-    # Создаем клипы для оставшихся слов
+    # Объединяем оставшиеся слова в непрерывные интервалы и создаем по клипу на интервал
+    ranges = build_keep_ranges(words, kept_indices, video.duration, gap_tolerance, padding)
+    adjusted_words = remap_words(words, ranges)
+    print(f"[*] {len(ranges)} интервалов для {len(adjusted_words)} слов, итоговая длительность {total_duration(ranges):.1f} сек")
     clips = []
-    current_time = 0
-    adjusted_words = []
-    for word in filtered_words:
-        start = word["start"]
-        end = word["end"]
-        if start >= video.duration:
-            continue
-        end = min(end, video.duration)
+    for r in ranges:
         try:
-            clips.append(video.subclip(start, end))
-            adjusted_words.append({
-                "start": current_time,
-                "end": current_time + (end - start),
-                "word": word["word"]
-            })
-            current_time += end - start
+            clips.append(video.subclip(r["start"], r["end"]))
         except Exception as e:
-            print(f"[!] Ошибка обработки фрагмента {word['word']} ({start}-{end}): {e}")
-            logging.error(f"Failed to process clip for {word['word']} ({start}-{end}): {e}")
-            continue
+            print(f"[!] Ошибка обработки фрагмента ({r['start']}-{r['end']}): {e}")
+            logging.error(f"Failed to process clip ({r['start']}-{r['end']}): {e}")
+            video.close()
+            return None
 
     if not clips:
         print(f"[!] Не удалось создать фрагменты для видео {video_filepath.name}")
         logging.error(f"No clips created for {video_filepath.name}")
         video.close()
-        return
+        return None
 
     # Объединяем клипы
     try:
         final_clip = concatenate_videoclips(clips, method="compose")
-        output_video = output_dir / f"edited_{video_filepath.name}"
         final_clip.write_videofile(str(output_video), codec="libx264", audio_codec="aac")
-        print(f"[*] Отредактированное видео сохранено в: {output_dir.name}/edited_{video_filepath.name}")
     except Exception as e:
         print(f"[!] Ошибка сохранения видео: {e}")
         logging.error(f"Failed to save edited video: {e}")
-        return
+        return None
     finally:
         video.close()
         for clip in clips:
             clip.close()
         if 'final_clip' in locals():
             final_clip.close()
+    return adjusted_words
+
+def render_with_ffmpeg(video_filepath, words, kept_indices, output_video, gap_tolerance, padding, renderer=render_ranges):
+    """Рендер одним вызовом ffmpeg (trim/atrim + concat); возвращает слова на новой шкале или None"""
+    try:
+        source = probe_source(video_filepath)
+        print(f"[*] {'Видео' if source['has_video'] else 'Аудио'} {video_filepath.name}: длительность {source['duration']} сек"
+              + (f", {source['fps']} кадр/с" if source["fps"] else ""))
+    except Exception as e:
+        print(f"[!] Ошибка чтения параметров видео: {e}")
+        logging.error(f"Failed to probe video {video_filepath.name}: {e}")
+        return None
+
+    ranges = build_keep_ranges(words, kept_indices, source["duration"], gap_tolerance, padding)
+    ranges = snap_ranges_to_frames(ranges, source["fps"])
+    adjusted_words = remap_words(words, ranges)
+    print(f"[*] {len(ranges)} интервалов для {len(adjusted_words)} слов, итоговая длительность {total_duration(ranges):.1f} сек")
+    if not ranges:
+        print(f"[!] Не удалось создать фрагменты для видео {video_filepath.name}")
+        logging.error(f"No clips created for {video_filepath.name}")
+        return None
+
+    try:
+        stats = renderer(video_filepath, ranges, output_video, source)
+    except Exception as e:
+        print(f"[!] Ошибка сохранения видео: {e}")
+        logging.error(f"Failed to save edited video: {e}")
+        return None
+    if stats and "copied" in stats:
+        print(f"[*] Умная нарезка: {stats['pieces']} кусков, скопировано {stats['copied']:.1f} сек, "
+              f"перекодировано {stats['encoded']:.1f} сек")
+    elif stats and "reused" in stats:
+        print(f"[*] Повторный экспорт: {stats['segments']} фрагментов, из кэша {stats['reused']:.1f} сек, "
+              f"закодировано {stats['encoded']:.1f} сек")
+    elif stats and "crossfades" in stats:
+        print(f"[*] Монтаж звука: {stats['sample_rate']} Гц, сглажено стыков: {stats['crossfades']}")
+    elif stats and "proxy" in stats:
+        print("[*] Прокси исходника создан и сохранен для следующих предпросмотров" if stats["proxy"]
+              else "[*] Предпросмотр собран из сохраненного прокси исходника")
+    elif stats:
+        print(f"[*] Параллельный экспорт: {stats['chunks']} кусков в {stats['workers']} процессах ffmpeg")
+    return adjusted_words
+
+def render_with_smart_cut(video_filepath, words, kept_indices, output_video, gap_tolerance, padding):
+    """Умная нарезка: целые GOP копируются, перекодируются только края разрезов"""
+    return render_with_ffmpeg(video_filepath, words, kept_indices, output_video, gap_tolerance, padding,
+                              renderer=render_smart_cut)
+
+def render_with_parallel(video_filepath, words, kept_indices, output_video, gap_tolerance, padding):
+    """Параллельный экспорт: куски равной длительности кодируются одновременно и склеиваются без перекодирования"""
+    return render_with_ffmpeg(video_filepath, words, kept_indices, output_video, gap_tolerance, padding,
+                              renderer=render_parallel)
+
+def render_with_incremental(video_filepath, words, kept_indices, output_video, gap_tolerance, padding):
+    """Повторный экспорт: неизменённые фрагменты берутся из кэша, кодируются только новые"""
+    return render_with_ffmpeg(video_filepath, words, kept_indices, output_video, gap_tolerance, padding,
+                              renderer=render_incremental)
+
+def render_with_preview(video_filepath, words, kept_indices, output_video, gap_tolerance, padding):
+    """Предпросмотр: монтаж из прокси низкого разрешения с быстрым кодированием"""
+    return render_with_ffmpeg(video_filepath, words, kept_indices, output_video, gap_tolerance, padding,
+                              renderer=render_preview)
+
+def render_with_audio(video_filepath, words, kept_indices, output_video, gap_tolerance, padding,
+                      crossfade=AUDIO_CROSSFADE_SEC):
+    """Монтаж звукового файла: разрезы по отсчётам, короткое сглаживание стыков, без видео"""
+    return render_with_ffmpeg(video_filepath, words, kept_indices, output_video, gap_tolerance, padding,
+                              renderer=partial(render_audio, crossfade=crossfade))
+
+RENDER_FUNCTIONS = {
+    "moviepy": render_with_moviepy,
+    "ffmpeg": render_with_ffmpeg,
+    "smartcut": render_with_smart_cut,
+    "parallel": render_with_parallel,
+    "incremental": render_with_incremental,
+}
+
+def edit_video(video_filepath, srt_filepath, gap_tolerance=KEEP_GAP_TOLERANCE_SEC, padding=KEEP_PADDING_SEC,
+               engine=RENDER_ENGINE, headless=False, preview=False, crossfade=AUDIO_CROSSFADE_SEC):
+    """Редактирует видео по правке текста; при headless правка берется из файла .edl или .edit.txt рядом с .srt.
+
+    При preview вместо экспорта сохраняется только быстрый предпросмотр низкого разрешения.
+    Звуковые файлы (AUDIO_EXTENSIONS) монтируются только по звуку, engine для них не используется,
+    а предпросмотр пропускается: монтаж звука и так быстрый.
+    Возвращает True, если видео и новый .srt (или предпросмотр) сохранены.
+    """
+    is_audio = video_filepath.suffix.lower() in AUDIO_EXTENSIONS
+    if preview and is_audio:
+        print(f"[!] Предпросмотр для звукового файла {video_filepath.name} не собирается: монтаж звука быстрый, "
+              f"запустите без --preview.")
+        return False
+
+    # Определяем директорию скрипта
+    try:
+        script_path = Path(__file__).resolve()
+        script_dir = script_path.parent
+    except NameError:
+        script_dir = Path.cwd()
+        logging.warning("Using current working directory as script directory")
+
+    output_dir = script_dir / OUTPUT_DIR_NAME
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Читаем .srt файл
+    words, original_text = parse_srt(srt_filepath)
+    if not words:
+        print(f"[!] Не удалось извлечь слова из {srt_filepath.name}. Проверьте формат .srt файла.")
+        logging.error(f"No words extracted from {srt_filepath.name}")
+        return False
+    print(f"[*] Загружено {len(words)} слов из {srt_filepath.name}")
+
+    if headless:
+        try:
+            kept_indices = load_kept_indices(srt_filepath, words, original_text)
+        except Exception as e:
+            print(f"[!] Ошибка чтения правки для {video_filepath.name}: {e}")
+            logging.error(f"Failed to read edit decision for {video_filepath.name}: {e}")
+            return False
+        if kept_indices is None:
+            print(f"[!] Для {video_filepath.name} нет файла правки ({srt_filepath.stem}{EDL_SUFFIX} "
+                  f"или {srt_filepath.stem}{EDITED_TEXT_SUFFIX}), пропуск.")
+            return False
+    else:
+        # Открываем текстовый редактор; mainloop возвращает управление после закрытия окна
+        edited_text = [None]
+        def set_edited_text(text):
+            edited_text[0] = text
+
+        edit_text_gui(original_text, set_edited_text)
+        if edited_text[0] is None:
+            print("[!] Окно редактора закрыто без сохранения, пропуск.")
+            return False
+        # Сравниваем исходный и отредактированный текст
+        kept_indices = compare_texts(original_text, edited_text[0])
+    print(f"[*] После редактирования осталось {len(kept_indices)} слов")
+    if not kept_indices:
+        print(f"[!] После редактирования не осталось слов для {video_filepath.name}.")
+        return False
+
+    if preview:
+        output_video = output_dir / f"preview_{video_filepath.stem}.mp4"
+        print("[*] Предпросмотр: прокси низкого разрешения, быстрое кодирование")
+        if render_with_preview(video_filepath, words, kept_indices, output_video, gap_tolerance, padding) is None:
+            return False
+        print(f"[*] Предпросмотр сохранен в: {output_dir.name}/{output_video.name}")
+        logging.info(f"Preview saved for {video_filepath.name}")
+        return True
+
+    output_video = output_dir / f"edited_{video_filepath.name}"
+    if is_audio:
+        print(f"[*] Монтаж звука без видео, сглаживание стыков {crossfade * 1000:.0f} мс")
+        adjusted_words = render_with_audio(video_filepath, words, kept_indices, output_video, gap_tolerance, padding,
+                                           crossfade)
+    else:
+        print(f"[*] Движок рендера: {engine}")
+        adjusted_words = RENDER_FUNCTIONS[engine](video_filepath, words, kept_indices, output_video,
+                                                  gap_tolerance, padding)
+    if adjusted_words is None:
+        return False
+    print(f"[*] {'Отредактированный звук сохранен' if is_audio else 'Отредактированное видео сохранено'} в: "
+          f"{output_dir.name}/edited_{video_filepath.name}")
 
     # Создаем новый .srt файл
     output_srt = output_dir / f"edited_{srt_filepath.name}"
     create_srt(adjusted_words, output_srt)
     print(f"[*] Обновленный .srt сохранен в: {output_dir.name}/edited_{srt_filepath.name}")
     logging.info(f"Edited video and SRT saved for {video_filepath.name}")
+    return True
 
 if __name__ == "__main__":
     print("--- Video Editor Based on SRT ---")
     print("Редактирование видео на основе субтитров...")
 
+    parser = argparse.ArgumentParser(description="Редактирование видео на основе субтитров")
+    parser.add_argument("--engine", choices=RENDER_ENGINES, default=RENDER_ENGINE,
+                        help=f"движок рендера (по умолчанию {RENDER_ENGINE})")
+    parser.add_argument("--edl", action="store_true",
+                        help=f"без окна редактора: правка читается из {EDL_SUFFIX} или {EDITED_TEXT_SUFFIX} рядом с .srt")
+    parser.add_argument("--preview", action="store_true",
+                        help="вместо экспорта сохранить быстрый предпросмотр монтажа низкого разрешения")
+    parser.add_argument("--crossfade", type=float, default=AUDIO_CROSSFADE_SEC,
+                        help=f"сглаживание стыков при монтаже звуковых файлов, сек (по умолчанию {AUDIO_CROSSFADE_SEC}, 0 - без сглаживания)")
+    parser.add_argument("--jobs", type=int, default=EDIT_WORKERS,
+                        help=f"сколько видео обрабатывать одновременно в режиме --edl (по умолчанию {EDIT_WORKERS})")
+    args = parser.parse_args()
+
+    # Задержка для просмотра вывода при запуске через двойной клик
+    if sys.platform == "win32" and not args.edl:
+        input("Нажмите Enter, чтобы начать...")
+    if args.engine == "moviepy" and not args.preview:
+        check_moviepy()
+
     # Определяем директорию
     script_dir = Path.cwd()
     srt_dir = script_dir / SRT_DIR_NAME
@@ -234,18 +334,36 @@ if __name__ == "__main__":
             input("\nНажмите Enter для выхода...")
         sys.exit(1)
 
-    processed = False
+    pairs = []
     for video_file in video_files:
         srt_file = srt_dir / f"{video_file.stem}.srt"
         if srt_file.exists():
-            print(f"\n[*] Обработка видео: {video_file.name} с субтитрами: {srt_file.name}")
-            edit_video(video_file, srt_file)
-            processed = True
+            pairs.append((video_file, srt_file))
         else:
             print(f"[!] Файл .srt для {video_file.name} не найден в папке {SRT_DIR_NAME}.")
 
-    if not processed:
+    if not pairs:
         print("[!] Не найдено пар видео и .srt файлов для обработки.")
-    
-    if sys.platform == "win32":
+    elif args.edl:
+        # Пары обрабатываются пулом ограниченного размера; рендер идет в процессах ffmpeg
+        workers = max(1, min(args.jobs, len(pairs)))
+        print(f"\n[*] Неинтерактивный режим: {len(pairs)} видео, одновременно {workers}")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(edit_video, video_file, srt_file, engine=args.engine, headless=True,
+                                       preview=args.preview, crossfade=args.crossfade): video_file
+                       for video_file, srt_file in pairs}
+            done = 0
+            for future, video_file in futures.items():
+                try:
+                    done += bool(future.result())
+                except Exception as e:
+                    print(f"[!] Ошибка обработки {video_file.name}: {e}")
+                    logging.error(f"Headless edit failed for {video_file.name}: {e}")
+        print(f"\n[*] Обработано видео: {done} из {len(pairs)}")
+    else:
+        for video_file, srt_file in pairs:
+            print(f"\n[*] Обработка видео: {video_file.name} с субтитрами: {srt_file.name}")
+            edit_video(video_file, srt_file, engine=args.engine, preview=args.preview, crossfade=args.crossfade)
+
+    if sys.platform == "win32" and not args.edl:
         input("\nНажмите Enter для выхода...")
\ No newline at end of file
@@ -2,20 +2,40 @@ import sys
 from pathlib import Path
 import shutil
 import logging
+import argparse
+import time
+import itertools
 from tqdm import tqdm
+from model_pool import get_model_pool
+from transcription_cache import get_transcription_cache, cache_options, TRANSCRIBE_OPTIONS
+from vad import transcribe_audio, describe_stats
+from pcm_cache import prefetch_audio
+from batch_manifest import BatchManifest, MANIFEST_NAME
+from word_timeline import WordTimeline
+from srt_codec import write_srt
+from word_sidecar import write_sidecar, sidecar_path
+from media_utils import file_hash, probe_duration
+from chunked_transcribe import transcribe_chunked
+from quantize import model_variant
+
+# Рабочие процессы (--workers) импортируют этот модуль повторно под именем __mp_main__,
+# интерактивные паузы и диагностика нужны только в основном процессе
+IS_MAIN_PROCESS = __name__ == "__main__"
 
 # Задержка для просмотра вывода при запуске через двойной клик
-if sys.platform == "win32":
+if sys.platform == "win32" and IS_MAIN_PROCESS:
     input("Нажмите Enter, чтобы начать...")
 
 # Диагностика интерпретатора Python
-print(f"[*] Используемый Python: {sys.executable}")
-print(f"[*] Версия Python: {sys.version}")
+if IS_MAIN_PROCESS:
+    print(f"[*] Используемый Python: {sys.executable}")
+    print(f"[*] Версия Python: {sys.version}")
 
 # Проверка зависимостей
 try:
     import whisper
-    print("[*] Библиотека openai-whisper успешно импортирована")
+    if IS_MAIN_PROCESS:
+        print("[*] Библиотека openai-whisper успешно импортирована")
 except ImportError as e:
     print(f"[!] Ошибка импорта openai-whisper: {e}")
     print("Установите библиотеку в текущей среде:")
@@ -26,7 +46,8 @@ except ImportError as e:
 
 try:
     import torch
-    print("[*] Библиотека torch успешно импортирована")
+    if IS_MAIN_PROCESS:
+        print("[*] Библиотека torch успешно импортирована")
 except ImportError as e:
     print(f"[!] Ошибка импорта torch: {e}")
     print("Установите библиотеку в текущей среде:")
@@ -49,7 +70,10 @@ SUPPORTED_EXTENSIONS = {
     ".mp3", ".wav", ".m4a", ".flac", ".ogg", ".aac",
     ".mp4", ".mov", ".avi", ".mkv", ".webm", ".mpeg", ".mpg"
 }
-MAX_FILE_SIZE_MB = 1024  # Максимальный размер файла в МБ
+MAX_FILE_SIZE_MB = 1024  # Файлы больше этого размера (МБ) транскрибируются по частям
+VAD_ENABLED = False  # Передавать в Whisper только участки речи (включается флагом --vad)
+INT8_CPU = False  # Динамически квантованная int8-модель на CPU (включается флагом --int8)
+INFERENCE_BATCH_SIZE = 1  # Короткие файлы (до 30 сек) распознаются пакетами такого размера (флаг --batch-size)
 SUPPORTED_MODELS = [
     {"name": "tiny", "description": "Самая легкая модель, низкая точность, подходит для слабых ПК"},
     {"name": "base", "description": "Легкая модель, хороший баланс скорости и точности"},
@@ -100,17 +124,140 @@ def select_model():
 
 def create_srt(words, output_filepath):
     """Создает файл субтитров в формате .srt с временными метками на уровне слов"""
+    write_srt(words, output_filepath)
+
+def save_transcription(result, input_filepath, output_dir, model_name):
+    """Сохраняет результат Whisper в .txt и .srt; возвращает список записанных файлов"""
+    output_filename = input_filepath.stem + ".txt"
+    srt_filename = input_filepath.stem + ".srt"
+    output_filepath = output_dir / output_filename
+    srt_filepath = output_dir / srt_filename
+
+    # Сохраняем текст
     with open(output_filepath, "w", encoding="utf-8") as f:
-        for i, word in enumerate(words, 1):
-            start_time = word.get("start", 0)
-            end_time = word.get("end", start_time + 0.5)  # Добавляем 0.5 сек, если end отсутствует
-            text = word["word"].strip()
-            # Форматируем время в формате SRT (чч:мм:сс,миллисекунды)
-            start_srt = f"{int(start_time//3600):02d}:{int((start_time%3600)//60):02d}:{int(start_time%60):02d},{int((start_time%1)*1000):03d}"
-            end_srt = f"{int(end_time//3600):02d}:{int((end_time%3600)//60):02d}:{int(end_time%60):02d},{int((end_time%1)*1000):03d}"
-            f.write(f"{i}\n{start_srt} --> {end_srt}\n{text}\n\n")
-
-def transcribe_files_in_folder(model_name):
+        f.write(result["text"])
+    print(f"  [*] Транскрипция сохранена в: {output_dir.name}/{output_filename}")
+    outputs = [output_filepath]
+
+    # Собираем слова с временными метками
+    words = WordTimeline.from_words(word for segment in result["segments"] for word in segment.get("words", []))
+    if words:
+        create_srt(words, srt_filepath)
+        print(f"  [*] Субтитры сохранены в: {output_dir.name}/{srt_filename}")
+        outputs.append(srt_filepath)
+        # Бинарная копия меток слов: редактор открывает её без разбора .srt
+        try:
+            write_sidecar(words, sidecar_path(srt_filepath), model=model_name, language=result.get("language"),
+                          source_sha256=file_hash(input_filepath))
+            outputs.append(sidecar_path(srt_filepath))
+        except Exception as e:
+            print(f"  [!] Не удалось сохранить файл меток слов: {e}")
+            logging.warning(f"Failed to write word sidecar for {input_filepath.name}: {e}")
+    else:
+        print(f"  [!] Не удалось получить временные метки слов для {input_filepath.name}")
+    return outputs
+
+def save_transcription_error(error, input_filepath, output_dir):
+    """Записывает сообщение об ошибке транскрипции в .txt"""
+    output_filename = input_filepath.stem + ".txt"
+    print(f"  [!] Ошибка транскрипции {input_filepath.name}: {error}")
+    logging.error(f"Transcription failed for {input_filepath.name}: {error}")
+    try:
+        with open(output_dir / output_filename, "w", encoding="utf-8") as f:
+            f.write(f"Ошибка транскрипции: {error}")
+        print(f"  [*] Сообщение об ошибке записано в: {output_dir.name}/{output_filename}")
+    except Exception as write_err:
+        print(f"  [!] Не удалось записать ошибку: {write_err}")
+        logging.error(f"Failed to write error message for {input_filepath.name}: {write_err}")
+
+def transcribe_sequential(model, files, use_vad=False):
+    """Транскрибирует файлы по одному; возвращает кортежи (путь, результат, ошибка, время).
+
+    Звук следующего файла декодируется в фоновом потоке, пока модель занята текущим.
+    """
+    audio_queue = prefetch_audio(files)
+    while True:
+        wait_started = time.time()
+        try:
+            input_filepath, audio, error = next(audio_queue)
+        except StopIteration:
+            break
+        waited = time.time() - wait_started
+        print(f"\n--- Обработка: {input_filepath.name} ---")
+        logging.info(f"Processing file: {input_filepath.name} (waited {waited:.1f} s for audio)")
+        if error is not None:
+            yield input_filepath, None, error, waited
+            continue
+        started = time.time()
+        try:
+            # Транскрипция с временными метками слов
+            result = transcribe_audio(model, audio, use_vad, verbose=False, **TRANSCRIBE_OPTIONS)
+            yield input_filepath, result, None, time.time() - started + waited
+        except Exception as e:
+            yield input_filepath, None, e, time.time() - started + waited
+
+def split_cached(files, model_name, use_vad=False):
+    """Делит файлы на уже распознанные (есть в кэше) и требующие транскрипции.
+
+    Возвращает (список кортежей (путь, результат, None, 0.0) для найденных в кэше,
+    список оставшихся файлов, словарь путь -> ключ кэша).
+    """
+    cache = get_transcription_cache()
+    cached = []
+    pending = []
+    cache_keys = {}
+    for input_filepath in files:
+        try:
+            key = cache.make_key(input_filepath, model_name, cache_options(use_vad))
+            result = cache.get(key)
+        except Exception as e:
+            logging.warning(f"Transcription cache unavailable for {input_filepath.name}: {e}")
+            key, result = None, None
+        if result is not None:
+            print(f"  [*] {input_filepath.name}: результат взят из кэша")
+            logging.info(f"Cache hit for {input_filepath.name}")
+            cached.append((input_filepath, result, None, 0.0))
+        else:
+            pending.append(input_filepath)
+            cache_keys[input_filepath] = key
+    return cached, pending, cache_keys
+
+def transcribe_long_file(input_filepath, output_dir, model_name, device, use_vad=False):
+    """Транскрибирует большой файл окнами; .txt и .srt дописываются по ходу. Возвращает записанные файлы"""
+    print(f"\n--- Обработка по частям: {input_filepath.name} ---")
+    logging.info(f"Chunked transcription: {input_filepath.name}")
+    model = get_model_pool().get(model_name, device)
+    duration = probe_duration(input_filepath)
+    txt_filepath = output_dir / (input_filepath.stem + ".txt")
+    srt_filepath = output_dir / (input_filepath.stem + ".srt")
+
+    def on_window(index, offset):
+        total = f" из {duration / 60:.0f} мин" if duration else ""
+        print(f"  [*] Окно {index + 1}: с {offset / 60:.1f} мин{total}")
+
+    words = transcribe_chunked(model, input_filepath, txt_filepath, srt_filepath, on_window=on_window, use_vad=use_vad)
+    print(f"  [*] Транскрипция сохранена в: {output_dir.name}/{txt_filepath.name}")
+    print(f"  [*] Субтитры сохранены в: {output_dir.name}/{srt_filepath.name} ({len(words)} слов)")
+    outputs = [txt_filepath, srt_filepath]
+    try:
+        write_sidecar(words, sidecar_path(srt_filepath), model=model_name, language=TRANSCRIBE_OPTIONS["language"],
+                      source_sha256=file_hash(input_filepath))
+        outputs.append(sidecar_path(srt_filepath))
+    except Exception as e:
+        print(f"  [!] Не удалось сохранить файл меток слов: {e}")
+        logging.warning(f"Failed to write word sidecar for {input_filepath.name}: {e}")
+    return outputs
+
+def update_manifest(mark, input_filepath, *args):
+    """Обновляет манифест; ошибка записи манифеста не прерывает пакетную обработку"""
+    try:
+        mark(input_filepath, *args)
+    except Exception as e:
+        print(f"  [!] Не удалось обновить манифест: {e}")
+        logging.error(f"Failed to update manifest for {input_filepath.name}: {e}")
+
+def transcribe_files_in_folder(model_name, workers=1, use_vad=VAD_ENABLED, batch_size=INFERENCE_BATCH_SIZE,
+                               int8=INT8_CPU):
     # Определяем директорию скрипта
     try:
         script_path = Path(__file__).resolve()
@@ -135,94 +282,144 @@ def transcribe_files_in_folder(model_name):
 
     # Определяем устройство (GPU или CPU)
     device = "cuda" if torch.cuda.is_available() else "cpu"
+    if int8:
+        # Квантованная модель работает только на CPU; результаты, кэш и манифест ведутся под именем "<модель>-int8"
+        device = "cpu"
+        model_name = model_variant(model_name, int8)
+        print(f"[*] Режим int8: динамически квантованная модель '{model_name}' на CPU.")
     print(f"[*] Используемое устройство: {device}")
-    if device == "cpu":
+    if device == "cpu" and not int8:
         print("[!] Внимание: Транскрипция на CPU будет медленнее.")
         if model_name in ["medium", "large", "large-v2", "large-v3"]:
-            print(f"[!] Модель '{model_name}' может быть очень медленной на CPU.")
+            print(f"[!] Модель '{model_name}' может быть очень медленной на CPU (ускорение: флаг --int8).")
     logging.info(f"Using device: {device}")
 
-    # Загружаем модель Whisper
-    print(f"[*] Загрузка модели Whisper '{model_name}'...")
-    try:
-        model = whisper.load_model(model_name, device=device)
-        print("[*] Модель успешно загружена.")
-        logging.info(f"Model {model_name} loaded successfully")
-    except Exception as e:
-        print(f"[!] Ошибка загрузки модели: {e}")
-        print(f"Убедитесь, что модель '{model_name}' поддерживается и есть доступ к интернету для загрузки.")
-        logging.error(f"Failed to load model: {e}")
-        return
-
     # Ищем файлы для обработки
     files_to_process = []
     print("\n[*] Поиск поддерживаемых аудио/видео файлов...")
     for item in script_dir.iterdir():
         if item.is_file() and item.suffix.lower() in SUPPORTED_EXTENSIONS:
             file_size_mb = item.stat().st_size / (1024 * 1024)
-            if file_size_mb > MAX_FILE_SIZE_MB:
-                print(f"  [!] Файл {item.name} слишком большой ({file_size_mb:.2f} МБ). Пропуск.")
-                logging.warning(f"Skipped {item.name}: File too large ({file_size_mb:.2f} MB)")
-                continue
             files_to_process.append(item)
-            print(f"  [+] Найден: {item.name}")
+            if file_size_mb > MAX_FILE_SIZE_MB:
+                print(f"  [+] Найден: {item.name} ({file_size_mb:.2f} МБ, будет обработан по частям)")
+            else:
+                print(f"  [+] Найден: {item.name}")
 
     if not files_to_process:
         print("\n[!] Не найдено поддерживаемых файлов.")
         logging.info("No supported files found")
         return
 
-    print(f"\n[*] Начинается транскрипция {len(files_to_process)} файла(ов)...")
+    # Манифест позволяет продолжить прерванный запуск: готовые файлы пропускаются
+    manifest = BatchManifest(output_dir / MANIFEST_NAME, model_name)
+    completed = [f for f in files_to_process if manifest.is_complete(f)]
+    if completed:
+        print(f"[*] Уже обработано ранее (по {MANIFEST_NAME}): {len(completed)}, пропуск.")
+        logging.info(f"Resuming: {len(completed)} files already done according to manifest")
+        files_to_process = [f for f in files_to_process if f not in completed]
+    if not files_to_process:
+        print("\n[*] Все файлы уже обработаны.")
+        return
+    manifest.mark_pending(files_to_process)
+
+    # Большие файлы не декодируются в память целиком, а транскрибируются окнами после остальных
+    long_files = [f for f in files_to_process if f.stat().st_size > MAX_FILE_SIZE_MB * 1024 * 1024]
+    files_to_process = [f for f in files_to_process if f not in long_files]
+
+    # Файлы, уже распознанные той же моделью, берутся из кэша без загрузки модели
+    cached, pending, cache_keys = split_cached(files_to_process, model_name, use_vad)
+    if cached:
+        print(f"[*] Найдено в кэше: {len(cached)}, требуют транскрипции: {len(pending)}")
+
+    if not pending:
+        results = iter(())
+    elif workers > 1:
+        # Параллельный режим: каждый рабочий процесс загружает свою копию модели
+        from parallel_transcribe import transcribe_parallel, threads_per_worker
+        if device == "cuda":
+            print(f"[!] Внимание: {workers} копии модели будут загружены на один GPU.")
+        print(f"\n[*] Начинается транскрипция {len(pending)} файла(ов) в {workers} процессах "
+              f"({threads_per_worker(workers)} потоков torch на процесс, сначала самые длинные файлы)...")
+        logging.info(f"Parallel transcription: {workers} workers")
+        if batch_size > 1:
+            print("[!] Пакетный режим (--batch-size) не используется вместе с --workers.")
+        results = transcribe_parallel(pending, model_name, device, workers, use_vad)
+    else:
+        # Загружаем модель Whisper
+        print(f"[*] Загрузка модели Whisper '{model_name}'...")
+        try:
+            model = get_model_pool().get(model_name, device)
+            print("[*] Модель успешно загружена.")
+            logging.info(f"Model {model_name} loaded successfully")
+        except Exception as e:
+            print(f"[!] Ошибка загрузки модели: {e}")
+            print(f"Убедитесь, что модель '{model_name}' поддерживается и есть доступ к интернету для загрузки.")
+            logging.error(f"Failed to load model: {e}")
+            return
+        if batch_size > 1:
+            # Короткие файлы проходят через кодировщик и декодер пакетами по batch_size
+            from batch_inference import transcribe_batched
+            print(f"\n[*] Начинается транскрипция {len(pending)} файла(ов) пакетами по {batch_size}...")
+            logging.info(f"Batched transcription: batch size {batch_size}")
+            results = transcribe_batched(model, pending, use_vad, batch_size)
+        else:
+            print(f"\n[*] Начинается транскрипция {len(pending)} файла(ов)...")
+            results = transcribe_sequential(model, pending, use_vad)
+
     success_count = 0
     fail_count = 0
+    vad_total = 0.0
+    vad_skipped = 0.0
 
     # Обрабатываем файлы
-    for input_filepath in tqdm(files_to_process, desc="Транскрипция файлов"):
-        output_filename = input_filepath.stem + ".txt"
-        srt_filename = input_filepath.stem + ".srt"
-        output_filepath = output_dir / output_filename
-        srt_filepath = output_dir / srt_filename
-        print(f"\n--- Обработка: {input_filepath.name} ---")
-        logging.info(f"Processing file: {input_filepath.name}")
+    cache = get_transcription_cache()
+    for input_filepath, result, error, elapsed in tqdm(itertools.chain(cached, results), total=len(files_to_process),
+                                                       desc="Транскрипция файлов"):
+        if error is None:
+            if "vad" in result:
+                print(f"  [*] {input_filepath.name}: {describe_stats(result['vad'])}")
+                vad_total += result["vad"]["total"]
+                vad_skipped += result["vad"]["skipped"]
+            if cache_keys.get(input_filepath):
+                try:
+                    cache.put(cache_keys[input_filepath], result)
+                except Exception as e:
+                    logging.warning(f"Failed to cache result for {input_filepath.name}: {e}")
+            try:
+                outputs = save_transcription(result, input_filepath, output_dir, model_name)
+                logging.info(f"Transcription and SRT saved for {input_filepath.name} ({elapsed:.1f} s)")
+                success_count += 1
+            except Exception as e:
+                error = e
+        if error is None:
+            update_manifest(manifest.mark_done, input_filepath, elapsed, outputs)
+            continue
+        save_transcription_error(error, input_filepath, output_dir)
+        update_manifest(manifest.mark_failed, input_filepath, elapsed, error)
+        fail_count += 1
 
+    for input_filepath in long_files:
+        started = time.time()
         try:
-            # Транскрипция с временными метками слов
-            result = model.transcribe(str(input_filepath), verbose=False, word_timestamps=True, language="ru")
-            transcribed_text = result["text"]
-
-            # Сохраняем текст
-            with open(output_filepath, "w", encoding="utf-8") as f:
-                f.write(transcribed_text)
-            print(f"  [*] Транскрипция сохранена в: {output_dir.name}/{output_filename}")
-
-            # Собираем слова с временными метками
-            words = []
-            for segment in result["segments"]:
-                words.extend(segment.get("words", []))
-            if words:
-                create_srt(words, srt_filepath)
-                print(f"  [*] Субтитры сохранены в: {output_dir.name}/{srt_filename}")
-            else:
-                print(f"  [!] Не удалось получить временные метки слов для {input_filepath.name}")
-
-            logging.info(f"Transcription and SRT saved for {input_filepath.name}")
+            outputs = transcribe_long_file(input_filepath, output_dir, model_name, device, use_vad)
+            logging.info(f"Chunked transcription saved for {input_filepath.name} ({time.time() - started:.1f} s)")
+            update_manifest(manifest.mark_done, input_filepath, time.time() - started, outputs)
             success_count += 1
-
         except Exception as e:
-            print(f"  [!] Ошибка транскрипции {input_filepath.name}: {e}")
-            logging.error(f"Transcription failed for {input_filepath.name}: {e}")
-            try:
-                with open(output_filepath, "w", encoding="utf-8") as f:
-                    f.write(f"Ошибка транскрипции: {e}")
-                print(f"  [*] Сообщение об ошибке записано в: {output_dir.name}/{output_filename}")
-            except Exception as write_err:
-                print(f"  [!] Не удалось записать ошибку: {write_err}")
-                logging.error(f"Failed to write error message for {input_filepath.name}: {write_err}")
+            save_transcription_error(e, input_filepath, output_dir)
+            update_manifest(manifest.mark_failed, input_filepath, time.time() - started, e)
             fail_count += 1
 
     print("\n-------------------------------------")
     print(f"Завершена обработка. Успешно: {success_count}, С ошибками: {fail_count}")
     print(f"Результаты сохранены в папке: {output_dir.name}")
+    print(f"[*] Состояние пакета: {output_dir.name}/{MANIFEST_NAME}")
+    if vad_total:
+        print(f"[*] VAD: пропущено {vad_skipped / 60:.1f} мин из {vad_total / 60:.1f} ({vad_skipped / vad_total:.0%})")
+        logging.info(f"VAD skipped {vad_skipped:.1f} of {vad_total:.1f} s")
+    if (workers == 1 and pending) or long_files:
+        print(f"[*] {get_model_pool().report()}")
     logging.info(f"Completed. Successful: {success_count}, Failed: {fail_count}")
 
 if __name__ == "__main__":
@@ -230,9 +427,23 @@ if __name__ == "__main__":
     print("Запуск генерации субтитров для аудио/видео файлов...")
     print("Для слабых компьютеров используйте 'tiny' или 'base'.")
     
+    parser = argparse.ArgumentParser(description="Пакетная транскрипция аудио/видео файлов в папке скрипта")
+    parser.add_argument("--model", choices=[m["name"] for m in SUPPORTED_MODELS],
+                        help="модель Whisper (если не указана, будет предложен выбор)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="количество параллельных процессов транскрипции (по умолчанию 1)")
+    parser.add_argument("--vad", action="store_true", default=VAD_ENABLED,
+                        help="пропускать тишину: в Whisper передаются только участки речи")
+    parser.add_argument("--int8", action="store_true", default=INT8_CPU,
+                        help="быстрый режим CPU: динамически квантованная int8-модель (веса кэшируются на диске)")
+    parser.add_argument("--batch-size", type=int, default=INFERENCE_BATCH_SIZE,
+                        help="распознавать короткие файлы (до 30 сек) пакетами такого размера (по умолчанию 1)")
+    args = parser.parse_args()
+
     # Выбор модели пользователем
-    selected_model = select_model()
-    transcribe_files_in_folder(selected_model)
+    selected_model = args.model or select_model()
+    transcribe_files_in_folder(selected_model, workers=max(1, args.workers), use_vad=args.vad,
+                               batch_size=max(1, args.batch_size), int8=args.int8)
     
     if sys.platform == "win32":
         input("\nНажмите Enter для выхода...")
\ No newline at end of file
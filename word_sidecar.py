@@ -0,0 +1,106 @@
+"""Бинарный файл временных меток слов (.words) рядом с .srt, открываемый через mmap без разбора.
+
+Формат (little-endian):
+    8 байт   сигнатура b"TEWORDS1"
+    4 байта  длина заголовка (uint32)
+    JSON-заголовок: count, text_chars, text_bytes, model, language, source_sha256
+    выравнивание нулями до 8 байт
+    float64[count]    начала слов, сек
+    float64[count]    концы слов, сек
+    int32[count + 1]  смещения слов в тексте (в символах)
+    текст всех слов подряд в UTF-8
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from srt_codec import read_srt
+from word_timeline import WordTimeline
+
+# --- Конфигурация ---
+SIDECAR_SUFFIX = ".words"
+MAGIC = b"TEWORDS1"
+FORMAT_VERSION = 1
+
+
+def sidecar_path(srt_filepath):
+    """Путь к файлу .words для заданного .srt"""
+    return Path(srt_filepath).with_suffix(SIDECAR_SUFFIX)
+
+
+def write_sidecar(words, output_filepath, model=None, language=None, source_sha256=None):
+    """Записывает слова в бинарный файл атомарно (через временный файл и os.replace)"""
+    words = WordTimeline.from_words(words)
+    text = words.text_buffer.encode("utf-8")
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "count": len(words),
+        "text_chars": len(words.text_buffer),
+        "text_bytes": len(text),
+        "model": model,
+        "language": language,
+        "source_sha256": source_sha256,
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }, ensure_ascii=False).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    padding = b"\0" * (-len(prefix) % 8)
+
+    output_filepath = Path(output_filepath)
+    tmp_path = output_filepath.with_name(f"{output_filepath.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(prefix + padding)
+        f.write(words.starts.astype("<f8").tobytes())
+        f.write(words.ends.astype("<f8").tobytes())
+        f.write(words.offsets.astype("<i4").tobytes())
+        f.write(text)
+    os.replace(tmp_path, output_filepath)
+
+
+def read_sidecar(filepath):
+    """Открывает файл .words; возвращает (WordTimeline, заголовок).
+
+    Массивы времени и смещений читаются из mmap одним копированием, без разбора
+    текста; после чтения отображение закрывается, чтобы файл не оставался
+    открытым (в Windows открытый файл нельзя заменить при повторной записи).
+    """
+    with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{filepath}: не файл временных меток слов")
+        (header_length,) = struct.unpack_from("<I", buffer, len(MAGIC))
+        position = len(MAGIC) + 4
+        header = json.loads(buffer[position:position + header_length].decode("utf-8"))
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{filepath}: неподдерживаемая версия {header.get('version')}")
+        position += header_length
+        position += -position % 8
+
+        count = header["count"]
+        starts = np.frombuffer(buffer, dtype="<f8", count=count, offset=position).copy()
+        position += 8 * count
+        ends = np.frombuffer(buffer, dtype="<f8", count=count, offset=position).copy()
+        position += 8 * count
+        offsets = np.frombuffer(buffer, dtype="<i4", count=count + 1, offset=position).copy()
+        position += 4 * (count + 1)
+        text = buffer[position:position + header["text_bytes"]].decode("utf-8")
+    if len(text) != header["text_chars"]:
+        raise ValueError(f"{filepath}: повреждённый текст")
+    return WordTimeline(starts, ends, text, offsets), header
+
+
+def load_words(srt_filepath):
+    """Загружает слова для .srt: из файла .words, если он не старше .srt, иначе разбирает .srt"""
+    path = sidecar_path(srt_filepath)
+    try:
+        if path.exists() and path.stat().st_mtime >= Path(srt_filepath).stat().st_mtime:
+            words, _ = read_sidecar(path)
+            return words
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Failed to read word sidecar {path.name}, falling back to .srt: {e}")
+    return read_srt(srt_filepath)
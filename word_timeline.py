@@ -0,0 +1,120 @@
+"""Компактная временная шкала слов: массивы начала/конца и общий текстовый буфер"""
+import numpy as np
+
+
+class WordTimeline:
+    """Слова транскрипта с временными метками без словаря на каждое слово.
+
+    Время хранится в двух непрерывных массивах float64, текст всех слов - в одной
+    строке, границы слов - в массиве смещений int32. Это около 20 байт на слово
+    плюс сам текст вместо сотен байт у списка словарей.
+
+    Для совместимости с кодом, работающим со списком словарей, timeline[i]
+    возвращает {"start", "end", "word"}, а итерация выдаёт такие словари по одному.
+    """
+
+    __slots__ = ("starts", "ends", "_text", "_offsets")
+
+    def __init__(self, starts, ends, text, offsets):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self._text = text
+        self._offsets = np.asarray(offsets, dtype=np.int32)
+
+    @classmethod
+    def from_lists(cls, starts, ends, texts):
+        """Создает шкалу из списков начала, конца и текста слов"""
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(starts, ends, "".join(texts), offsets)
+
+    @classmethod
+    def from_words(cls, words):
+        """Создает шкалу из словарей слов Whisper; пропущенный "end" заменяется на start + 0.5 сек"""
+        if isinstance(words, WordTimeline):
+            return words
+        starts = []
+        ends = []
+        texts = []
+        for word in words:
+            start = word.get("start", 0)
+            starts.append(start)
+            ends.append(word.get("end", start + 0.5))
+            texts.append(word["word"].strip())
+        return cls.from_lists(starts, ends, texts)
+
+    @classmethod
+    def concatenate(cls, timelines):
+        """Склеивает несколько шкал в одну"""
+        timelines = list(timelines)
+        if not timelines:
+            return cls.empty()
+        texts = [text for timeline in timelines for text in timeline.texts()]
+        return cls.from_lists(np.concatenate([t.starts for t in timelines]),
+                              np.concatenate([t.ends for t in timelines]), texts)
+
+    @classmethod
+    def empty(cls):
+        return cls.from_lists([], [], [])
+
+    @property
+    def text_buffer(self):
+        """Текст всех слов подряд, без разделителей"""
+        return self._text
+
+    @property
+    def offsets(self):
+        """Границы слов в text_buffer (len + 1 значений)"""
+        return self._offsets
+
+    def __len__(self):
+        return len(self.starts)
+
+    def word(self, i):
+        """Текст слова с индексом i"""
+        return self._text[self._offsets[i]:self._offsets[i + 1]]
+
+    def texts(self):
+        """Список текстов всех слов"""
+        offsets = self._offsets.tolist()
+        return [self._text[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def joined_text(self, separator=" "):
+        """Текст транскрипта без временных меток"""
+        return separator.join(self.texts())
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("word index out of range")
+            return {"start": float(self.starts[key]), "end": float(self.ends[key]), "word": self.word(key)}
+        if isinstance(key, slice):
+            return self.take(np.arange(len(self))[key])
+        return self.take(key)
+
+    def __iter__(self):
+        starts = self.starts.tolist()
+        ends = self.ends.tolist()
+        for i, text in enumerate(self.texts()):
+            yield {"start": starts[i], "end": ends[i], "word": text}
+
+    def take(self, indices, starts=None, ends=None):
+        """Новая шкала из слов с заданными индексами; при необходимости с новыми временными метками"""
+        indices = np.asarray(indices, dtype=np.int64)
+        text = self._text
+        texts = [text[s:e] for s, e in zip(self._offsets[indices].tolist(), self._offsets[indices + 1].tolist())]
+        return WordTimeline.from_lists(self.starts[indices] if starts is None else starts,
+                                       self.ends[indices] if ends is None else ends,
+                                       texts)
+
+    def indices_in_time(self, start, end):
+        """Индексы слов, начинающихся в интервале [start, end) (слова должны идти по времени)"""
+        first, last = np.searchsorted(self.starts, [start, end], side="left")
+        return np.arange(first, last)
+
+    def slice_time(self, start, end):
+        """Шкала из слов, начинающихся в интервале [start, end)"""
+        return self.take(self.indices_in_time(start, end))